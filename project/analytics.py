@@ -0,0 +1,335 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set, Tuple
+from uuid import uuid4
+
+import prisma.models
+import project.metrics
+import project.registry
+from prisma.fields import Json
+
+logger = logging.getLogger(__name__)
+
+# Route template -> (Module.name, Feature.name) for usage rollups.
+ROUTE_FEATURES: Dict[str, Tuple[str, str]] = {
+    spec.route: (spec.group, spec.name) for spec in project.registry.TOOLS.values()
+}
+
+FLUSHES = project.metrics.REGISTRY.counter(
+    "multitool_analytics_flushes_total",
+    "Analytics rollup flushes by outcome.",
+    ("outcome",),
+)
+
+
+class LatencySketch:
+    """
+    Mergeable latency distribution with bounded relative error.
+
+    Values are counted in logarithmic bins of ratio `gamma`, so any quantile is
+    reported within `relative_accuracy` of the true value and two sketches merge by
+    adding bin counts. Memory grows with the log of the value range, not the count.
+    """
+
+    __slots__ = ("relative_accuracy", "gamma", "_log_gamma", "bins", "zero_count")
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.bins.values())
+
+    def add(self, value: float) -> None:
+        if value <= 1e-9:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + 1
+
+    def merge(self, other: "LatencySketch") -> None:
+        self.zero_count += other.zero_count
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Returns the approximate `q`-quantile (0 <= q <= 1), or None when empty.
+        """
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                return 2 * self.gamma**index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            "bins": {str(k): v for k, v in self.bins.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "LatencySketch":
+        sketch = cls(data.get("relative_accuracy", 0.01))
+        sketch.zero_count = data.get("zero_count", 0)
+        sketch.bins = {int(k): v for k, v in data.get("bins", {}).items()}
+        return sketch
+
+
+class FeatureStats:
+    """
+    Counters and latency sketch of one feature for one day.
+    """
+
+    __slots__ = ("calls", "errors", "client_errors", "bytes_in", "bytes_out", "latency")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.client_errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency = LatencySketch()
+
+    def record(self, status: int, seconds: float, bytes_in: int, bytes_out: int):
+        self.calls += 1
+        if status >= 500:
+            self.errors += 1
+        elif status >= 400:
+            self.client_errors += 1
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        self.latency.add(seconds)
+
+    def merge(self, other: "FeatureStats") -> None:
+        self.calls += other.calls
+        self.errors += other.errors
+        self.client_errors += other.client_errors
+        self.bytes_in += other.bytes_in
+        self.bytes_out += other.bytes_out
+        self.latency.merge(other.latency)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "client_errors": self.client_errors,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "latency_seconds": self.latency.to_json(),
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "FeatureStats":
+        stats = cls()
+        stats.calls = data.get("calls", 0)
+        stats.errors = data.get("errors", 0)
+        stats.client_errors = data.get("client_errors", 0)
+        stats.bytes_in = data.get("bytes_in", 0)
+        stats.bytes_out = data.get("bytes_out", 0)
+        stats.latency = LatencySketch.from_json(data.get("latency_seconds", {}))
+        return stats
+
+
+def _utc_day(timestamp: Optional[float] = None) -> datetime:
+    now = datetime.fromtimestamp(timestamp or time.time(), tz=timezone.utc)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class UsageAggregator:
+    """
+    In-process per-feature, per-day usage totals periodically upserted into `Analytics`.
+
+    Each process owns one `Analytics` row per feature and day, identified by
+    '<featureId>:<day>:<instance>'. Flushes upsert the process's cumulative totals
+    into its own rows, so workers never overwrite each other and no read is needed
+    before writing; readers merge the rows of all instances.
+    """
+
+    def __init__(self, flush_interval: float = 60.0):
+        self.flush_interval = flush_interval
+        self.instance_id = uuid4().hex[:12]
+        self._totals: Dict[Tuple[str, str, datetime], FeatureStats] = {}
+        self._dirty: Set[Tuple[str, str, datetime]] = set()
+        self._feature_ids: Dict[Tuple[str, str], str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+
+    def record(
+        self,
+        module: str,
+        feature: str,
+        status: int,
+        seconds: float,
+        bytes_in: int = 0,
+        bytes_out: int = 0,
+    ) -> None:
+        """
+        Adds one call to the in-memory totals; never touches the database.
+        """
+        key = (module, feature, _utc_day())
+        stats = self._totals.get(key)
+        if stats is None:
+            stats = self._totals[key] = FeatureStats()
+        stats.record(status, seconds, bytes_in, bytes_out)
+        self._dirty.add(key)
+
+    async def _feature_id(self, module: str, feature: str) -> str:
+        feature_id = self._feature_ids.get((module, feature))
+        if feature_id is not None:
+            return feature_id
+        module_row = await prisma.models.Module.prisma().upsert(
+            where={"name": module},
+            data={"create": {"name": module, "description": module}, "update": {}},
+        )
+        # Feature names are unique, so concurrent flushes converge on one row.
+        feature_row = await prisma.models.Feature.prisma().upsert(
+            where={"name": feature},
+            data={
+                "create": {
+                    "moduleId": module_row.id,
+                    "name": feature,
+                    "description": feature,
+                },
+                "update": {},
+            },
+        )
+        self._feature_ids[(module, feature)] = feature_row.id
+        return feature_row.id
+
+    async def flush(self) -> int:
+        """
+        Upserts the totals of every feature-day that changed since the last flush.
+
+        Returns:
+            int: The number of `Analytics` rows written.
+        """
+        dirty, self._dirty = self._dirty, set()
+        written = 0
+        failed = False
+        for key in dirty:
+            module, feature, day = key
+            metrics = Json(self._totals[key].to_json())
+            try:
+                feature_id = await self._feature_id(module, feature)
+                row_id = f"{feature_id}:{day:%Y-%m-%d}:{self.instance_id}"
+                await prisma.models.Analytics.prisma().upsert(
+                    where={"id": row_id},
+                    data={
+                        "create": {
+                            "id": row_id,
+                            "featureId": feature_id,
+                            "metrics": metrics,
+                            "day": day,
+                        },
+                        "update": {"metrics": metrics, "day": day},
+                    },
+                )
+                written += 1
+            except Exception:
+                logger.exception("Failed to flush analytics for %s/%s", module, feature)
+                self._dirty.add(key)
+                failed = True
+        today = _utc_day()
+        for key in [k for k in self._totals if k[2] < today and k not in self._dirty]:
+            del self._totals[key]
+        FLUSHES.labels("failed" if failed else "succeeded").inc()
+        return written
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        # Regenerated here so that workers forked from one parent get distinct rows.
+        self.instance_id = uuid4().hex[:12]
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="analytics-flusher")
+
+    async def stop(self) -> None:
+        """
+        Stops the periodic flush after writing the remaining totals.
+        """
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+
+usage_aggregator = UsageAggregator()
+
+
+class UsageAnalyticsMiddleware:
+    """
+    Pure ASGI middleware feeding the usage aggregator with calls, status codes,
+    request/response bytes and latency per feature.
+
+    Routes not listed in `ROUTE_FEATURES` are ignored.
+    """
+
+    def __init__(self, app, aggregator: UsageAggregator = usage_aggregator):
+        self.app = app
+        self.aggregator = aggregator
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        bytes_in = 0
+        bytes_out = 0
+
+        async def receive_wrapper():
+            nonlocal bytes_in
+            message = await receive()
+            if message["type"] == "http.request":
+                bytes_in += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status_code, bytes_out
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                bytes_out += len(message.get("body", b""))
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            feature = ROUTE_FEATURES.get(getattr(scope.get("route"), "path", None))
+            if feature is not None:
+                self.aggregator.record(
+                    feature[0],
+                    feature[1],
+                    status_code,
+                    time.perf_counter() - start,
+                    bytes_in + len(scope.get("query_string", b"")),
+                    bytes_out,
+                )
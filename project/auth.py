@@ -0,0 +1,356 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import prisma.models
+import project.metrics
+
+API_KEY_HEADER = "x-api-key"
+
+PLAN_ORDER = ("FREE", "BASIC", "PREMIUM")
+
+AUTH_EVENTS = project.metrics.REGISTRY.counter(
+    "multitool_auth_events_total",
+    "API key resolution and rate limiting outcomes.",
+    ("outcome",),
+)
+
+
+class RateLimit(NamedTuple):
+    """
+    Token bucket parameters: `burst` tokens at most, refilled at `per_second`.
+    """
+
+    per_second: float
+    burst: int
+
+
+PLAN_RATE_LIMITS: Dict[str, RateLimit] = {
+    "FREE": RateLimit(per_second=1.0, burst=10),
+    "BASIC": RateLimit(per_second=10.0, burst=50),
+    "PREMIUM": RateLimit(per_second=50.0, burst=200),
+}
+
+
+class Principal(NamedTuple):
+    """
+    The caller identified by an API key, as cached in memory.
+    """
+
+    api_key_id: str
+    user_id: str
+    plan: str
+    role: str = "USER"
+
+
+class ApiKeyCache:
+    """
+    LRU cache of API key lookups with a TTL, including negative entries for unknown keys.
+
+    Entries are evicted least-recently-used once `max_size` is reached. Unknown keys are
+    cached for `negative_ttl` so that floods of invalid keys cannot reach the database.
+    Entries are never invalidated early: revoked keys and plan changes take effect
+    once the entry expires, within `ttl` seconds.
+    """
+
+    def __init__(
+        self, max_size: int = 10_000, ttl: float = 300.0, negative_ttl: float = 30.0
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Principal]]]" = (
+            OrderedDict()
+        )
+
+    def get(self, key: str) -> Tuple[bool, Optional[Principal]]:
+        """
+        Looks up a key.
+
+        Returns:
+            Tuple[bool, Optional[Principal]]: Whether the key was cached, and the principal (None for a cached unknown key).
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, principal = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, principal
+
+    def put(
+        self, key: str, principal: Optional[Principal], ttl: Optional[float] = None
+    ) -> None:
+        if ttl is None:
+            ttl = self.ttl if principal is not None else self.negative_ttl
+        self._entries[key] = (time.monotonic() + ttl, principal)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def _active_plan(subscriptions, now: datetime) -> Tuple[str, Optional[datetime]]:
+    best, valid_until = "FREE", None
+    for subscription in subscriptions or []:
+        if subscription.status != "ACTIVE" or subscription.validUntil <= now:
+            continue
+        rank = PLAN_ORDER.index(subscription.plan)
+        if rank > PLAN_ORDER.index(best):
+            best, valid_until = PLAN_ORDER[rank], subscription.validUntil
+    return best, valid_until
+
+
+class ApiKeyResolver:
+    """
+    Resolves API keys to principals through an `ApiKeyCache`.
+
+    Cache hits never touch the database. Concurrent misses for the same key share a
+    single query, and a principal is never cached past the end of the subscription
+    its plan comes from.
+    """
+
+    def __init__(self, cache: Optional[ApiKeyCache] = None):
+        self.cache = cache or ApiKeyCache()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._hits = AUTH_EVENTS.labels("cache_hit")
+        self._misses = AUTH_EVENTS.labels("cache_miss")
+
+    async def resolve(self, key: str) -> Optional[Principal]:
+        cached, principal = self.cache.get(key)
+        if cached:
+            self._hits.inc()
+            return principal
+        self._misses.inc()
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            principal, ttl = await self._load(key)
+            self.cache.put(key, principal, ttl)
+            future.set_result(principal)
+            return principal
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _load(self, key: str) -> Tuple[Optional[Principal], Optional[float]]:
+        api_key = await prisma.models.ApiKey.prisma().find_unique(
+            where={"key": key}, include={"user": {"include": {"Subscriptions": True}}}
+        )
+        if api_key is None:
+            return None, None
+        now = datetime.now(timezone.utc)
+        plan, valid_until = _active_plan(api_key.user.Subscriptions, now)
+        ttl = self.cache.ttl
+        if valid_until is not None:
+            ttl = min(ttl, (valid_until - now).total_seconds())
+        principal = Principal(
+            api_key_id=api_key.id,
+            user_id=api_key.userId,
+            plan=plan,
+            role=api_key.user.role,
+        )
+        return principal, ttl
+
+
+class RateLimitBackend:
+    """
+    Storage for rate limit state; subclass to share buckets between processes.
+    """
+
+    async def acquire(self, key: str, limit: RateLimit, cost: int = 1) -> float:
+        """
+        Takes `cost` tokens from the bucket identified by `key`.
+
+        Args:
+            key (str): The bucket identifier, normally the API key id.
+            limit (RateLimit): The bucket size and refill rate for the caller's plan.
+            cost (int): Tokens to take, e.g. one per operation of a batch request.
+
+        Returns:
+            float: 0 if the request is allowed, otherwise the seconds until a token is available.
+        """
+        raise NotImplementedError
+
+
+class LocalRateLimitBackend(RateLimitBackend):
+    """
+    In-process token buckets; limits apply per worker process.
+
+    This is the default backend and the stand-in for a shared one in development.
+    Idle buckets beyond `max_buckets` are evicted least-recently-used; an evicted
+    bucket starts full again, which only ever errs in the caller's favour.
+    """
+
+    def __init__(self, max_buckets: int = 100_000):
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def acquire(self, key: str, limit: RateLimit, cost: int = 1) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (float(limit.burst), now))
+        tokens = min(float(limit.burst), tokens + (now - updated_at) * limit.per_second)
+        if tokens >= cost:
+            tokens -= cost
+            retry_after = 0.0
+        else:
+            retry_after = (cost - tokens) / limit.per_second
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+api_key_resolver = ApiKeyResolver()
+rate_limit_backend: RateLimitBackend = LocalRateLimitBackend()
+
+
+async def charge(principal: Optional[Principal], cost: int) -> float:
+    """
+    Takes additional tokens from a caller's bucket for requests that do more than one
+    unit of work, such as batches. The cost is capped at the plan's burst so that a
+    large request is throttled rather than rejected forever.
+
+    Returns:
+        float: 0 if allowed (or unauthenticated), otherwise the seconds to wait before retrying.
+    """
+    if principal is None or cost <= 0:
+        return 0.0
+    limit = PLAN_RATE_LIMITS[principal.plan]
+    return await rate_limit_backend.acquire(
+        principal.api_key_id, limit, min(cost, limit.burst)
+    )
+
+
+def is_admin(state) -> bool:
+    """
+    Returns True for callers allowed to see data across all users.
+
+    Anyone qualifies when API keys are not required, as in local development. That
+    is read from the request state, where `ApiKeyMiddleware` records its own
+    setting, so both always agree; without the middleware nobody qualifies.
+
+    Args:
+        state (starlette.datastructures.State): The request's `request.state`.
+    """
+    if getattr(state, "auth_enabled", True) is False:
+        return True
+    principal = getattr(state, "principal", None)
+    return principal is not None and principal.role == "ADMIN"
+
+
+def auth_required() -> bool:
+    return os.environ.get("REQUIRE_API_KEY", "true").lower() not in ("0", "false", "no")
+
+
+async def _send_error(send, status_code: int, message: str, headers=()) -> None:
+    body = json.dumps({"error": message}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class ApiKeyMiddleware:
+    """
+    Pure ASGI middleware authenticating requests by the X-API-Key header and applying
+    the per-plan rate limit.
+
+    Missing or unknown keys get a 401 and exhausted buckets a 429 with Retry-After.
+    The resolved `Principal` is stored on `request.state.principal`, and whether keys
+    are required on `request.state.auth_enabled`; the setting is read from
+    REQUIRE_API_KEY once, when the middleware is built. Paths in
+    `exempt_paths` (docs, metrics) and paths starting with one of `exempt_prefixes`
+    (WebSub callbacks, which hubs call without a key) are served without a key.
+    """
+
+    def __init__(
+        self,
+        app,
+        resolver: Optional[ApiKeyResolver] = None,
+        backend: Optional[RateLimitBackend] = None,
+        limits: Dict[str, RateLimit] = PLAN_RATE_LIMITS,
+        exempt_paths=(
+            "/metrics",
+            "/docs",
+            "/docs/oauth2-redirect",
+            "/redoc",
+            "/openapi.json",
+        ),
+        exempt_prefixes=("/feeds/websub/",),
+        enabled: Optional[bool] = None,
+    ):
+        self.app = app
+        self.resolver = resolver or api_key_resolver
+        self.backend = backend or rate_limit_backend
+        self.limits = limits
+        self.exempt_paths = frozenset(exempt_paths)
+        self.exempt_prefixes = tuple(exempt_prefixes)
+        self.enabled = auth_required() if enabled is None else enabled
+        self._rejected = AUTH_EVENTS.labels("rejected")
+        self._limited = AUTH_EVENTS.labels("rate_limited")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["auth_enabled"] = self.enabled
+        if (
+            not self.enabled
+            or scope["type"] != "http"
+            or scope["path"] in self.exempt_paths
+            or scope["path"].startswith(self.exempt_prefixes)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = None
+        for name, value in scope["headers"]:
+            if name == API_KEY_HEADER.encode():
+                key = value.decode("latin-1")
+                break
+        principal = await self.resolver.resolve(key) if key else None
+        if principal is None:
+            self._rejected.inc()
+            await _send_error(send, 401, "A valid X-API-Key header is required.")
+            return
+
+        limit = self.limits[principal.plan]
+        retry_after = await self.backend.acquire(principal.api_key_id, limit)
+        if retry_after > 0:
+            self._limited.inc()
+            await _send_error(
+                send,
+                429,
+                f"Rate limit exceeded for the {principal.plan} plan.",
+                headers=(
+                    (b"retry-after", str(math.ceil(retry_after)).encode()),
+                    (b"x-ratelimit-limit", str(limit.burst).encode()),
+                ),
+            )
+            return
+
+        scope.setdefault("state", {})["principal"] = principal
+        await self.app(scope, receive, send)
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import sys
+
+from project.benchmarks.report import (
+    build_report,
+    find_failed_scenarios,
+    find_regressions,
+    load_report,
+)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m project.benchmarks",
+        description="Run service micro-benchmarks, response serialization benchmarks and an in-process load test.",
+    )
+    parser.add_argument(
+        "suite",
+        choices=["micro", "serialization", "load", "all"],
+        nargs="?",
+        default="all",
+    )
+    parser.add_argument(
+        "-k",
+        dest="selected",
+        action="append",
+        help="Only run benchmarks whose name contains this substring (repeatable).",
+    )
+    parser.add_argument("-o", "--output", help="Write the JSON report to this file.")
+    parser.add_argument(
+        "--baseline",
+        help="Compare against a previous JSON report and flag regressions.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Relative slowdown tolerated before a benchmark counts as regressed.",
+    )
+    parser.add_argument("--min-time", type=float, default=0.5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--upstream-latency", type=float, default=0.02)
+    parser.add_argument("--db-latency", type=float, default=0.001)
+    args = parser.parse_args(argv)
+
+    micro = serialization = load = None
+    if args.suite in ("micro", "all"):
+        from project.benchmarks.micro import run_micro_benchmarks
+
+        micro = run_micro_benchmarks(args.selected, min_time=args.min_time)
+    if args.suite in ("serialization", "all"):
+        from project.benchmarks.serialization import run_serialization_benchmarks
+
+        serialization = run_serialization_benchmarks(
+            args.selected, min_time=args.min_time
+        )
+    if args.suite in ("load", "all"):
+        from project.benchmarks.load import run_load_test
+
+        load = asyncio.run(
+            run_load_test(
+                args.selected,
+                concurrency=args.concurrency,
+                requests=args.requests,
+                upstream_latency=args.upstream_latency,
+                db_latency=args.db_latency,
+            )
+        )
+
+    report = build_report(micro, load, serialization)
+    document = report.model_dump_json(indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(document)
+    else:
+        print(document)
+
+    # A scenario that got error responses measured the error path, not the route.
+    failed = find_failed_scenarios(report)
+    for name, errors in failed.items():
+        requests = report.load[name]["requests"]
+        print(
+            f"ERRORS load:{name} {errors}/{requests} requests failed", file=sys.stderr
+        )
+    regressions = []
+    if args.baseline:
+        regressions = find_regressions(
+            load_report(args.baseline), report, args.threshold
+        )
+        for r in regressions:
+            print(
+                f"REGRESSION {r.suite}:{r.name} {r.metric} "
+                f"{r.baseline:.6f}s -> {r.current:.6f}s (+{r.change:.0%})",
+                file=sys.stderr,
+            )
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+import asyncio
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+from unittest import mock
+
+import httpx
+import project.auth
+from project.benchmarks.standins import make_image, stand_ins
+from pydantic import BaseModel
+
+# The load test authenticates with a pre-cached key on a plan without a rate limit,
+# so the API key middleware's hot path is measured without throttling the run.
+BENCHMARK_API_KEY = "benchmark-api-key"
+BENCHMARK_PLAN = "BENCHMARK"
+BENCHMARK_RATE_LIMIT = project.auth.RateLimit(per_second=1e9, burst=10**9)
+BENCHMARK_PRINCIPAL = project.auth.Principal(
+    api_key_id="benchmark-api-key-id", user_id="benchmark-user", plan=BENCHMARK_PLAN
+)
+
+
+class LoadScenario(NamedTuple):
+    """
+    One HTTP request shape replayed against the application.
+    """
+
+    name: str
+    method: str
+    path: str
+    params: Dict[str, Any]
+    json: Optional[Any] = None
+
+
+class LoadTestResult(BaseModel):
+    """
+    Throughput and latency of one load scenario; all durations are in seconds.
+    """
+
+    requests: int
+    errors: int
+    duration_s: float
+    requests_per_s: float
+    p50_s: float
+    p95_s: float
+    p99_s: float
+    max_s: float
+
+
+def build_scenarios() -> List[LoadScenario]:
+    """
+    Builds one request shape per route, using the same payload sizes as the micro-benchmarks.
+    """
+    return [
+        LoadScenario("GET /geolocation/{ip}", "GET", "/geolocation/8.8.8.8", {}),
+        LoadScenario(
+            "POST /image/resize[small]",
+            "POST",
+            "/image/resize",
+            dict(image_data=make_image(64, 64), width=32, height=32, format="PNG"),
+        ),
+        LoadScenario(
+            "POST /image/resize[large]",
+            "POST",
+            "/image/resize",
+            dict(
+                image_data=make_image(1600, 1200, "JPEG"),
+                width=800,
+                height=600,
+                format="JPEG",
+            ),
+        ),
+        LoadScenario(
+            "POST /qr/generate",
+            "POST",
+            "/qr/generate",
+            dict(
+                content="https://example.com/?q=" + "x" * 500,
+                size=400,
+                color="#000000",
+                background_color="#FFFFFF",
+                border=4,
+            ),
+        ),
+        LoadScenario(
+            "POST /barcode/generate",
+            "POST",
+            "/barcode/generate",
+            dict(
+                format="code128",
+                content="MULTITOOL-0123456789",
+                width=20,
+                height=15,
+                color="#000000",
+                background_color="#FFFFFF",
+                text="MULTITOOL-0123456789",
+            ),
+        ),
+        LoadScenario(
+            "GET /currency/rate",
+            "GET",
+            "/currency/rate",
+            dict(base_currency="USD", target_currency="EUR", date="2024-01-15"),
+        ),
+        LoadScenario(
+            "POST /feed/convert",
+            "POST",
+            "/feed/convert",
+            dict(feed_url="https://feeds.bench/large.xml"),
+        ),
+        LoadScenario(
+            "POST /url/preview",
+            "POST",
+            "/url/preview",
+            dict(url="https://pages.bench/article"),
+        ),
+        LoadScenario(
+            "POST /security/password/strength",
+            "POST",
+            "/security/password/strength",
+            dict(password="Tr0ub4dor&3"),
+        ),
+        LoadScenario(
+            "POST /timezone/convert",
+            "POST",
+            "/timezone/convert",
+            dict(
+                timestamp="2024-03-10T01:30:00",
+                source_timezone="America/New_York",
+                target_timezone="Europe/London",
+            ),
+        ),
+        LoadScenario(
+            "POST /security/email/validate",
+            "POST",
+            "/security/email/validate",
+            dict(email="someone@example.com"),
+        ),
+        LoadScenario(
+            "POST /batch",
+            "POST",
+            "/batch",
+            {},
+            json={
+                "operations": [
+                    {
+                        "tool": "generate_qr_code",
+                        "params": dict(
+                            content="https://example.com/",
+                            size=200,
+                            color="#000000",
+                            background_color="#FFFFFF",
+                            border=4,
+                        ),
+                    },
+                    {
+                        "tool": "generate_url_preview",
+                        "params": dict(url="https://pages.bench/article"),
+                    },
+                    {
+                        "tool": "convert_timezone",
+                        "params": dict(
+                            timestamp="2024-03-10T01:30:00",
+                            source_timezone="America/New_York",
+                            target_timezone="Europe/London",
+                        ),
+                    },
+                    {
+                        "tool": "get_exchange_rate",
+                        "params": dict(
+                            base_currency="USD", target_currency="EUR", date=None
+                        ),
+                    },
+                ],
+                "deadline_ms": 5000,
+            },
+        ),
+    ]
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _run_scenario(
+    client: httpx.AsyncClient,
+    scenario: LoadScenario,
+    concurrency: int,
+    requests: int,
+) -> LoadTestResult:
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                response = await client.request(
+                    scenario.method,
+                    scenario.path,
+                    params=scenario.params,
+                    json=scenario.json,
+                )
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return LoadTestResult(
+        requests=len(ordered),
+        errors=errors,
+        duration_s=duration,
+        requests_per_s=len(ordered) / duration if duration else 0.0,
+        p50_s=_percentile(ordered, 0.50),
+        p95_s=_percentile(ordered, 0.95),
+        p99_s=_percentile(ordered, 0.99),
+        max_s=ordered[-1] if ordered else 0.0,
+    )
+
+
+async def run_load_test(
+    selected: Optional[List[str]] = None,
+    concurrency: int = 16,
+    requests: int = 200,
+    upstream_latency: float = 0.02,
+    db_latency: float = 0.001,
+) -> Dict[str, LoadTestResult]:
+    """
+    Drives `project.server.app` in-process over ASGI with concurrent clients.
+
+    External HTTP APIs and Postgres are replaced by local stand-ins with simulated
+    round-trip latency, so results reflect the application's own overhead and
+    concurrency behaviour rather than third-party availability.
+
+    Args:
+        selected (Optional[List[str]]): Substrings of scenario names to run; all scenarios when omitted.
+        concurrency (int): Number of concurrent clients per scenario.
+        requests (int): Total requests issued per scenario.
+        upstream_latency (float): Simulated upstream HTTP round-trip time, in seconds.
+        db_latency (float): Simulated database round-trip time, in seconds.
+
+    Returns:
+        Dict[str, LoadTestResult]: Throughput and latency summaries keyed by scenario name.
+    """
+    with stand_ins(
+        upstream_latency=upstream_latency, db_latency=db_latency
+    ), mock.patch.dict(
+        project.auth.PLAN_RATE_LIMITS, {BENCHMARK_PLAN: BENCHMARK_RATE_LIMIT}
+    ):
+        import project.server as server
+
+        project.auth.api_key_resolver.cache.put(BENCHMARK_API_KEY, BENCHMARK_PRINCIPAL)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(
+            transport=transport,
+            base_url="http://benchmark",
+            headers={project.auth.API_KEY_HEADER: BENCHMARK_API_KEY},
+        ) as client:
+            results: Dict[str, LoadTestResult] = {}
+            for scenario in build_scenarios():
+                if selected and not any(s in scenario.name for s in selected):
+                    continue
+                results[scenario.name] = await _run_scenario(
+                    client, scenario, concurrency, requests
+                )
+    return results
@@ -0,0 +1,264 @@
+import asyncio
+import inspect
+import os
+import statistics
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import project.add_watermark_to_pdf_service
+import project.check_password_strength_service
+import project.convert_feed_to_json_service
+import project.convert_timezone_service
+import project.generate_barcode_service
+import project.generate_qr_code_service
+import project.generate_url_preview_service
+import project.get_exchange_rate_service
+import project.get_ip_geolocation_service
+import project.resize_image_service
+import project.text_to_speech_convert_service
+import project.validate_email_service
+from project.benchmarks.standins import make_image, stand_ins
+from pydantic import BaseModel
+
+
+class BenchmarkCase(NamedTuple):
+    """
+    A service function invoked with one representative payload.
+    """
+
+    name: str
+    function: Callable[..., Any]
+    kwargs: Dict[str, Any]
+    cleanup: Optional[Callable[[Any], None]] = None
+
+
+class MicroBenchmarkResult(BaseModel):
+    """
+    Timing summary of one micro-benchmark case; all durations are in seconds.
+    """
+
+    iterations: int
+    min_s: float
+    median_s: float
+    mean_s: float
+    p95_s: float
+    ops_per_s: float
+
+
+def _remove_barcode_file(response: Any) -> None:
+    try:
+        os.remove(response.barcode_image_url)
+    except OSError:
+        pass
+
+
+def build_cases() -> List[BenchmarkCase]:
+    """
+    Builds the benchmark cases, one or more representative payloads per service function.
+
+    Returns:
+        List[BenchmarkCase]: The cases, named '<function>[<payload>]'.
+    """
+    text_style = project.add_watermark_to_pdf_service.TextStyle(
+        font="Helvetica", size=24, color="#000000"
+    )
+    return [
+        BenchmarkCase(
+            "resize_image[small_png]",
+            project.resize_image_service.resize_image,
+            dict(image_data=make_image(64, 64), width=32, height=32, format=None),
+        ),
+        BenchmarkCase(
+            "resize_image[large_jpeg]",
+            project.resize_image_service.resize_image,
+            dict(
+                image_data=make_image(2048, 2048, "JPEG"),
+                width=512,
+                height=512,
+                format="JPEG",
+            ),
+        ),
+        BenchmarkCase(
+            "resize_image[large_png_to_png]",
+            project.resize_image_service.resize_image,
+            dict(
+                image_data=make_image(1600, 1200), width=800, height=600, format="PNG"
+            ),
+        ),
+        BenchmarkCase(
+            "generate_qr_code[short_default_colors]",
+            project.generate_qr_code_service.generate_qr_code,
+            dict(
+                content="https://example.com",
+                size=400,
+                color="#000000",
+                background_color="#FFFFFF",
+                border=4,
+            ),
+        ),
+        BenchmarkCase(
+            "generate_qr_code[long_custom_colors]",
+            project.generate_qr_code_service.generate_qr_code,
+            dict(
+                content="https://example.com/?q=" + "x" * 1000,
+                size=400,
+                color="#1A2B3C",
+                background_color="#FAFAFA",
+                border=4,
+            ),
+        ),
+        BenchmarkCase(
+            "generate_barcode[code128]",
+            project.generate_barcode_service.generate_barcode,
+            dict(format="code128", content="MULTITOOL-0123456789", text="bench"),
+            cleanup=_remove_barcode_file,
+        ),
+        BenchmarkCase(
+            "generate_barcode[ean13]",
+            project.generate_barcode_service.generate_barcode,
+            dict(format="ean13", content="590123412345"),
+            cleanup=_remove_barcode_file,
+        ),
+        BenchmarkCase(
+            "convert_timezone",
+            project.convert_timezone_service.convert_timezone,
+            dict(
+                timestamp="2024-03-10T01:30:00",
+                source_timezone="America/New_York",
+                target_timezone="Asia/Kolkata",
+            ),
+        ),
+        BenchmarkCase(
+            "check_password_strength[short]",
+            project.check_password_strength_service.check_password_strength,
+            dict(password="hunter2"),
+        ),
+        BenchmarkCase(
+            "check_password_strength[long]",
+            project.check_password_strength_service.check_password_strength,
+            dict(password="Aa1!" * 2500),
+        ),
+        BenchmarkCase(
+            "validate_email",
+            project.validate_email_service.validate_email,
+            dict(email="someone@example.com"),
+        ),
+        BenchmarkCase(
+            "convert_feed_to_json[large_feed]",
+            project.convert_feed_to_json_service.convert_feed_to_json,
+            dict(feed_url="https://feeds.bench/large.xml"),
+        ),
+        BenchmarkCase(
+            "add_watermark_to_pdf[1mb]",
+            project.add_watermark_to_pdf_service.add_watermark_to_pdf,
+            dict(
+                pdf_document="A" * (1024 * 1024),
+                watermark_text="Confidential",
+                text_style=text_style,
+                opacity=0.5,
+                position="center",
+            ),
+        ),
+        BenchmarkCase(
+            "text_to_speech_convert[long_text]",
+            project.text_to_speech_convert_service.text_to_speech_convert,
+            dict(
+                text="Hello world. " * 300,
+                language="en-US",
+                pitch=None,
+                speed=None,
+                gender="female",
+            ),
+        ),
+        BenchmarkCase(
+            "get_ip_geolocation",
+            project.get_ip_geolocation_service.get_ip_geolocation,
+            dict(ip="8.8.8.8"),
+        ),
+        BenchmarkCase(
+            "get_exchange_rate",
+            project.get_exchange_rate_service.get_exchange_rate,
+            dict(base_currency="USD", target_currency="EUR", date=None),
+        ),
+        BenchmarkCase(
+            "generate_url_preview[large_page]",
+            project.generate_url_preview_service.generate_url_preview,
+            dict(url="https://pages.bench/article"),
+        ),
+    ]
+
+
+def _summarize(samples: List[float]) -> MicroBenchmarkResult:
+    ordered = sorted(samples)
+    mean = statistics.fmean(ordered)
+    return MicroBenchmarkResult(
+        iterations=len(ordered),
+        min_s=ordered[0],
+        median_s=statistics.median(ordered),
+        mean_s=mean,
+        p95_s=ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        ops_per_s=1.0 / mean if mean else 0.0,
+    )
+
+
+def _time_case(
+    case: BenchmarkCase,
+    loop: asyncio.AbstractEventLoop,
+    min_time: float,
+    max_iterations: int,
+    warmup: int,
+) -> List[float]:
+    is_async = inspect.iscoroutinefunction(case.function)
+
+    def call_once() -> float:
+        start = time.perf_counter()
+        if is_async:
+            result = loop.run_until_complete(case.function(**case.kwargs))
+        else:
+            result = case.function(**case.kwargs)
+        elapsed = time.perf_counter() - start
+        if case.cleanup is not None:
+            case.cleanup(result)
+        return elapsed
+
+    for _ in range(warmup):
+        call_once()
+    samples: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_iterations and (
+        len(samples) < 3 or time.perf_counter() < deadline
+    ):
+        samples.append(call_once())
+    return samples
+
+
+def run_micro_benchmarks(
+    selected: Optional[List[str]] = None,
+    min_time: float = 0.5,
+    max_iterations: int = 10_000,
+    warmup: int = 2,
+) -> Dict[str, MicroBenchmarkResult]:
+    """
+    Runs the service micro-benchmarks with every external dependency replaced by a stand-in.
+
+    Args:
+        selected (Optional[List[str]]): Substrings of case names to run; all cases when omitted.
+        min_time (float): Minimum measuring time per case, in seconds.
+        max_iterations (int): Upper bound on measured iterations per case.
+        warmup (int): Unmeasured iterations executed before timing starts.
+
+    Returns:
+        Dict[str, MicroBenchmarkResult]: Timing summaries keyed by case name.
+    """
+    results: Dict[str, MicroBenchmarkResult] = {}
+    loop = asyncio.new_event_loop()
+    try:
+        with stand_ins():
+            for case in build_cases():
+                if selected and not any(s in case.name for s in selected):
+                    continue
+                samples = _time_case(case, loop, min_time, max_iterations, warmup)
+                results[case.name] = _summarize(samples)
+    finally:
+        loop.close()
+    return results
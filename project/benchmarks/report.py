@@ -0,0 +1,129 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class BenchmarkReport(BaseModel):
+    """
+    The JSON document written by a benchmark run, comparable across runs.
+    """
+
+    created_at: str
+    git_revision: Optional[str] = None
+    python: str
+    machine: str
+    micro: Dict[str, Dict[str, Any]] = {}
+    load: Dict[str, Dict[str, Any]] = {}
+    serialization: Dict[str, Dict[str, Any]] = {}
+
+
+class Regression(BaseModel):
+    """
+    A benchmark whose tracked metric got worse than the baseline by more than the threshold.
+    """
+
+    suite: str
+    name: str
+    metric: str
+    baseline: float
+    current: float
+    change: float
+
+
+# Lower is better for every tracked metric.
+TRACKED_METRICS = {"micro": "median_s", "load": "p95_s", "serialization": "median_s"}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return (
+            subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+            or None
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(
+    micro: Optional[Dict[str, BaseModel]] = None,
+    load: Optional[Dict[str, BaseModel]] = None,
+    serialization: Optional[Dict[str, BaseModel]] = None,
+) -> BenchmarkReport:
+    """
+    Wraps benchmark results with the environment details needed to compare runs.
+    """
+    return BenchmarkReport(
+        created_at=datetime.now(timezone.utc).isoformat(),
+        git_revision=_git_revision(),
+        python=platform.python_version(),
+        machine=f"{platform.system()} {platform.machine()}",
+        micro={name: r.model_dump() for name, r in (micro or {}).items()},
+        load={name: r.model_dump() for name, r in (load or {}).items()},
+        serialization={
+            name: r.model_dump() for name, r in (serialization or {}).items()
+        },
+    )
+
+
+def load_report(path: str) -> BenchmarkReport:
+    with open(path) as f:
+        return BenchmarkReport.model_validate(json.load(f))
+
+
+def find_failed_scenarios(report: BenchmarkReport) -> Dict[str, int]:
+    """
+    Lists load scenarios that had failed requests, which invalidate their latencies.
+
+    Returns:
+        Dict[str, int]: The error count of each scenario with at least one error.
+    """
+    return {
+        name: result["errors"]
+        for name, result in report.load.items()
+        if result.get("errors")
+    }
+
+
+def find_regressions(
+    baseline: BenchmarkReport, current: BenchmarkReport, threshold: float = 0.10
+) -> List[Regression]:
+    """
+    Compares two reports and lists benchmarks that slowed down by more than `threshold`.
+
+    Args:
+        baseline (BenchmarkReport): The reference run.
+        current (BenchmarkReport): The run being checked.
+        threshold (float): Allowed relative slowdown, e.g. 0.10 for 10%.
+
+    Returns:
+        List[Regression]: The regressions, worst first. Benchmarks present in only one report are ignored.
+    """
+    regressions = []
+    for suite, metric in TRACKED_METRICS.items():
+        before, after = getattr(baseline, suite), getattr(current, suite)
+        for name in before.keys() & after.keys():
+            old, new = before[name].get(metric), after[name].get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change > threshold:
+                regressions.append(
+                    Regression(
+                        suite=suite,
+                        name=name,
+                        metric=metric,
+                        baseline=old,
+                        current=new,
+                        change=change,
+                    )
+                )
+    return sorted(regressions, key=lambda r: r.change, reverse=True)
@@ -0,0 +1,107 @@
+import asyncio
+import inspect
+from typing import Any, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from project.benchmarks.micro import BenchmarkCase, _summarize, _time_case, build_cases
+from project.benchmarks.standins import stand_ins
+from project.responses import ModelResponse
+from pydantic import BaseModel
+
+
+class SerializationResult(BaseModel):
+    """
+    Cost of turning one service response into HTTP body bytes, in seconds.
+
+    `fastapi_median_s` is FastAPI's `response_model` path (validate the returned model
+    again, `jsonable_encoder`, `json.dumps`); `median_s` is `ModelResponse`, which
+    serializes the model once with pydantic-core.
+    """
+
+    body_bytes: int
+    fastapi_median_s: float
+    median_s: float
+    speedup: float
+
+
+def _response_content(case: BenchmarkCase, loop: asyncio.AbstractEventLoop) -> Any:
+    result = case.function(**case.kwargs)
+    if inspect.isawaitable(result):
+        result = loop.run_until_complete(result)
+    if case.cleanup is not None:
+        case.cleanup(result)
+    return result
+
+
+def run_serialization_benchmarks(
+    selected: Optional[List[str]] = None,
+    min_time: float = 0.5,
+    max_iterations: int = 10_000,
+    warmup: int = 2,
+) -> Dict[str, SerializationResult]:
+    """
+    Compares per-route response serialization cost before and after `ModelResponse`.
+
+    Each micro-benchmark case is executed once to obtain a realistic response model,
+    which is then serialized repeatedly through both pipelines.
+
+    Args:
+        selected (Optional[List[str]]): Substrings of case names to run; all cases when omitted.
+        min_time (float): Minimum measuring time per pipeline and case, in seconds.
+        max_iterations (int): Upper bound on measured iterations per pipeline and case.
+        warmup (int): Unmeasured iterations executed before timing starts.
+
+    Returns:
+        Dict[str, SerializationResult]: Serialization costs keyed by micro-benchmark case name.
+    """
+    results: Dict[str, SerializationResult] = {}
+    loop = asyncio.new_event_loop()
+    try:
+        with stand_ins(upstream_latency=0.0, db_latency=0.0):
+            for case in build_cases():
+                if selected and not any(s in case.name for s in selected):
+                    continue
+                model = _response_content(case, loop)
+                field = create_response_field(
+                    name=f"Response_{case.name}",
+                    type_=type(model),
+                    mode="serialization",
+                )
+
+                async def fastapi_pipeline(model=model, field=field) -> bytes:
+                    content = await serialize_response(
+                        field=field, response_content=model
+                    )
+                    return JSONResponse(content).body
+
+                def model_response_pipeline(model=model) -> bytes:
+                    return ModelResponse(model).body
+
+                timings = {}
+                for label, pipeline in (
+                    ("fastapi", fastapi_pipeline),
+                    ("model_response", model_response_pipeline),
+                ):
+                    samples = _time_case(
+                        BenchmarkCase(case.name, pipeline, {}),
+                        loop,
+                        min_time,
+                        max_iterations,
+                        warmup,
+                    )
+                    timings[label] = _summarize(samples).median_s
+                results[case.name] = SerializationResult(
+                    body_bytes=len(model_response_pipeline()),
+                    fastapi_median_s=timings["fastapi"],
+                    median_s=timings["model_response"],
+                    speedup=(
+                        timings["fastapi"] / timings["model_response"]
+                        if timings["model_response"]
+                        else 0.0
+                    ),
+                )
+    finally:
+        loop.close()
+    return results
@@ -0,0 +1,410 @@
+import asyncio
+import base64
+import functools
+import hashlib
+import hmac
+import math
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime, timedelta
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+from uuid import uuid4
+from zlib import crc32
+
+import httpx
+from PIL import Image
+
+
+def make_image(width: int, height: int, format: str = "PNG") -> str:
+    """
+    Builds a base64 encoded image with a gradient so encoders cannot trivially compress it.
+
+    Args:
+        width (int): Width of the generated image in pixels.
+        height (int): Height of the generated image in pixels.
+        format (str): Pillow format name used to encode the image (e.g., 'PNG', 'JPEG').
+
+    Returns:
+        str: The base64 encoded image bytes.
+    """
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, format=format)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def make_feed_xml(item_count: int) -> str:
+    """
+    Builds an RSS 2.0 document with the given number of items.
+    """
+    items = "".join(
+        f"<item><title>Item {i}</title><link>https://feeds.bench/item/{i}</link>"
+        f"<description>Description of item {i} {'lorem ipsum ' * 20}</description>"
+        f"<pubDate>Mon, 02 Oct 2023 13:00:00 GMT</pubDate></item>"
+        for i in range(item_count)
+    )
+    return (
+        '<?xml version="1.0"?><rss version="2.0"><channel>'
+        "<title>Benchmark Feed</title><link>https://feeds.bench/</link>"
+        f"<description>Stand-in feed</description>{items}</channel></rss>"
+    )
+
+
+def make_html_page(paragraphs: int) -> str:
+    """
+    Builds an HTML page with preview metadata and a body of the given size.
+    """
+    body = "".join(f"<p>Paragraph {i} {'text ' * 50}</p>" for i in range(paragraphs))
+    return (
+        "<html><head><title>Benchmark Page</title>"
+        '<meta name="description" content="A stand-in page for benchmarks">'
+        '<meta property="og:image" content="https://pages.bench/image.png">'
+        f"</head><body>{body}</body></html>"
+    )
+
+
+def make_rate_timeseries(
+    start_date: str, end_date: str, symbols: List[str]
+) -> Dict[str, Dict[str, float]]:
+    """
+    Builds deterministic daily rates against USD, leaving out weekends like the real feed.
+    """
+    first, last = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    levels = {s: 0.5 + crc32(s.encode()) % 1000 / 100 for s in symbols}
+    rates = {}
+    for offset in range((last - first).days + 1):
+        day = first + timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        rates[day.isoformat()] = {
+            s: round(level * (1 + 0.05 * math.sin(day.toordinal() / 40 + level)), 6)
+            for s, level in levels.items()
+        }
+    return rates
+
+
+class HubStandIn:
+    """
+    Local WebSub hub for `hub.bench`.
+
+    Subscription requests are accepted with 202 and verified afterwards by calling the
+    subscriber's callback with a challenge, as a real hub does. `publish` delivers
+    content to the verified subscribers of a topic, signed with their secret.
+
+    Args:
+        client (httpx.AsyncClient): Client reaching the subscribers' callbacks, e.g.
+            one using `httpx.ASGITransport(app)` for the app under test.
+    """
+
+    host = "hub.bench"
+    url = "https://hub.bench/"
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        # (topic, callback) -> secret of verified subscriptions.
+        self.subscriptions: Dict[Tuple[str, str], Optional[str]] = {}
+        self._verifications: Set[asyncio.Task] = set()
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        form = {k: v[0] for k, v in parse_qs(request.content.decode()).items()}
+        mode = form.get("hub.mode")
+        if mode not in ("subscribe", "unsubscribe") or not form.get("hub.callback"):
+            return httpx.Response(400, text="Invalid subscription request.")
+        task = asyncio.create_task(self._verify(form))
+        self._verifications.add(task)
+        task.add_done_callback(self._verifications.discard)
+        return httpx.Response(202)
+
+    async def _verify(self, form: Dict[str, str]) -> None:
+        challenge = uuid4().hex
+        params = {
+            "hub.mode": form["hub.mode"],
+            "hub.topic": form.get("hub.topic", ""),
+            "hub.challenge": challenge,
+        }
+        if form["hub.mode"] == "subscribe":
+            params["hub.lease_seconds"] = form.get("hub.lease_seconds", "86400")
+        response = await self.client.get(form["hub.callback"], params=params)
+        if response.status_code != 200 or response.text != challenge:
+            return
+        key = (form.get("hub.topic", ""), form["hub.callback"])
+        if form["hub.mode"] == "subscribe":
+            self.subscriptions[key] = form.get("hub.secret")
+        else:
+            self.subscriptions.pop(key, None)
+
+    async def settle(self) -> None:
+        """
+        Waits for the pending verifications of intent.
+        """
+        while self._verifications:
+            await asyncio.gather(*self._verifications, return_exceptions=True)
+
+    async def publish(self, topic: str, content: str) -> List[int]:
+        """
+        Delivers new feed content to every verified subscriber of a topic.
+
+        Returns:
+            List[int]: The status code returned by each subscriber.
+        """
+        body = content.encode()
+        statuses = []
+        for (subscribed_topic, callback), secret in list(self.subscriptions.items()):
+            if subscribed_topic != topic:
+                continue
+            headers = {"content-type": "application/rss+xml"}
+            if secret:
+                digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+                headers["x-hub-signature"] = f"sha256={digest}"
+            response = await self.client.post(callback, content=body, headers=headers)
+            statuses.append(response.status_code)
+        return statuses
+
+
+class UpstreamStandIn:
+    """
+    Local replacement for the external HTTP APIs the services call.
+
+    Requests are answered from canned payloads, optionally after a fixed delay to model
+    network round-trip time. With a `hub`, feeds advertise it in a Link header and
+    requests to its host are passed to it.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        html_paragraphs: int = 200,
+        hub: Optional[HubStandIn] = None,
+    ):
+        self.latency = latency
+        self.hub = hub
+        self.html_page = make_html_page(html_paragraphs)
+        self.feed_xml = make_feed_xml(500)
+        self.request_count = 0
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        self.request_count += 1
+        host = request.url.host
+        if host == "api.ipgeolocation.io":
+            return httpx.Response(
+                200,
+                json={
+                    "country_name": "United States",
+                    "state_prov": "California",
+                    "city": "Mountain View",
+                    "latitude": "37.42240",
+                    "longitude": "-122.08421",
+                    "zipcode": "94043",
+                    "time_zone": "America/Los_Angeles",
+                    "isp": "Google LLC",
+                    "organization": "Google LLC",
+                },
+            )
+        if host == "api.exchangerate.host" and request.url.path == "/timeseries":
+            params = request.url.params
+            symbols = [s for s in params.get("symbols", "").split(",") if s]
+            return httpx.Response(
+                200,
+                json={
+                    "success": True,
+                    "timeseries": True,
+                    "base": params.get("base", "USD"),
+                    "rates": make_rate_timeseries(
+                        params["start_date"], params["end_date"], symbols
+                    ),
+                },
+            )
+        if host == "api.exchangerate.host":
+            return httpx.Response(
+                200,
+                json={
+                    "success": True,
+                    "info": {"rate": 0.9213},
+                    "date": datetime.now().strftime("%Y-%m-%d"),
+                    "result": 0.9213,
+                },
+            )
+        if host.startswith("feeds."):
+            headers = {"content-type": "application/rss+xml"}
+            if self.hub is not None:
+                headers["link"] = (
+                    f'<{self.hub.url}>; rel="hub", <{request.url}>; rel="self"'
+                )
+            return httpx.Response(200, text=self.feed_xml, headers=headers)
+        return httpx.Response(
+            200, text=self.html_page, headers={"content-type": "text/html"}
+        )
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.hub is not None and request.url.host == self.hub.host:
+            return await self.hub.handle(request)
+        return self._respond(request)
+
+
+_RELATION_OPERATIONS = {"connect", "connectOrCreate", "create"}
+
+
+class InMemoryTable:
+    """
+    Minimal stand-in for a Prisma model's query actions backed by a Python list.
+
+    Only the query shapes used by the services are supported: equality filters in
+    `find_first`/`find_many`, and `create`/`create_many`/`upsert` with scalar and Json
+    fields.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.rows: List[SimpleNamespace] = []
+
+    async def _round_trip(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _matches(self, row: SimpleNamespace, where: Optional[Dict[str, Any]]) -> bool:
+        return all(
+            getattr(row, key, None) == value
+            for key, value in (where or {}).items()
+            if not isinstance(value, dict)
+        )
+
+    def _build_row(self, data: Dict[str, Any]) -> SimpleNamespace:
+        row = {"id": str(uuid4()), "createdAt": datetime.now()}
+        row.update(
+            (key, value)
+            for key, value in data.items()
+            if not (isinstance(value, dict) and _RELATION_OPERATIONS & value.keys())
+        )
+        return SimpleNamespace(**row)
+
+    async def find_first(self, where=None, order=None, **kwargs):
+        await self._round_trip()
+        return next((r for r in reversed(self.rows) if self._matches(r, where)), None)
+
+    async def find_many(self, where=None, **kwargs):
+        await self._round_trip()
+        return [r for r in self.rows if self._matches(r, where)]
+
+    async def create(self, data, **kwargs):
+        await self._round_trip()
+        row = self._build_row(data)
+        self.rows.append(row)
+        return row
+
+    async def create_many(self, data, **kwargs):
+        await self._round_trip()
+        self.rows.extend(self._build_row(d) for d in data)
+        return len(data)
+
+    async def upsert(self, where, data, **kwargs):
+        await self._round_trip()
+        row = next((r for r in self.rows if self._matches(r, where)), None)
+        if row is None:
+            row = self._build_row(data["create"])
+            self.rows.append(row)
+        else:
+            row.__dict__.update(data["update"])
+        return row
+
+
+class _FakeTextToSpeechClient:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def synthesize_speech(self, input, voice, audio_config):
+        time.sleep(len(input.text) * 2e-6)
+        return SimpleNamespace(audio_content=b"\x00" * len(input.text) * 64)
+
+
+@contextmanager
+def stand_ins(
+    upstream_latency: float = 0.0,
+    db_latency: float = 0.0,
+    hub: Optional[HubStandIn] = None,
+) -> Iterator[SimpleNamespace]:
+    """
+    Routes every external dependency of the services to a local stand-in.
+
+    Covers outbound httpx calls (geolocation, exchange rates, URL previews, feeds), the
+    Prisma models used by the services, Google Cloud Text-to-Speech, the DNS
+    deliverability check of email validation and the public address check of fetched
+    URLs, which cannot resolve the stand-in hosts.
+
+    Args:
+        upstream_latency (float): Simulated round-trip time of upstream HTTP APIs, in seconds.
+        db_latency (float): Simulated round-trip time of each database query, in seconds.
+        hub (Optional[HubStandIn]): A WebSub hub for the stand-in feeds to advertise.
+
+    Yields:
+        SimpleNamespace: Handles to the stand-ins (`upstream`, `tables`) for inspection.
+    """
+    upstream = UpstreamStandIn(latency=upstream_latency, hub=hub)
+    tables: Dict[str, InMemoryTable] = {}
+    real_async_client = httpx.AsyncClient
+
+    class StandInAsyncClient(real_async_client):
+        def __init__(self, *args, **kwargs):
+            kwargs.setdefault("transport", httpx.MockTransport(upstream.handle))
+            super().__init__(*args, **kwargs)
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(httpx, "AsyncClient", StandInAsyncClient))
+        try:
+            import prisma.models
+        except ImportError:
+            prisma = None
+        if prisma is not None:
+            for model_name in (
+                "APIRequest",
+                "ApiKey",
+                "Log",
+                "Analytics",
+                "ExchangeRateSeries",
+            ):
+                model = getattr(prisma.models, model_name, None)
+                if model is None:
+                    continue
+                table = tables[model_name] = InMemoryTable(latency=db_latency)
+                stack.enter_context(
+                    mock.patch.object(model, "prisma", lambda table=table: table)
+                )
+        try:
+            from google.cloud import texttospeech_v1
+        except ImportError:
+            texttospeech_v1 = None
+        if texttospeech_v1 is not None:
+            stack.enter_context(
+                mock.patch.object(
+                    texttospeech_v1, "TextToSpeechClient", _FakeTextToSpeechClient
+                )
+            )
+        import email_validator
+
+        stack.enter_context(
+            mock.patch.object(
+                email_validator,
+                "validate_email",
+                functools.partial(
+                    email_validator.validate_email, check_deliverability=False
+                ),
+            )
+        )
+        import project.network
+
+        real_check_public_url = project.network.check_public_url
+
+        async def check_public_url(url: str, name: str = "url") -> None:
+            if (urlsplit(url).hostname or "").endswith(".bench"):
+                return
+            await real_check_public_url(url, name)
+
+        stack.enter_context(
+            mock.patch.object(project.network, "check_public_url", check_public_url)
+        )
+        yield SimpleNamespace(upstream=upstream, tables=tables)
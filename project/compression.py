@@ -0,0 +1,205 @@
+import gzip
+import os
+from typing import Optional, Tuple
+
+import brotli
+import project.metrics
+
+COMPRESSED_BYTES = project.metrics.REGISTRY.counter(
+    "multitool_compression_bytes_total",
+    "Response body bytes before and after compression, by encoding.",
+    ("encoding", "stage"),
+)
+
+# Only these content types are compressed; images, audio and PDFs already are.
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/msgpack",
+    "application/x-msgpack",
+    "application/xml",
+    "application/rss+xml",
+    "application/atom+xml",
+    "image/svg+xml",
+    "text/",
+)
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+# Markers of compressed images, with their offset from the start of the image.
+_IMAGE_MARKERS = (
+    (b"\x89PNG\r\n\x1a\n", 0),
+    (b"\xff\xd8\xff", 0),
+    (b"WEBPVP8", 8),
+    (b"ftypavi", 4),
+)
+# MessagePack bin 8/16/32 type bytes, by the size of the header they start.
+_BIN_HEADERS = ((2, 0xC4), (3, 0xC5), (5, 0xC6))
+
+
+def carries_compressed_image(body: bytes) -> bool:
+    """
+    Tells whether a MessagePack body holds a PNG, JPEG, WebP or AVIF image as a binary
+    value, as `project.responses.negotiate` packs artifacts; compressing the body again
+    would cost CPU for almost no gain.
+    """
+    for marker, offset in _IMAGE_MARKERS:
+        index = body.find(marker)
+        while index >= 0:
+            start = index - offset
+            for size, type_byte in _BIN_HEADERS:
+                if start >= size and body[start - size] == type_byte:
+                    return True
+            index = body.find(marker, index + 1)
+    return False
+
+
+def _parse_accept_encoding(header: str) -> dict:
+    encodings = {}
+    for part in header.split(","):
+        coding, *params = part.strip().split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            encodings[coding.strip().lower()] = quality
+    return encodings
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Picks 'br' or 'gzip' from an Accept-Encoding header, preferring brotli on ties.
+
+    Returns:
+        Optional[str]: The encoding to use, or None to send the body as is.
+    """
+    if not accept_encoding:
+        return None
+    encodings = _parse_accept_encoding(accept_encoding)
+    wildcard = encodings.get("*", 0.0)
+    candidates = [
+        (encodings.get(coding, wildcard), preference, coding)
+        for preference, coding in ((1, "br"), (0, "gzip"))
+    ]
+    quality, _, coding = max(candidates)
+    return coding if quality > 0 else None
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing text, JSON and MessagePack response bodies with
+    brotli or gzip, as negotiated through Accept-Encoding.
+
+    Bodies smaller than `minimum_size` bytes, content types outside
+    `COMPRESSIBLE_TYPES` (PNG, JPEG, audio, PDF), MessagePack bodies carrying such
+    images, responses that already carry a Content-Encoding, and streamed responses
+    are sent unchanged. Every response of a compressible type gets
+    `Vary: Accept-Encoding`, compressed or not, so caches keep the variants apart.
+    Levels favour speed over ratio since every response is compressed on the fly.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: Optional[int] = None,
+        gzip_level: int = 5,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = (
+            minimum_size
+            if minimum_size is not None
+            else int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+        )
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                encoding = choose_encoding(value.decode("latin-1"))
+                break
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            media_type = _media_type(start)
+            if media_type is not None:
+                compressed = None
+                if encoding is not None:
+                    compressed = self._maybe_compress(
+                        start, message, body, encoding, media_type
+                    )
+                if compressed is not None:
+                    body, headers = compressed
+                    message = {**message, "body": body}
+                else:
+                    headers = list(start.get("headers", []))
+                start = {**start, "headers": _add_vary(headers)}
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _maybe_compress(
+        self, start: dict, message: dict, body: bytes, encoding: str, media_type: str
+    ) -> Optional[Tuple[bytes, list]]:
+        if message.get("more_body", False) or len(body) < self.minimum_size:
+            return None
+        if media_type.startswith(MSGPACK_TYPES) and carries_compressed_image(body):
+            return None
+
+        compressed = self.compress(body, encoding)
+        COMPRESSED_BYTES.labels(encoding, "in").inc(len(body))
+        COMPRESSED_BYTES.labels(encoding, "out").inc(len(compressed))
+        headers = [
+            (name, value)
+            for name, value in start.get("headers", [])
+            if name != b"content-length"
+        ]
+        headers += [
+            (b"content-encoding", encoding.encode()),
+            (b"content-length", str(len(compressed)).encode()),
+        ]
+        return compressed, headers
+
+
+def _media_type(start: dict) -> Optional[str]:
+    # Media type of a response the middleware may compress, or None.
+    content_type = b""
+    for name, value in start.get("headers", []):
+        if name == b"content-encoding":
+            return None
+        if name == b"content-type":
+            content_type = value
+    media_type = content_type.split(b";")[0].strip().decode("latin-1").lower()
+    return media_type if media_type.startswith(COMPRESSIBLE_TYPES) else None
+
+
+def _add_vary(headers: list) -> list:
+    vary = [v for n, v in headers if n == b"vary"]
+    if any(b"accept-encoding" in v.lower() for v in vary):
+        return headers
+    headers = [(n, v) for n, v in headers if n != b"vary"]
+    headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+    return headers
@@ -1,5 +1,9 @@
-from typing import Any, Dict
+import hashlib
+from typing import Any, Dict, Optional
+from xml.etree import ElementTree
 
+import project.metrics
+import project.network
 from pydantic import BaseModel
 
 
@@ -12,12 +16,104 @@ class FeedConversionResponse(BaseModel):
     feed_json: Dict[str, Any]
 
 
-def convert_feed_to_json(feed_url: str) -> FeedConversionResponse:
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child(element: ElementTree.Element, *names: str) -> Optional[ElementTree.Element]:
+    for child in element:
+        if _local(child.tag) in names:
+            return child
+    return None
+
+
+def _text(element: ElementTree.Element, *names: str) -> Optional[str]:
+    child = _child(element, *names)
+    if child is None or child.text is None:
+        return None
+    return child.text.strip() or None
+
+
+def _link(element: ElementTree.Element, rel: str = "alternate") -> Optional[str]:
+    # RSS puts the URL in the text of <link>, Atom in the href of <link rel=...>.
+    for child in element:
+        if _local(child.tag) != "link":
+            continue
+        href = child.get("href")
+        if href is None:
+            if rel == "alternate" and child.text and child.text.strip():
+                return child.text.strip()
+        elif child.get("rel", "alternate") == rel:
+            return href
+    return None
+
+
+def _item(element: ElementTree.Element) -> Dict[str, Any]:
+    title = _text(element, "title")
+    link = _link(element)
+    description = _text(element, "description", "summary", "content")
+    item_id = _text(element, "guid", "id") or link
+    if item_id is None:
+        item_id = hashlib.sha1(f"{title}\n{description}".encode()).hexdigest()
+    return {
+        "id": item_id,
+        "title": title,
+        "link": link,
+        "description": description,
+        "published": _text(element, "pubDate", "published", "updated", "date"),
+    }
+
+
+def parse_feed(content: bytes) -> Dict[str, Any]:
+    """
+    Parses an RSS 2.0, RSS 1.0 or Atom document.
+
+    Args:
+        content (bytes): The feed document.
+
+    Returns:
+        Dict[str, Any]: The feed's `title`, `link`, `description` and `items`, plus the
+        `hub` and `self` URLs when the feed advertises a WebSub hub.
+
+    Raises:
+        ValueError: If the document is not well-formed XML or not a feed.
+    """
+    try:
+        root = ElementTree.fromstring(content)
+    except ElementTree.ParseError as e:
+        raise ValueError(f"The feed is not valid XML: {e}") from e
+    kind = _local(root.tag)
+    if kind == "feed":
+        channel, items = root, [e for e in root if _local(e.tag) == "entry"]
+    elif kind in ("rss", "RDF"):
+        channel = _child(root, "channel")
+        if channel is None:
+            raise ValueError("The RSS document has no channel.")
+        # RSS 2.0 nests items in the channel, RSS 1.0 places them next to it.
+        items = [e for e in channel if _local(e.tag) == "item"]
+        items += [e for e in root if _local(e.tag) == "item"]
+    else:
+        raise ValueError(f"Unsupported feed format '{kind}'.")
+
+    feed: Dict[str, Any] = {
+        "title": _text(channel, "title"),
+        "link": _link(channel),
+        "description": _text(channel, "description", "subtitle"),
+        "items": [_item(e) for e in items],
+    }
+    for rel in ("hub", "self"):
+        url = _link(channel, rel)
+        if url:
+            feed[rel] = url
+    return feed
+
+
+async def convert_feed_to_json(feed_url: str) -> FeedConversionResponse:
     """
     Converts an RSS or Atom feed into a structured JSON format.
 
-    This function is supposed to utilize an external library to parse the RSS/Atom feed and convert it into JSON.
-    However, since external libraries cannot be imported, the implementation details on how the feed parsing and conversion is done are omitted.
+    Clients that want to follow a feed should subscribe through POST /feeds and read
+    new items with GET /feeds/{feed_id}/items instead of converting it repeatedly.
 
     Args:
         feed_url (str): The URL of the RSS or Atom feed that needs to be converted to JSON format.
@@ -25,25 +121,24 @@ def convert_feed_to_json(feed_url: str) -> FeedConversionResponse:
     Returns:
         FeedConversionResponse: Outputs the converted RSS/Atom feed in a structured JSON format, mirroring the essential elements of the source feed.
 
-    For demonstration purposes, the response is being hard-coded as this is an illustrative example.
-    """
-    feed_json_example = {
-        "title": "Example Feed Title",
-        "link": "https://example.com/feed",
-        "description": "This is an example of an RSS feed converted to JSON.",
-        "items": [
-            {
-                "title": "Example Item 1",
-                "link": "https://example.com/item1",
-                "description": "This is an example item from an RSS feed.",
-                "published": "2023-10-01T12:00:00",
-            },
-            {
-                "title": "Example Item 2",
-                "link": "https://example.com/item2",
-                "description": "This is another example item from an RSS feed.",
-                "published": "2023-10-02T13:00:00",
-            },
-        ],
-    }
-    return FeedConversionResponse(status="success", feed_json=feed_json_example)
+    Raises:
+        ValueError: If the URL, or a redirect, targets a non-public host, or the document is not an RSS or Atom feed.
+        httpx.HTTPStatusError: If the feed server answers with an error status.
+        httpx.RequestError: If the feed server cannot be reached.
+    """
+    async with project.network.public_client(
+        "feed_url", follow_redirects=True
+    ) as client:
+        with project.metrics.timed("convert_feed_to_json", "upstream_fetch"):
+            response = await client.get(feed_url)
+    response.raise_for_status()
+    with project.metrics.timed("convert_feed_to_json", "parse"):
+        feed_json = parse_feed(response.content)
+    return FeedConversionResponse(status="success", feed_json=feed_json)
+
+
+def warm_up() -> None:
+    """
+    Imports httpx ahead of the first request.
+    """
+    import httpx  # noqa: F401
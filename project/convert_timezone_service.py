@@ -1,6 +1,5 @@
 from datetime import datetime
 
-import pytz
 from pydantic import BaseModel
 
 
@@ -28,6 +27,8 @@ def convert_timezone(
     Returns:
         TimezoneConvertResponse: Response model showing the converted timestamp and the target time zone details.
     """
+    import pytz
+
     source_tz = pytz.timezone(source_timezone)
     naive_datetime = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S")
     localized_datetime = source_tz.localize(naive_datetime)
@@ -39,3 +40,12 @@ def convert_timezone(
         source_timezone=source_timezone,
         target_timezone=target_timezone,
     )
+
+
+def warm_up() -> None:
+    """
+    Imports pytz and its timezone database index ahead of the first request.
+    """
+    import pytz
+
+    pytz.all_timezones_set
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import project.analytics
+import project.imaging
+import project.metrics
+import project.registry
+from pydantic import BaseModel, Field, ValidationError
+
+logger = logging.getLogger(__name__)
+
+MAX_OPERATIONS = 50
+MAX_DEADLINE_MS = 60000
+
+OPERATION_LATENCY = project.metrics.REGISTRY.histogram(
+    "multitool_batch_operation_duration_seconds",
+    "Latency of individual operations executed through /batch, by tool and status.",
+    ("tool", "status"),
+)
+
+
+class BatchOperation(BaseModel):
+    """
+    One tool call inside a batch: the tool name as listed by the registry and its
+    keyword parameters, named as in the tool's own endpoint.
+    """
+
+    tool: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+
+class BatchRequest(BaseModel):
+    """
+    A list of tool calls executed together under one deadline.
+    """
+
+    operations: List[BatchOperation]
+    deadline_ms: int = 10000
+
+
+class BatchOperationResult(BaseModel):
+    """
+    The outcome of one operation; `status` follows HTTP semantics (200, 404 for an
+    unavailable tool, 422 for invalid parameters, 500 for a failure, 504 when the
+    deadline expired first).
+    """
+
+    tool: str
+    status: int
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    elapsed_ms: float
+
+
+class BatchResponse(BaseModel):
+    """
+    Results in the same order as the submitted operations.
+    """
+
+    results: List[BatchOperationResult]
+    elapsed_ms: float
+
+
+def _record(tool: str, status: int, seconds: float) -> BatchOperationResult:
+    OPERATION_LATENCY.labels(tool, str(status)).observe(seconds)
+    spec = project.registry.TOOLS.get(tool)
+    if spec is not None:
+        project.analytics.usage_aggregator.record(spec.group, tool, status, seconds)
+    return BatchOperationResult(
+        tool=tool, status=status, elapsed_ms=round(seconds * 1000, 3)
+    )
+
+
+async def _run_operation(operation: BatchOperation) -> BatchOperationResult:
+    start = time.perf_counter()
+    try:
+        value = await project.registry.registry.invoke(operation.tool, operation.params)
+    except project.registry.ToolDisabledError as e:
+        outcome = _record(operation.tool, 404, time.perf_counter() - start)
+        outcome.error = str(e)
+    except ValidationError as e:
+        outcome = _record(operation.tool, 422, time.perf_counter() - start)
+        outcome.error = str(e)
+    except project.imaging.ImageTooLargeError as e:
+        outcome = _record(operation.tool, 413, time.perf_counter() - start)
+        outcome.error = str(e)
+    except project.imaging.ImageBudgetExhaustedError as e:
+        outcome = _record(operation.tool, 503, time.perf_counter() - start)
+        outcome.error = str(e)
+    except Exception as e:
+        logger.exception("Error processing batch operation %s", operation.tool)
+        outcome = _record(operation.tool, 500, time.perf_counter() - start)
+        outcome.error = str(e)
+    else:
+        outcome = _record(operation.tool, 200, time.perf_counter() - start)
+        outcome.result = (
+            value.model_dump(mode="json") if isinstance(value, BaseModel) else value
+        )
+    return outcome
+
+
+def validate_batch(request: BatchRequest) -> None:
+    """
+    Checks the size and deadline of a batch before any operation is charged or run.
+
+    Raises:
+        ValueError: If the batch is empty, too large or has an invalid deadline.
+    """
+    if not request.operations:
+        raise ValueError("operations must not be empty.")
+    if len(request.operations) > MAX_OPERATIONS:
+        raise ValueError(f"A batch may contain at most {MAX_OPERATIONS} operations.")
+    if not 1 <= request.deadline_ms <= MAX_DEADLINE_MS:
+        raise ValueError(f"deadline_ms must be between 1 and {MAX_DEADLINE_MS}.")
+
+
+async def execute_batch(request: BatchRequest) -> BatchResponse:
+    """
+    Executes several tool calls in one request and returns their results in order.
+
+    Coroutine services (upstream HTTP, database) run concurrently on the event loop
+    and blocking services (image, code and speech generation) run on the registry's
+    worker threads, so the batch takes roughly as long as its slowest operation.
+    Operations still running when the deadline expires are cancelled and reported
+    with status 504; a blocking operation already on a worker thread runs to
+    completion but its result is discarded.
+
+    Args:
+        request (BatchRequest): Up to 50 operations and a total deadline in milliseconds.
+
+    Returns:
+        BatchResponse: Results in the same order as the submitted operations.
+
+    Raises:
+        ValueError: If the batch is empty, too large or has an invalid deadline.
+    """
+    validate_batch(request)
+
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(_run_operation(operation))
+        for operation in request.operations
+    ]
+    _, pending = await asyncio.wait(tasks, timeout=request.deadline_ms / 1000)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results = []
+    for operation, task in zip(request.operations, tasks):
+        if task in pending:
+            outcome = _record(operation.tool, 504, time.perf_counter() - start)
+            outcome.error = "Deadline exceeded."
+            results.append(outcome)
+        else:
+            results.append(task.result())
+    return BatchResponse(
+        results=results, elapsed_ms=round((time.perf_counter() - start) * 1000, 3)
+    )
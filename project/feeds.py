@@ -0,0 +1,607 @@
+import asyncio
+import hmac
+import logging
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+import prisma
+import prisma.models
+import project.metrics
+import project.network
+from project.convert_feed_to_json_service import parse_feed
+
+logger = logging.getLogger(__name__)
+
+POLLS = project.metrics.REGISTRY.counter(
+    "multitool_feed_polls_total",
+    "Feed polls by outcome (new_items, unchanged, not_modified, failed).",
+    ("outcome",),
+)
+ITEMS = project.metrics.REGISTRY.counter(
+    "multitool_feed_items_ingested_total",
+    "New feed items stored, by source (poll, websub).",
+    ("source",),
+)
+WEBSUB_EVENTS = project.metrics.REGISTRY.counter(
+    "multitool_websub_events_total",
+    "WebSub events (requested, request_failed, verified, denied, delivered, rejected).",
+    ("event",),
+)
+
+_SIGNATURE_ALGORITHMS = ("sha1", "sha256", "sha384", "sha512")
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def adapt_interval(current: int, new_items: int, minimum: int, maximum: int) -> int:
+    """
+    Returns the next poll interval of a feed, in seconds: half the current one when the
+    last poll found new items, 1.5 times longer when it found none.
+
+    A feed that publishes steadily settles around its publishing period, a busy one is
+    polled every `minimum` seconds and a dormant one every `maximum` seconds.
+    """
+    interval = current / 2 if new_items else current * 1.5
+    return int(min(maximum, max(minimum, interval)))
+
+
+class WebSubPushRejectedError(Exception):
+    """
+    Raised for pushed content that does not come from a verified hub subscription,
+    or for a callback request without the subscription's token.
+    """
+
+
+def signature_valid(secret: str, body: bytes, header: Optional[str]) -> bool:
+    """
+    Checks a WebSub `X-Hub-Signature` header ('sha256=<hex>') against the body.
+    """
+    if not header:
+        return False
+    algorithm, _, digest = header.partition("=")
+    if algorithm not in _SIGNATURE_ALGORITHMS:
+        return False
+    expected = hmac.new(secret.encode(), body, algorithm).hexdigest()
+    return hmac.compare_digest(expected, digest.strip().lower())
+
+
+def _token_valid(feed: Any, token: str) -> bool:
+    return bool(feed.websubToken) and hmac.compare_digest(
+        feed.websubToken.encode(), token.encode()
+    )
+
+
+class FeedScheduler:
+    """
+    Registry of subscribed feeds and the background task that keeps their item index
+    current.
+
+    Feeds, their subscribers and their items are stored in the database, so every
+    worker process serves the same index. Each worker runs the scheduler; a worker
+    claims a due feed by moving its `nextPollAt` forward with a conditional update, so
+    each poll happens once no matter how many workers run.
+
+    Polls are conditional (ETag / Last-Modified) and the interval adapts to how often
+    the feed changes (see `adapt_interval`); failed polls back off exponentially.
+    When the feed advertises a WebSub hub and `PUBLIC_BASE_URL` is set, the scheduler
+    subscribes to the hub, which then pushes new content to
+    `/feeds/websub/{feed_id}/{token}`; verified feeds are still polled every
+    `max_interval` seconds as a safety net, and leases are renewed before they expire.
+    The random token is stored with the feed, and callbacks without it are refused.
+
+    Feed, redirect and hub URLs must resolve to public addresses (see
+    `project.network.check_public_url`).
+
+    Items are deduplicated per feed by their guid/id, and get an increasing `seq`
+    that clients use as a cursor. Ingests of one feed lock its row, so they commit in
+    `seq` order and a cursor never skips items. At most `max_items` items are kept per
+    feed.
+    """
+
+    def __init__(
+        self,
+        min_interval: int = 60,
+        max_interval: int = 6 * 3600,
+        initial_interval: int = 900,
+        concurrency: int = 8,
+        tick: float = 5.0,
+        claim_timeout: int = 120,
+        fetch_timeout: float = 20.0,
+        max_items: int = 1000,
+        lease_seconds: int = 7 * 86400,
+        verification_timeout: int = 3600,
+        callback_base_url: Optional[str] = None,
+        max_push_bytes: int = 2 * 2**20,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = initial_interval
+        self.concurrency = concurrency
+        self.tick = tick
+        self.claim_timeout = claim_timeout
+        self.fetch_timeout = fetch_timeout
+        self.max_items = max_items
+        self.lease_seconds = lease_seconds
+        self.verification_timeout = verification_timeout
+        self.max_push_bytes = max_push_bytes
+        self.callback_base_url = (
+            callback_base_url or os.environ.get("PUBLIC_BASE_URL") or ""
+        ).rstrip("/") or None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._requests: Set[asyncio.Task] = set()
+
+    def callback_url(self, feed_id: str, token: str) -> str:
+        return f"{self.callback_base_url}/feeds/websub/{feed_id}/{token}"
+
+    # Subscription registry
+
+    async def subscribe(self, url: str, user_id: Optional[str]) -> Any:
+        """
+        Adds a subscriber to a feed, registering and fetching the feed if it is new.
+
+        Returns:
+            prisma.models.Feed: The feed.
+
+        Raises:
+            ValueError: If the URL is not http(s) or not public, or a new feed cannot be fetched or parsed.
+        """
+        await project.network.check_public_url(url, "feed_url")
+        feed = await prisma.models.Feed.prisma().find_unique(where={"url": url})
+        if feed is None:
+            # Held back from the scheduler until the first poll below has finished.
+            feed = await prisma.models.Feed.prisma().upsert(
+                where={"url": url},
+                data={
+                    "create": {
+                        "url": url,
+                        "pollInterval": self.initial_interval,
+                        "nextPollAt": _utc_now()
+                        + timedelta(seconds=self.claim_timeout),
+                    },
+                    "update": {},
+                },
+            )
+            if feed.lastPolledAt is None:
+                try:
+                    await self.poll(feed, strict=True)
+                except Exception as e:
+                    await prisma.models.Feed.prisma().delete_many(
+                        where={"id": feed.id, "lastPolledAt": None}
+                    )
+                    raise ValueError(f"Could not fetch the feed: {e}") from e
+                feed = await prisma.models.Feed.prisma().find_unique(
+                    where={"id": feed.id}
+                )
+        existing = await prisma.models.FeedSubscription.prisma().find_first(
+            where={"feedId": feed.id, "userId": user_id}
+        )
+        if existing is None:
+            await prisma.models.FeedSubscription.prisma().create(
+                data={"feedId": feed.id, "userId": user_id}
+            )
+        return feed
+
+    async def unsubscribe(self, feed_id: str, user_id: Optional[str]) -> bool:
+        """
+        Removes a subscriber; the feed and its items are dropped with its last subscriber.
+
+        Returns:
+            bool: False if the user was not subscribed to the feed.
+        """
+        removed = await prisma.models.FeedSubscription.prisma().delete_many(
+            where={"feedId": feed_id, "userId": user_id}
+        )
+        if not removed:
+            return False
+        remaining = await prisma.models.FeedSubscription.prisma().count(
+            where={"feedId": feed_id}
+        )
+        if remaining == 0:
+            feed = await prisma.models.Feed.prisma().delete(where={"id": feed_id})
+            if feed is not None and feed.websubState != "NONE" and feed.hubUrl:
+                self._background(
+                    self._request_hub(
+                        feed.id, feed.hubUrl, feed.topicUrl, "unsubscribe", feed
+                    )
+                )
+        return True
+
+    async def is_subscribed(self, feed_id: str, user_id: Optional[str]) -> bool:
+        subscription = await prisma.models.FeedSubscription.prisma().find_first(
+            where={"feedId": feed_id, "userId": user_id}
+        )
+        return subscription is not None
+
+    async def items_since(self, feed_id: str, cursor: int, limit: int) -> List[Any]:
+        """
+        Returns up to `limit` items of a feed with a `seq` greater than `cursor`, oldest first.
+        """
+        with project.metrics.timed("feeds", "db_lookup"):
+            return await prisma.models.FeedItem.prisma().find_many(
+                where={"feedId": feed_id, "seq": {"gt": cursor}},
+                order={"seq": "asc"},
+                take=limit,
+            )
+
+    # Item index
+
+    async def ingest(
+        self, feed_id: str, items: List[Dict[str, Any]], source: str
+    ) -> int:
+        """
+        Stores the items not yet indexed for a feed.
+
+        Runs in a transaction holding the feed's row lock: `seq` values are taken at
+        insert time, so without it a push and a poll of the same feed on two workers
+        could commit out of `seq` order and clients past the later seq would never see
+        the earlier items.
+
+        Returns:
+            int: The number of new items.
+        """
+        if not items:
+            return 0
+        # Feeds list the newest item first; storing oldest first keeps seq chronological.
+        data = [
+            {
+                "feedId": feed_id,
+                "guid": item["id"][:2048],
+                "title": item.get("title"),
+                "link": item.get("link"),
+                "description": item.get("description"),
+                "published": item.get("published"),
+            }
+            for item in reversed(items)
+        ]
+        with project.metrics.timed("feeds", "db_write"):
+            async with prisma.get_client().tx(
+                timeout=timedelta(seconds=self.fetch_timeout)
+            ) as tx:
+                locked = await tx.query_raw(
+                    'SELECT id FROM "Feed" WHERE id = $1 FOR UPDATE', feed_id
+                )
+                if not locked:
+                    return 0
+                items_table = prisma.models.FeedItem.prisma(tx)
+                added = await items_table.create_many(data=data, skip_duplicates=True)
+                if added:
+                    oldest_kept = await items_table.find_first(
+                        where={"feedId": feed_id},
+                        order={"seq": "desc"},
+                        skip=self.max_items,
+                    )
+                    if oldest_kept is not None:
+                        await items_table.delete_many(
+                            where={"feedId": feed_id, "seq": {"lte": oldest_kept.seq}}
+                        )
+        ITEMS.labels(source).inc(added)
+        return added
+
+    # Polling
+
+    async def poll(self, feed: Any, strict: bool = False) -> int:
+        """
+        Fetches a feed, stores its new items and schedules its next poll.
+
+        Args:
+            feed (prisma.models.Feed): The feed to poll.
+            strict (bool): Raise fetch and parse errors instead of backing off.
+
+        Returns:
+            int: The number of new items.
+        """
+        now = _utc_now()
+        headers = {}
+        if feed.etag:
+            headers["If-None-Match"] = feed.etag
+        if feed.lastModified:
+            headers["If-Modified-Since"] = feed.lastModified
+        update: Dict[str, Any] = {"lastPolledAt": now}
+        new_items = 0
+        hub = topic = None
+        try:
+            async with project.network.public_client(
+                "feed_url", timeout=self.fetch_timeout, follow_redirects=True
+            ) as client:
+                with project.metrics.timed("feeds", "upstream_fetch"):
+                    response = await client.get(feed.url, headers=headers)
+            if response.status_code == 304:
+                outcome = "not_modified"
+            else:
+                response.raise_for_status()
+                with project.metrics.timed("feeds", "parse"):
+                    parsed = parse_feed(response.content)
+                new_items = await self.ingest(feed.id, parsed["items"], "poll")
+                outcome = "new_items" if new_items else "unchanged"
+                update["title"] = parsed.get("title")
+                update["etag"] = response.headers.get("etag")
+                update["lastModified"] = response.headers.get("last-modified")
+                hub = response.links.get("hub", {}).get("url") or parsed.get("hub")
+                topic = (
+                    response.links.get("self", {}).get("url")
+                    or parsed.get("self")
+                    or feed.url
+                )
+        except Exception as e:
+            if strict:
+                raise
+            outcome = "failed"
+            logger.warning("Polling feed %s failed: %s", feed.url, e)
+        POLLS.labels(outcome).inc()
+
+        if outcome == "failed":
+            failures = feed.failures + 1
+            delay = min(self.max_interval, feed.pollInterval * 2 ** min(failures, 10))
+            update["failures"] = failures
+        else:
+            update["failures"] = 0
+            # The first poll finds every item, which says nothing about the frequency.
+            update["pollInterval"] = (
+                adapt_interval(
+                    feed.pollInterval, new_items, self.min_interval, self.max_interval
+                )
+                if feed.lastPolledAt is not None
+                else feed.pollInterval
+            )
+            delay = (
+                self.max_interval
+                if feed.websubState == "VERIFIED"
+                else update["pollInterval"]
+            )
+        update["nextPollAt"] = now + timedelta(seconds=delay)
+        await prisma.models.Feed.prisma().update_many(
+            where={"id": feed.id}, data=update
+        )
+        if hub and self.callback_base_url and self._needs_websub(feed, hub, now):
+            await self._request_hub(feed.id, hub, topic, "subscribe", feed)
+        return new_items
+
+    def _needs_websub(self, feed: Any, hub: str, now: datetime) -> bool:
+        if feed.websubState != "NONE" and not feed.websubToken:
+            # Subscribed with a callback without token, which is now refused.
+            return True
+        if feed.websubState == "VERIFIED" and feed.hubUrl == hub:
+            # Renew while at least one safety-net poll remains before the lease ends.
+            renew_at = now + timedelta(seconds=2 * self.max_interval)
+            return feed.leaseExpiresAt is None or feed.leaseExpiresAt <= renew_at
+        # Not subscribed yet, awaiting verification, or denied: leaseExpiresAt holds
+        # the time after which to ask again.
+        return feed.leaseExpiresAt is None or feed.leaseExpiresAt <= now
+
+    async def _claim_due(self) -> List[Any]:
+        now = _utc_now()
+        due = await prisma.models.Feed.prisma().find_many(
+            where={"nextPollAt": {"lte": now}},
+            order={"nextPollAt": "asc"},
+            take=self.concurrency,
+        )
+        claimed = []
+        for feed in due:
+            count = await prisma.models.Feed.prisma().update_many(
+                where={"id": feed.id, "nextPollAt": feed.nextPollAt},
+                data={"nextPollAt": now + timedelta(seconds=self.claim_timeout)},
+            )
+            if count:
+                claimed.append(feed)
+        return claimed
+
+    async def run_once(self) -> int:
+        """
+        Claims and polls the feeds that are due, at most `concurrency` of them.
+
+        Returns:
+            int: The number of feeds polled.
+        """
+        feeds = await self._claim_due()
+        if feeds:
+            await asyncio.gather(
+                *(self.poll(feed) for feed in feeds), return_exceptions=True
+            )
+        return len(feeds)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                polled = await self.run_once()
+            except Exception:
+                logger.exception("Feed scheduler iteration failed")
+                polled = 0
+            if polled == self.concurrency:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.tick)
+            except asyncio.TimeoutError:
+                pass
+
+    def wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="feed-scheduler")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, *self._requests, return_exceptions=True)
+        self._task = None
+
+    # WebSub
+
+    def _background(self, coroutine) -> None:
+        task = asyncio.create_task(coroutine)
+        self._requests.add(task)
+        task.add_done_callback(self._requests.discard)
+
+    async def _request_hub(
+        self,
+        feed_id: str,
+        hub: str,
+        topic: Optional[str],
+        mode: str,
+        feed: Any = None,
+    ) -> None:
+        import httpx
+
+        try:
+            # The hub URL comes from the fetched feed, so it is as untrusted as the feed.
+            await project.network.check_public_url(hub, "hub_url")
+        except ValueError as e:
+            WEBSUB_EVENTS.labels("request_failed").inc()
+            logger.warning("Not sending WebSub %s request to %s: %s", mode, hub, e)
+            return
+        # Renewals keep the token and secret, so the callback and signatures stay valid.
+        token = feed.websubToken or secrets.token_urlsafe(24)
+        form = {
+            "hub.mode": mode,
+            "hub.topic": topic,
+            "hub.callback": self.callback_url(feed_id, token),
+        }
+        if mode == "subscribe":
+            secret = feed.websubSecret or secrets.token_hex(20)
+            form["hub.secret"] = secret
+            form["hub.lease_seconds"] = str(self.lease_seconds)
+            update: Dict[str, Any] = {
+                "hubUrl": hub,
+                "topicUrl": topic,
+                "websubToken": token,
+                "websubSecret": secret,
+            }
+            if feed.websubState != "VERIFIED":
+                update["websubState"] = "PENDING"
+                update["leaseExpiresAt"] = _utc_now() + timedelta(
+                    seconds=self.verification_timeout
+                )
+            await prisma.models.Feed.prisma().update_many(
+                where={"id": feed_id}, data=update
+            )
+        try:
+            async with project.network.public_client(
+                "hub_url", timeout=self.fetch_timeout
+            ) as client:
+                response = await client.post(hub, data=form)
+            response.raise_for_status()
+            WEBSUB_EVENTS.labels("requested").inc()
+        except (httpx.HTTPError, ValueError) as e:
+            WEBSUB_EVENTS.labels("request_failed").inc()
+            logger.warning("WebSub %s request to %s failed: %s", mode, hub, e)
+
+    async def verify_intent(
+        self,
+        feed_id: str,
+        token: str,
+        mode: Optional[str],
+        topic: Optional[str],
+        challenge: Optional[str],
+        lease_seconds: Optional[str],
+    ) -> Optional[str]:
+        """
+        Answers a hub's verification of intent (or its denial notice) for a callback.
+
+        Only requests carrying the callback token stored with the feed may change its
+        WebSub state; the feed id alone is known to every subscriber.
+
+        Returns:
+            Optional[str]: The body to answer with (the challenge when confirming), or
+            None to refuse with 404.
+        """
+        feed = await prisma.models.Feed.prisma().find_unique(where={"id": feed_id})
+        if feed is not None and not _token_valid(feed, token):
+            return None
+        if mode == "denied":
+            if feed is not None:
+                WEBSUB_EVENTS.labels("denied").inc()
+                await prisma.models.Feed.prisma().update_many(
+                    where={"id": feed_id},
+                    data={
+                        "websubState": "NONE",
+                        "leaseExpiresAt": _utc_now()
+                        + timedelta(seconds=self.max_interval),
+                    },
+                )
+            return ""
+        if not challenge:
+            return None
+        if mode == "unsubscribe":
+            # Only feeds without subscribers are unsubscribed, and those are deleted.
+            return challenge if feed is None or feed.websubState == "NONE" else None
+        if mode != "subscribe" or feed is None or feed.websubState == "NONE":
+            return None
+        if topic != feed.topicUrl:
+            return None
+        try:
+            lease = int(lease_seconds) if lease_seconds else self.lease_seconds
+        except ValueError:
+            lease = self.lease_seconds
+        await prisma.models.Feed.prisma().update_many(
+            where={"id": feed_id},
+            data={
+                "websubState": "VERIFIED",
+                "leaseExpiresAt": _utc_now() + timedelta(seconds=lease),
+            },
+        )
+        WEBSUB_EVENTS.labels("verified").inc()
+        return challenge
+
+    async def push_target(self, feed_id: str, token: str) -> Optional[Any]:
+        """
+        Looks up the feed a hub pushes content to, before any of the content is read.
+
+        Returns:
+            Optional[prisma.models.Feed]: The feed, or None if it is unknown.
+
+        Raises:
+            WebSubPushRejectedError: If the token is wrong or the feed has no verified
+                hub subscription.
+        """
+        feed = await prisma.models.Feed.prisma().find_unique(where={"id": feed_id})
+        if feed is None:
+            return None
+        if (
+            not _token_valid(feed, token)
+            or feed.websubState != "VERIFIED"
+            or not feed.websubSecret
+        ):
+            WEBSUB_EVENTS.labels("rejected").inc()
+            raise WebSubPushRejectedError(
+                f"Feed {feed_id} does not accept pushed content."
+            )
+        return feed
+
+    async def receive(self, feed: Any, body: bytes, signature: Optional[str]) -> int:
+        """
+        Stores the items of content pushed by a hub to a feed from `push_target`.
+
+        Returns:
+            int: The number of new items.
+
+        Raises:
+            WebSubPushRejectedError: If the content is not signed with the feed's secret.
+        """
+        # The callback needs no API key, so only content signed by the hub of a
+        # verified subscription may reach the item index.
+        if not signature_valid(feed.websubSecret, body, signature):
+            WEBSUB_EVENTS.labels("rejected").inc()
+            raise WebSubPushRejectedError(
+                f"Feed {feed.id} does not accept this pushed content."
+            )
+        try:
+            parsed = parse_feed(body)
+        except ValueError:
+            WEBSUB_EVENTS.labels("rejected").inc()
+            return 0
+        WEBSUB_EVENTS.labels("delivered").inc()
+        return await self.ingest(feed.id, parsed["items"], "websub")
+
+
+feed_scheduler = FeedScheduler()
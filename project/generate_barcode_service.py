@@ -1,8 +1,8 @@
 from tempfile import NamedTemporaryFile
 from typing import Optional
 
-import barcode
-from barcode.writer import ImageWriter
+import project.image_encoding
+import project.metrics
 from pydantic import BaseModel
 
 
@@ -14,6 +14,9 @@ class GenerateBarcodeResponse(BaseModel):
     barcode_image_url: str
     format: str
     content: str
+    image_format: Optional[str] = None
+    output_bytes: Optional[int] = None
+    compression_ratio: Optional[float] = None
 
 
 def generate_barcode(
@@ -24,6 +27,9 @@ def generate_barcode(
     color: Optional[str] = None,
     background_color: Optional[str] = None,
     text: Optional[str] = None,
+    image_format: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    accept: Optional[str] = None,
 ) -> GenerateBarcodeResponse:
     """
     Generates a barcode in a specified format with customization options.
@@ -36,28 +42,55 @@ def generate_barcode(
     color (Optional[str]): Hex code for the barcode color. Defaults to black if not specified.
     background_color (Optional[str]): Hex code for the barcode background color. Defaults to white if not specified.
     text (Optional[str]): Optional text to include with the barcode.
+    image_format (Optional[str]): 'png' (the default) or 'auto' for the smallest lossless format the client accepts, usually a 1-bit palette PNG.
+    max_bytes (Optional[int]): Target size for the 'auto' format; a lossy format is used only if no lossless one fits.
+    accept (Optional[str]): The client's Accept header, used by the 'auto' format.
 
     Returns:
     GenerateBarcodeResponse: The response containing the generated barcode data.
     """
-    if format.upper() not in barcode.PROVIDED_BARCODES:
+    import barcode
+    from barcode.writer import ImageWriter
+
+    if format.lower() not in barcode.PROVIDED_BARCODES:
         raise ValueError(f"Unsupported barcode format: {format}.")
+    if (image_format or "png").lower() not in ("png", "auto"):
+        raise ValueError(f"Unsupported image format: {image_format}.")
     barcode_class = barcode.get_barcode_class(format)
     writer_options = {
         "module_width": 0.2 if not width else width / 102.0,
         "module_height": 15.0 if not height else height,
         "foreground": color or "black",
         "background": background_color or "white",
-        "text": text,
+        "text": text or "",
         "write_text": bool(text),
         "quiet_zone": 1.0,
     }
     writer = ImageWriter()
-    with NamedTemporaryFile(delete=False, suffix=".png") as f:
-        barcode_instance = barcode_class(content, writer=writer)
-        barcode_instance.write(f, options=writer_options)
+    barcode_instance = barcode_class(content, writer=writer)
+    with project.metrics.timed("generate_barcode", "render"):
+        image = barcode_instance.render(writer_options)
+    with project.metrics.timed("generate_barcode", "encode"):
+        encoded = project.image_encoding.encode(
+            image, image_format or "png", accept, max_bytes=max_bytes
+        )
+    with NamedTemporaryFile(delete=False, suffix=f".{encoded.format.lower()}") as f:
+        f.write(encoded.data)
         image_url = f"{f.name}"
     response = GenerateBarcodeResponse(
-        barcode_image_url=image_url, format=format, content=content
+        barcode_image_url=image_url,
+        format=format,
+        content=content,
+        image_format=encoded.format.lower(),
+        output_bytes=len(encoded.data),
+        compression_ratio=round(encoded.compression_ratio, 2),
     )
     return response
+
+
+def warm_up() -> None:
+    """
+    Imports python-barcode and its Pillow writer ahead of the first request.
+    """
+    import barcode  # noqa: F401
+    from barcode.writer import ImageWriter  # noqa: F401
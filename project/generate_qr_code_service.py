@@ -1,7 +1,8 @@
 import base64
-from io import BytesIO
+from typing import Optional
 
-import qrcode
+import project.image_encoding
+import project.metrics
 from pydantic import BaseModel
 
 
@@ -12,10 +13,20 @@ class GenerateQRCodeResponse(BaseModel):
 
     qr_code_data: str
     format: str
+    image_format: Optional[str] = None
+    output_bytes: Optional[int] = None
+    compression_ratio: Optional[float] = None
 
 
 def generate_qr_code(
-    content: str, size: int, color: str, background_color: str, border: int
+    content: str,
+    size: int,
+    color: str,
+    background_color: str,
+    border: int,
+    image_format: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    accept: Optional[str] = None,
 ) -> GenerateQRCodeResponse:
     """
     Generates a custom QR Code based on user specifications
@@ -26,31 +37,63 @@ def generate_qr_code(
     color (str): The color of the QR code. This is in a standard web format (e.g., '#000000' for black).
     background_color (str): The background color of the QR code. Defaults to white if not specified.
     border (int): The size of the border around the QR code in pixels.
+    image_format (Optional[str]): 'png' (the default) or 'auto' for the smallest lossless format the client accepts, usually a 1-bit palette PNG.
+    max_bytes (Optional[int]): Target size for the 'auto' format; a lossy format is used only if no lossless one fits.
+    accept (Optional[str]): The client's Accept header, used by the 'auto' format.
 
     Returns:
     GenerateQRCodeResponse: This model wraps the response from the QR code generation endpoint, providing the generated QR code in a specified format.
     """
-    qr_code_image = qrcode.make(content, box_size=size // 40, border=border)
-    if color != "#000000" or background_color != "#FFFFFF":
-        qr_code_image = qr_code_image.convert("RGBA")
-        data = qr_code_image.getdata()
-        newData = []
-        for item in data:
-            if item[0] == 0:
-                newData.append(
-                    (int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16), 255)
-                )
-            else:
-                newData.append(
-                    (
-                        int(background_color[1:3], 16),
-                        int(background_color[3:5], 16),
-                        int(background_color[5:7], 16),
-                        255,
+    import qrcode
+
+    if (image_format or "png").lower() not in ("png", "auto"):
+        raise ValueError(f"Unsupported image format: {image_format}.")
+    with project.metrics.timed("generate_qr_code", "render"):
+        qr_code_image = qrcode.make(content, box_size=size // 40, border=border)
+    with project.metrics.timed("generate_qr_code", "colorize"):
+        if color != "#000000" or background_color != "#FFFFFF":
+            qr_code_image = qr_code_image.convert("RGBA")
+            data = qr_code_image.getdata()
+            newData = []
+            for item in data:
+                if item[0] == 0:
+                    newData.append(
+                        (
+                            int(color[1:3], 16),
+                            int(color[3:5], 16),
+                            int(color[5:7], 16),
+                            255,
+                        )
+                    )
+                else:
+                    newData.append(
+                        (
+                            int(background_color[1:3], 16),
+                            int(background_color[3:5], 16),
+                            int(background_color[5:7], 16),
+                            255,
+                        )
                     )
-                )
-        qr_code_image.putdata(newData)
-    buffered = BytesIO()
-    qr_code_image.save(buffered, format="PNG")
-    qr_code_base64 = base64.b64encode(buffered.getvalue()).decode()
-    return GenerateQRCodeResponse(qr_code_data=qr_code_base64, format="base64")
+            qr_code_image.putdata(newData)
+    if hasattr(qr_code_image, "get_image"):
+        qr_code_image = qr_code_image.get_image()
+    with project.metrics.timed("generate_qr_code", "encode"):
+        encoded = project.image_encoding.encode(
+            qr_code_image, image_format or "png", accept, max_bytes=max_bytes
+        )
+        qr_code_base64 = base64.b64encode(encoded.data).decode()
+    return GenerateQRCodeResponse(
+        qr_code_data=qr_code_base64,
+        format="base64",
+        image_format=encoded.format.lower(),
+        output_bytes=len(encoded.data),
+        compression_ratio=round(encoded.compression_ratio, 2),
+    )
+
+
+def warm_up() -> None:
+    """
+    Imports qrcode and its Pillow image factory ahead of the first request.
+    """
+    import qrcode
+    import qrcode.image.pil  # noqa: F401
@@ -1,7 +1,6 @@
 from typing import Optional
 
-import httpx
-from bs4 import BeautifulSoup
+import project.metrics
 from pydantic import BaseModel
 
 
@@ -26,10 +25,15 @@ async def generate_url_preview(url: str) -> UrlPreviewResponse:
     Returns:
     UrlPreviewResponse: The structured response containing metadata extracted from the URL for preview purposes.
     """
+    import httpx
+    from bs4 import BeautifulSoup
+
     async with httpx.AsyncClient() as client:
-        response = await client.get(url)
+        with project.metrics.timed("generate_url_preview", "upstream_fetch"):
+            response = await client.get(url)
         if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
+            with project.metrics.timed("generate_url_preview", "parse"):
+                soup = BeautifulSoup(response.text, "html.parser")
             title_tag = soup.find("title")
             title = title_tag.text.strip() if title_tag else None
             description_tag = soup.find("meta", attrs={"name": "description"})
@@ -51,3 +55,11 @@ async def generate_url_preview(url: str) -> UrlPreviewResponse:
             )
         else:
             return UrlPreviewResponse(url=url)
+
+
+def warm_up() -> None:
+    """
+    Imports httpx and BeautifulSoup ahead of the first request.
+    """
+    import httpx  # noqa: F401
+    from bs4 import BeautifulSoup  # noqa: F401
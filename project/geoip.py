@@ -0,0 +1,154 @@
+import bisect
+import csv
+import ipaddress
+import logging
+import os
+from array import array
+from typing import NamedTuple, Optional
+
+import project.shared
+
+logger = logging.getLogger(__name__)
+
+
+class GeoIPLocation(NamedTuple):
+    country: str
+    region: str
+    city: str
+    latitude: float
+    longitude: float
+
+
+class GeoIPTable:
+    """
+    IPv4 ranges and their locations, held in `SharedArray`s.
+
+    Built once in the serving master from a DB-IP style 'IP to City' CSV (start, end,
+    continent, country, region, city, latitude, longitude) and shared by every forked
+    worker. Location strings are packed into one UTF-8 blob with offsets, so lookups
+    never touch per-row Python objects.
+    """
+
+    def __init__(
+        self,
+        starts: array,
+        ends: array,
+        locations: array,
+        text: bytes,
+        offsets: array,
+        latitudes: array,
+        longitudes: array,
+    ):
+        self.starts = project.shared.SharedArray("I", starts)
+        self.ends = project.shared.SharedArray("I", ends)
+        self.locations = project.shared.SharedArray("I", locations)
+        self.text = project.shared.SharedArray("B", text)
+        self.offsets = project.shared.SharedArray("I", offsets)
+        self.latitudes = project.shared.SharedArray("d", latitudes)
+        self.longitudes = project.shared.SharedArray("d", longitudes)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            a.nbytes
+            for a in (
+                self.starts,
+                self.ends,
+                self.locations,
+                self.text,
+                self.offsets,
+                self.latitudes,
+                self.longitudes,
+            )
+        )
+
+    def _field(self, index: int) -> str:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return bytes(self.text[start:end]).decode()
+
+    def lookup(self, ip: str) -> Optional[GeoIPLocation]:
+        """
+        Returns the location of an IPv4 address, or None if it is not covered.
+        """
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if address.version != 4:
+            return None
+        value = int(address)
+        row = bisect.bisect_right(self.starts.view, value) - 1
+        if row < 0 or value > self.ends[row]:
+            return None
+        location = self.locations[row]
+        return GeoIPLocation(
+            country=self._field(3 * location),
+            region=self._field(3 * location + 1),
+            city=self._field(3 * location + 2),
+            latitude=self.latitudes[location],
+            longitude=self.longitudes[location],
+        )
+
+
+def load_csv(path: str) -> GeoIPTable:
+    """
+    Reads a DB-IP style 'IP to City' CSV into a `GeoIPTable`; IPv6 rows are skipped.
+    """
+    rows = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for record in csv.reader(f):
+            if len(record) < 8:
+                continue
+            try:
+                first = ipaddress.ip_address(record[0])
+                last = ipaddress.ip_address(record[1])
+            except ValueError:
+                continue
+            if first.version != 4:
+                continue
+            rows.append((int(first), int(last), record))
+    rows.sort(key=lambda row: row[0])
+
+    starts, ends, locations = array("I"), array("I"), array("I")
+    latitudes, longitudes = array("d"), array("d")
+    offsets = array("I", [0])
+    text = bytearray()
+    interned = {}
+    for first, last, record in rows:
+        key = (record[3], record[4], record[5], record[6], record[7])
+        location = interned.get(key)
+        if location is None:
+            location = interned[key] = len(latitudes)
+            for value in key[:3]:
+                text += value.encode()
+                offsets.append(len(text))
+            latitudes.append(float(key[3] or 0))
+            longitudes.append(float(key[4] or 0))
+        starts.append(first)
+        ends.append(last)
+        locations.append(location)
+    table = GeoIPTable(
+        starts, ends, locations, bytes(text), offsets, latitudes, longitudes
+    )
+    logger.info(
+        "Loaded %d IPv4 ranges (%d locations, %d bytes) from %s",
+        len(table),
+        len(latitudes),
+        table.nbytes,
+        path,
+    )
+    return table
+
+
+def load_configured() -> Optional[GeoIPTable]:
+    """
+    Loads the table named by GEOIP_DATABASE, or returns None when it is not set.
+    """
+    path = os.environ.get("GEOIP_DATABASE")
+    return load_csv(path) if path else None
+
+
+project.shared.register("geoip", load_configured)
@@ -0,0 +1,117 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+MAX_DAYS = 366 * 10
+MAX_CURRENCIES = 50
+_CURRENCY_CODE = re.compile(r"^[A-Z]{3}$")
+
+
+class ExchangeRateHistoryResponse(BaseModel):
+    """
+    Exchange rates of one base currency over a date range, in columnar form.
+
+    `periods` holds the first day of each period (each day, the Monday of each week or
+    the first of each month) and `rates` maps each target currency to one average rate
+    per period, or null where the provider has no rate (e.g. weekends).
+    """
+
+    base_currency: str
+    start_date: str
+    end_date: str
+    interval: str
+    periods: List[str]
+    rates: Dict[str, List[Optional[float]]]
+
+
+def _parse_currencies(value: str) -> List[str]:
+    codes = list(
+        dict.fromkeys(c.strip().upper() for c in value.split(",") if c.strip())
+    )
+    if not codes:
+        raise ValueError("At least one target currency is required.")
+    if len(codes) > MAX_CURRENCIES:
+        raise ValueError(f"At most {MAX_CURRENCIES} target currencies are allowed.")
+    invalid = [c for c in codes if not _CURRENCY_CODE.match(c)]
+    if invalid:
+        raise ValueError(f"Invalid currency codes: {', '.join(invalid)}.")
+    return codes
+
+
+async def get_exchange_rate_history(
+    base_currency: str,
+    target_currencies: str,
+    start_date: str,
+    end_date: Optional[str] = None,
+    interval: str = "day",
+) -> ExchangeRateHistoryResponse:
+    """
+    Retrieves daily exchange rates for a date range, optionally averaged per week or month.
+
+    Rates come from the in-process history store; ranges it has never seen are
+    backfilled from the provider in bulk and stored, so repeated and overlapping
+    queries cost no upstream calls.
+
+    Args:
+        base_currency (str): The code of the base currency (e.g., USD).
+        target_currencies (str): Comma separated target currency codes (e.g., 'EUR,GBP,JPY').
+        start_date (str): First day of the range, as YYYY-MM-DD.
+        end_date (Optional[str]): Last day of the range, as YYYY-MM-DD. Defaults to, and is capped at, yesterday.
+        interval (str): 'day', 'week' or 'month'; weekly and monthly rates are averages of the daily rates.
+
+    Returns:
+        ExchangeRateHistoryResponse: The periods of the range and the rates of each target currency.
+
+    Raises:
+        ValueError: If a currency code, date, interval or the range size is invalid.
+    """
+    import numpy as np
+    import project.rate_history
+
+    base_currency = base_currency.strip().upper()
+    if not _CURRENCY_CODE.match(base_currency):
+        raise ValueError(f"Invalid currency code: {base_currency}.")
+    targets = _parse_currencies(target_currencies)
+    if interval not in project.rate_history.INTERVALS:
+        raise ValueError(
+            f"Unknown interval '{interval}'; expected one of "
+            f"{', '.join(project.rate_history.INTERVALS)}."
+        )
+    yesterday = date.today() - timedelta(days=1)
+    first_day = datetime.strptime(start_date, "%Y-%m-%d").date()
+    last_day = (
+        min(datetime.strptime(end_date, "%Y-%m-%d").date(), yesterday)
+        if end_date
+        else yesterday
+    )
+    if last_day < first_day:
+        raise ValueError(
+            "The range must start before today and end_date must not be before start_date."
+        )
+    if (last_day - first_day).days >= MAX_DAYS:
+        raise ValueError(f"The range may span at most {MAX_DAYS} days.")
+
+    first = project.rate_history.day_number(first_day)
+    end = project.rate_history.day_number(last_day) + 1
+    periods, matrix = await project.rate_history.history.query(
+        base_currency, targets, first, end, interval
+    )
+    values = matrix.astype(object)
+    values[np.isnan(matrix)] = None
+    return ExchangeRateHistoryResponse(
+        base_currency=base_currency,
+        start_date=first_day.isoformat(),
+        end_date=last_day.isoformat(),
+        interval=interval,
+        periods=np.datetime_as_string(periods.astype("datetime64[D]")).tolist(),
+        rates=dict(zip(targets, values.tolist())),
+    )
+
+
+def warm_up() -> None:
+    """
+    Imports numpy, httpx and the history store ahead of the first request.
+    """
+    import project.rate_history  # noqa: F401
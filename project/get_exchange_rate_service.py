@@ -1,9 +1,9 @@
 from datetime import datetime
 from typing import Optional
 
-import httpx
 import prisma
 import prisma.models
+import project.metrics
 from pydantic import BaseModel
 
 
@@ -32,15 +32,16 @@ async def get_exchange_rate(
     Returns:
     GetExchangeRateResponse: Provides the exchange rate for a specified currency pair along with the date of the rate.
     """
-    rate_record = await prisma.models.APIRequest.prisma().find_first(
-        where={
-            "endpoint": f"{base_currency}_TO_{target_currency}",
-            "createdAt": datetime.strptime(date, "%Y-%m-%d")
-            if date
-            else datetime.now(),
-        },
-        order={"createdAt": "desc"},
-    )
+    with project.metrics.timed("get_exchange_rate", "db_lookup"):
+        rate_record = await prisma.models.APIRequest.prisma().find_first(
+            where={
+                "endpoint": f"{base_currency}_TO_{target_currency}",
+                "createdAt": (
+                    datetime.strptime(date, "%Y-%m-%d") if date else datetime.now()
+                ),
+            },
+            order={"createdAt": "desc"},
+        )
     if rate_record:
         return GetExchangeRateResponse(
             base_currency=base_currency,
@@ -48,29 +49,44 @@ async def get_exchange_rate(
             exchange_rate=rate_record.responseBody["rate"],
             date=date or datetime.now().strftime("%Y-%m-%d"),
         )
+    import httpx
+
     api_url = f"https://api.exchangerate.host/convert?from={base_currency}&to={target_currency}&date={date or 'latest'}"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(api_url)
+    with project.metrics.timed("get_exchange_rate", "upstream_fetch"):
+        async with httpx.AsyncClient() as client:
+            response = await client.get(api_url)
     response_data = response.json()
-    await prisma.models.APIRequest.prisma().create(
-        data={
-            "endpoint": f"{base_currency}_TO_{target_currency}",
-            "requestBody": {"from": base_currency, "to": target_currency, "date": date},
-            "responseBody": {"rate": response_data["info"]["rate"]},
-            "apiKey": {
-                "connectOrCreate": {
-                    "create": {
-                        "key": "DUMMY_API_KEY_FOR_DEMO_PURPOSES",
-                        "userId": "SOME_USER_ID",
-                    },
-                    "where": {"key": "DUMMY_API_KEY_FOR_DEMO_PURPOSES"},
-                }
-            },
-        }
-    )
+    with project.metrics.timed("get_exchange_rate", "db_write"):
+        await prisma.models.APIRequest.prisma().create(
+            data={
+                "endpoint": f"{base_currency}_TO_{target_currency}",
+                "requestBody": {
+                    "from": base_currency,
+                    "to": target_currency,
+                    "date": date,
+                },
+                "responseBody": {"rate": response_data["info"]["rate"]},
+                "apiKey": {
+                    "connectOrCreate": {
+                        "create": {
+                            "key": "DUMMY_API_KEY_FOR_DEMO_PURPOSES",
+                            "userId": "SOME_USER_ID",
+                        },
+                        "where": {"key": "DUMMY_API_KEY_FOR_DEMO_PURPOSES"},
+                    }
+                },
+            }
+        )
     return GetExchangeRateResponse(
         base_currency=base_currency,
         target_currency=target_currency,
         exchange_rate=response_data["info"]["rate"],
         date=response_data["date"],
     )
+
+
+def warm_up() -> None:
+    """
+    Imports httpx ahead of the first request.
+    """
+    import httpx  # noqa: F401
@@ -0,0 +1,78 @@
+from datetime import datetime
+from typing import List, Optional
+
+import project.auth
+import project.feeds
+from pydantic import BaseModel
+
+MAX_LIMIT = 500
+
+
+class FeedItem(BaseModel):
+    """
+    One stored feed item; `cursor` increases in the order items were received.
+    """
+
+    cursor: int
+    id: str
+    title: Optional[str] = None
+    link: Optional[str] = None
+    description: Optional[str] = None
+    published: Optional[str] = None
+    received_at: datetime
+
+
+class FeedItemsResponse(BaseModel):
+    """
+    Items of a subscribed feed received after the requested cursor, oldest first.
+
+    Pass `cursor` back on the next call; `has_more` is true when more items are waiting.
+    """
+
+    feed_id: str
+    items: List[FeedItem]
+    cursor: int
+    has_more: bool
+
+
+async def get_feed_items(
+    feed_id: str,
+    principal: Optional[project.auth.Principal],
+    cursor: int = 0,
+    limit: int = 100,
+) -> Optional[FeedItemsResponse]:
+    """
+    Returns the items of a feed stored since a cursor, from the item index only.
+
+    Args:
+        feed_id (str): The id returned when subscribing.
+        principal (Optional[Principal]): The caller, who must be subscribed to the feed.
+        cursor (int): The `cursor` of the previous response; 0 for every stored item.
+        limit (int): The maximum number of items to return, up to 500.
+
+    Returns:
+        Optional[FeedItemsResponse]: The new items, or None if the caller is not subscribed to the feed.
+    """
+    user_id = principal.user_id if principal else None
+    if not await project.feeds.feed_scheduler.is_subscribed(feed_id, user_id):
+        return None
+    limit = max(1, min(limit, MAX_LIMIT))
+    rows = await project.feeds.feed_scheduler.items_since(feed_id, cursor, limit + 1)
+    items = [
+        FeedItem(
+            cursor=row.seq,
+            id=row.guid,
+            title=row.title,
+            link=row.link,
+            description=row.description,
+            published=row.published,
+            received_at=row.createdAt,
+        )
+        for row in rows[:limit]
+    ]
+    return FeedItemsResponse(
+        feed_id=feed_id,
+        items=items,
+        cursor=items[-1].cursor if items else cursor,
+        has_more=len(rows) > limit,
+    )
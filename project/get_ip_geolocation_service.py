@@ -1,12 +1,17 @@
 from typing import Optional
 
-import httpx
+import project.geoip
+import project.metrics
+import project.shared
 from pydantic import BaseModel
 
 
 class GeoLocationResponse(BaseModel):
     """
     Outputs the geolocation details for the requested IP address, including country, region, city, and potentially more.
+
+    Addresses answered from the local GEOIP_DATABASE table have an empty `timezone` and
+    `isp` and no `zipcode` or `organization`, which the table does not record.
     """
 
     country: str
@@ -24,6 +29,9 @@ async def get_ip_geolocation(ip: str) -> GeoLocationResponse:
     """
     Retrieves geolocation data for a given IP address using an external IP Geolocation API.
 
+    IPv4 addresses covered by the local GEOIP_DATABASE table, shared by all workers,
+    are answered without calling the API; timezone and isp are then empty.
+
     Args:
         ip (str): The IP address for which geolocation data is being requested.
 
@@ -34,11 +42,29 @@ async def get_ip_geolocation(ip: str) -> GeoLocationResponse:
         ip_info = await get_ip_geolocation('8.8.8.8')
         print(ip_info)
     """
+    with project.metrics.timed("get_ip_geolocation", "local_lookup"):
+        # Built at startup; parsing it here would block the event loop.
+        table = project.shared.get("geoip", build=False)
+        location = table.lookup(ip) if table is not None else None
+    if location is not None:
+        return GeoLocationResponse(
+            country=location.country,
+            region=location.region,
+            city=location.city,
+            latitude=location.latitude,
+            longitude=location.longitude,
+            timezone="",
+            isp="",
+        )
+
+    import httpx
+
     GEOLOCATION_API_URL = (
         "https://api.ipgeolocation.io/ipgeo?apiKey=YOUR_API_KEY&ip=" + ip
     )
     async with httpx.AsyncClient() as client:
-        response = await client.get(GEOLOCATION_API_URL)
+        with project.metrics.timed("get_ip_geolocation", "upstream_fetch"):
+            response = await client.get(GEOLOCATION_API_URL)
         data = response.json()
         return GeoLocationResponse(
             country=data.get("country_name", ""),
@@ -51,3 +77,10 @@ async def get_ip_geolocation(ip: str) -> GeoLocationResponse:
             isp=data.get("isp", ""),
             organization=data.get("organization", None),
         )
+
+
+def warm_up() -> None:
+    """
+    Imports httpx ahead of the first request.
+    """
+    import httpx  # noqa: F401
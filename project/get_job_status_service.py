@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Any, Optional
+
+import project.auth
+import project.jobs
+from pydantic import BaseModel
+
+
+class JobStatusResponse(BaseModel):
+    """
+    The state of a background job; `result` is set once `status` is 'succeeded' and
+    `error` once it is 'failed' or 'cancelled'.
+    """
+
+    job_id: str
+    tool: str
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_job(cls, job: project.jobs.Job) -> "JobStatusResponse":
+        return cls(
+            job_id=job.id,
+            tool=job.tool,
+            status=job.status,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            result=job.result,
+            error=job.error,
+        )
+
+
+async def get_job_status(
+    job_id: str, principal: Optional[project.auth.Principal]
+) -> Optional[JobStatusResponse]:
+    """
+    Looks up a background job submitted by the same user.
+
+    Args:
+        job_id (str): The id returned when the job was submitted.
+        principal (Optional[Principal]): The caller; jobs of other users are not visible.
+
+    Returns:
+        Optional[JobStatusResponse]: The job's state, or None if it is unknown, expired or not the caller's.
+    """
+    job = await project.jobs.job_queue.get(job_id)
+    if job is None:
+        return None
+    if job.user_id is not None and (
+        principal is None or principal.user_id != job.user_id
+    ):
+        return None
+    return JobStatusResponse.from_job(job)
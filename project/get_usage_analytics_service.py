@@ -0,0 +1,109 @@
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import prisma.models
+import project.analytics
+from pydantic import BaseModel
+
+
+class FeatureUsage(BaseModel):
+    """
+    Usage of one feature on one day, merged across all server instances.
+    """
+
+    module: str
+    feature: str
+    day: str
+    calls: int
+    errors: int
+    client_errors: int
+    bytes_in: int
+    bytes_out: int
+    latency_p50_ms: Optional[float] = None
+    latency_p95_ms: Optional[float] = None
+    latency_p99_ms: Optional[float] = None
+
+
+class UsageAnalyticsResponse(BaseModel):
+    """
+    Daily per-feature usage served from the `Analytics` rollups.
+    """
+
+    since: str
+    features: List[FeatureUsage]
+
+
+_CACHE_TTL = 30.0
+_cache: Dict[Tuple[int, Optional[str]], Tuple[float, UsageAnalyticsResponse]] = {}
+
+
+def _to_ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+async def get_usage_analytics(
+    days: int, module: Optional[str]
+) -> UsageAnalyticsResponse:
+    """
+    Returns daily usage per feature for the last `days` days from the Analytics rollups.
+
+    Rollups are written by every server instance every minute, so figures lag live
+    traffic by up to one flush interval. Raw `APIRequest` rows are never scanned, and
+    responses are cached in-process for 30 seconds.
+
+    Args:
+        days (int): Number of days to include, counting today.
+        module (Optional[str]): Restrict the result to one Module (e.g. 'imaging').
+
+    Returns:
+        UsageAnalyticsResponse: Daily per-feature usage served from the `Analytics` rollups.
+    """
+    if not 1 <= days <= 366:
+        raise ValueError("days must be between 1 and 366.")
+    cache_key = (days, module)
+    cached = _cache.get(cache_key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    today = datetime.now(timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    since = today - timedelta(days=days - 1)
+    where: Dict = {"day": {"gte": since}}
+    if module:
+        where["feature"] = {"is": {"module": {"is": {"name": module}}}}
+    rows = await prisma.models.Analytics.prisma().find_many(
+        where=where, include={"feature": {"include": {"module": True}}}
+    )
+
+    merged: Dict[Tuple[str, str, str], project.analytics.FeatureStats] = {}
+    for row in rows:
+        key = (row.feature.module.name, row.feature.name, f"{row.day:%Y-%m-%d}")
+        stats = project.analytics.FeatureStats.from_json(row.metrics)
+        if key in merged:
+            merged[key].merge(stats)
+        else:
+            merged[key] = stats
+
+    response = UsageAnalyticsResponse(
+        since=f"{since:%Y-%m-%d}",
+        features=[
+            FeatureUsage(
+                module=module_name,
+                feature=feature,
+                day=day,
+                calls=stats.calls,
+                errors=stats.errors,
+                client_errors=stats.client_errors,
+                bytes_in=stats.bytes_in,
+                bytes_out=stats.bytes_out,
+                latency_p50_ms=_to_ms(stats.latency.quantile(0.50)),
+                latency_p95_ms=_to_ms(stats.latency.quantile(0.95)),
+                latency_p99_ms=_to_ms(stats.latency.quantile(0.99)),
+            )
+            for (module_name, feature, day), stats in sorted(merged.items())
+        ],
+    )
+    _cache[cache_key] = (time.monotonic() + _CACHE_TTL, response)
+    return response
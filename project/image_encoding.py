@@ -0,0 +1,221 @@
+from io import BytesIO
+from typing import List, NamedTuple, Optional
+
+import project.metrics
+import project.responses
+
+AUTO = "AUTO"
+MEDIA_TYPES = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "AVIF": "image/avif",
+}
+# Lossy formats from most to least efficient; AVIF needs a Pillow build or plugin
+# that can write it.
+LOSSY_FORMATS = ("AVIF", "WEBP", "JPEG")
+DEFAULT_QUALITY = 80
+MIN_QUALITY = 30
+MAX_QUALITY = 95
+PALETTE_COLORS = 256
+
+AUTO_FORMATS = project.metrics.REGISTRY.counter(
+    "multitool_image_auto_format_total",
+    "Encodings chosen for images requested in the 'auto' format, by format and kind.",
+    ("format", "kind"),
+)
+COMPRESSION_RATIO = project.metrics.REGISTRY.histogram(
+    "multitool_image_compression_ratio",
+    "Uncompressed pixel size divided by encoded size of produced images, by format.",
+    ("format",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+
+
+class EncodedImage(NamedTuple):
+    data: bytes
+    format: str
+    quality: Optional[int]
+    compression_ratio: float
+
+
+def raw_size(image) -> int:
+    """
+    Size of the image as uncompressed 8-bit samples, the baseline of compression ratios.
+    """
+    return image.width * image.height * len(image.getbands())
+
+
+def writable_formats() -> List[str]:
+    from PIL import Image
+
+    Image.init()
+    return [f for f in MEDIA_TYPES if f in Image.SAVE]
+
+
+def acceptable_formats(accept: Optional[str]) -> List[str]:
+    """
+    Lists the formats the client can decode, judged by its `Accept` header.
+
+    PNG and JPEG are acceptable unless refused with q=0. WebP and AVIF must be named
+    explicitly, as browsers and apps that decode them do; 'image/*' alone does not
+    count, since older clients send it too.
+    """
+    formats = []
+    for name in writable_formats():
+        media_type = MEDIA_TYPES[name]
+        if name in ("PNG", "JPEG"):
+            quality = project.responses.accept_quality(accept, media_type)
+            if quality is None or quality > 0:
+                formats.append(name)
+        elif (
+            project.responses.accept_quality(accept, media_type, exact=True) or 0
+        ) > 0:
+            formats.append(name)
+    return formats
+
+
+def _save(image, format: str, **options) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+def _palette(image):
+    # Exact palette of an opaque image with few colors, or None if it has more or
+    # quantizing would change any pixel.
+    if image.mode not in ("1", "L", "P", "RGB", "RGBA"):
+        return None
+    rgba = image.convert("RGBA")
+    if rgba.getextrema()[3][0] < 255:
+        return None
+    rgb = rgba.convert("RGB")
+    colors = rgb.getcolors(PALETTE_COLORS)
+    if colors is None:
+        return None
+    palette = rgb.quantize(colors=len(colors))
+    quantized = palette.convert("RGB").getcolors(PALETTE_COLORS) or []
+    if sorted(c for _, c in quantized) != sorted(c for _, c in colors):
+        return None
+    return palette
+
+
+def _lossy(
+    image, format: str, quality: Optional[int], max_bytes: Optional[int]
+) -> EncodedImage:
+    # Binary search for the highest quality that fits `max_bytes`, starting from
+    # `quality`; without a target, encode at `quality` once.
+    if format == "JPEG" and image.mode not in ("L", "RGB", "CMYK"):
+        image = image.convert("RGB")
+    ceiling = quality or (MAX_QUALITY if max_bytes else DEFAULT_QUALITY)
+    data = _save(image, format, quality=ceiling)
+    if max_bytes is None or len(data) <= max_bytes:
+        return EncodedImage(data, format, ceiling, raw_size(image) / len(data))
+    best = None
+    low, high = MIN_QUALITY, ceiling - 1
+    while low <= high:
+        middle = (low + high) // 2
+        candidate = _save(image, format, quality=middle)
+        if len(candidate) <= max_bytes:
+            best, low = (candidate, middle), middle + 1
+        else:
+            high = middle - 1
+    if best is None:
+        best = (_save(image, format, quality=MIN_QUALITY), MIN_QUALITY)
+    data, used = best
+    return EncodedImage(data, format, used, raw_size(image) / len(data))
+
+
+def _auto(
+    image,
+    accept: Optional[str],
+    quality: Optional[int],
+    max_bytes: Optional[int],
+) -> EncodedImage:
+    formats = acceptable_formats(accept)
+    ratio_base = raw_size(image)
+    candidates = []
+
+    # Graphics such as QR codes and barcodes: lossless, from a palette when possible.
+    palette = _palette(image)
+    if palette is not None:
+        kind = "graphic"
+        data = _save(palette, "PNG", optimize=True)
+        candidates.append(EncodedImage(data, "PNG", None, ratio_base / len(data)))
+        if "WEBP" in formats:
+            data = _save(image.convert("RGB"), "WEBP", lossless=True)
+            candidates.append(EncodedImage(data, "WEBP", None, ratio_base / len(data)))
+        best = min(candidates, key=lambda c: len(c.data))
+        if max_bytes is None or len(best.data) <= max_bytes:
+            AUTO_FORMATS.labels(best.format, kind).inc()
+            return best
+    else:
+        kind = "photo"
+
+    has_alpha = "A" in image.getbands() or "transparency" in image.info
+    lossy = [
+        f for f in LOSSY_FORMATS if f in formats and not (has_alpha and f == "JPEG")
+    ]
+    for format in lossy:
+        candidates.append(_lossy(image, format, quality, max_bytes))
+    if not candidates:
+        data = _save(image, "PNG", optimize=True)
+        candidates.append(EncodedImage(data, "PNG", None, ratio_base / len(data)))
+
+    # Quality scales differ between formats, so encodings are compared by size only:
+    # each lossy candidate already uses the highest quality meeting the target.
+    fitting = [c for c in candidates if max_bytes is None or len(c.data) <= max_bytes]
+    best = min(fitting or candidates, key=lambda c: len(c.data))
+    AUTO_FORMATS.labels(best.format, kind).inc()
+    return best
+
+
+def encode(
+    image,
+    format: str,
+    accept: Optional[str] = None,
+    quality: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+) -> EncodedImage:
+    """
+    Encodes an image in the given format, or picks the smallest acceptable one.
+
+    With 'auto', images with at most 256 opaque colors (QR codes, barcodes, logos)
+    are written losslessly as palette PNG or, if smaller, lossless WebP. Photos are
+    written as AVIF, WebP or JPEG, whichever is smallest among the formats the client
+    accepts; with `max_bytes`, the smallest of the encodings that meet it.
+
+    Args:
+        image (PIL.Image.Image): The image to encode.
+        format (str): 'auto' or a Pillow format name such as 'png' or 'webp'.
+        accept (Optional[str]): The client's Accept header, consulted by 'auto' only.
+        quality (Optional[int]): Quality of lossy formats, 1-100; default 80, or the highest that fits `max_bytes`.
+        max_bytes (Optional[int]): Target size; lossy formats lower their quality down to 30 to meet it.
+
+    Returns:
+        EncodedImage: The encoded bytes, their format, the quality used and the compression ratio.
+
+    Raises:
+        ValueError: If the format cannot be written, or `quality` or `max_bytes` is out of range.
+    """
+    from PIL import Image
+
+    if quality is not None and not 1 <= quality <= 100:
+        raise ValueError("Quality must be between 1 and 100.")
+    if max_bytes is not None and max_bytes <= 0:
+        raise ValueError("max_bytes must be positive.")
+    format = format.upper()
+    if format == "JPG":
+        format = "JPEG"
+    Image.init()
+    if format != AUTO and format not in Image.SAVE:
+        raise ValueError(f"Unsupported image format '{format.lower()}'.")
+    if format == AUTO:
+        encoded = _auto(image, accept, quality, max_bytes)
+    elif format in LOSSY_FORMATS:
+        encoded = _lossy(image, format, quality, max_bytes)
+    else:
+        data = _save(image, format)
+        encoded = EncodedImage(data, format, None, raw_size(image) / len(data))
+    COMPRESSION_RATIO.labels(encoded.format).observe(encoded.compression_ratio)
+    return encoded
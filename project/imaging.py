@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Deque, Iterator, Optional, Tuple
+
+import project.metrics
+
+BUDGET_CAPACITY = project.metrics.REGISTRY.gauge(
+    "multitool_image_memory_budget_bytes",
+    "Decoded image memory this worker process admits at once.",
+)
+BUDGET_RESERVED = project.metrics.REGISTRY.gauge(
+    "multitool_image_memory_reserved_bytes",
+    "Decoded image memory currently reserved by running image operations.",
+)
+ADMISSION_WAITING = project.metrics.REGISTRY.gauge(
+    "multitool_image_admission_waiting",
+    "Image operations queued until enough of the memory budget is free.",
+)
+ADMISSIONS = project.metrics.REGISTRY.counter(
+    "multitool_image_admissions_total",
+    "Image admission decisions (admitted, queued, rejected_too_large, rejected_busy).",
+    ("outcome",),
+)
+ADMISSION_WAIT = project.metrics.REGISTRY.histogram(
+    "multitool_image_admission_wait_seconds",
+    "Time image operations waited for memory budget before being admitted.",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+DECODES = project.metrics.REGISTRY.counter(
+    "multitool_image_decodes_total",
+    "Image decodes by kind (full, reduced).",
+    ("kind",),
+)
+
+# Bytes per pixel of Pillow's in-memory storage; 3-band modes are padded to 4.
+_ONE_BYTE_MODES = ("1", "L", "P")
+_TWO_BYTE_MODES = ("I;16", "I;16L", "I;16B", "I;16N")
+
+
+class ImageTooLargeError(ValueError):
+    """
+    Raised when an image could never be processed within the limits, whatever the load.
+    """
+
+
+class ImageBudgetExhaustedError(Exception):
+    """
+    Raised when an image operation waited too long for memory budget; retry later.
+    """
+
+
+def decoded_bytes(mode: str, size: Tuple[int, int]) -> int:
+    """
+    Estimates the memory Pillow needs to hold an image of the given mode and size.
+    """
+    if mode in _ONE_BYTE_MODES:
+        per_pixel = 1
+    elif mode in _TWO_BYTE_MODES:
+        per_pixel = 2
+    else:
+        per_pixel = 4
+    return size[0] * size[1] * per_pixel
+
+
+class ImageMemoryBudget:
+    """
+    Per-process budget of decoded image memory shared by all image operations.
+
+    An operation reserves the bytes it will hold before decoding anything. Operations
+    that do not fit wait in FIFO order for up to `timeout` seconds, so a burst of large
+    images is processed a few at a time instead of exhausting memory; operations that
+    need more than the whole budget are rejected immediately.
+
+    Reservations block the calling thread, so they must be taken on worker threads,
+    never on the event loop.
+    """
+
+    def __init__(
+        self,
+        capacity: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        if capacity is None:
+            capacity = int(os.environ.get("IMAGE_MEMORY_BUDGET_MB", "512")) * 2**20
+        if timeout is None:
+            timeout = float(os.environ.get("IMAGE_ADMISSION_TIMEOUT", "10"))
+        self.capacity = capacity
+        self.timeout = timeout
+        self.reserved = 0
+        self._condition = threading.Condition()
+        self._waiting: Deque[object] = deque()
+        BUDGET_CAPACITY.set(capacity)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def _admissible(self, ticket: object, nbytes: int) -> bool:
+        return self._waiting[0] is ticket and self.reserved + nbytes <= self.capacity
+
+    @contextmanager
+    def reserve(self, nbytes: int, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        Holds `nbytes` of the budget for the duration of the block.
+
+        Raises:
+            ImageTooLargeError: If `nbytes` exceeds the whole budget.
+            ImageBudgetExhaustedError: If the bytes did not become free within the timeout.
+        """
+        if nbytes > self.capacity:
+            ADMISSIONS.labels("rejected_too_large").inc()
+            raise ImageTooLargeError(
+                f"The image needs {nbytes // 2**20} MiB of memory to process, more "
+                f"than the {self.capacity // 2**20} MiB allowed."
+            )
+        start = time.monotonic()
+        with self._condition:
+            if self._waiting or self.reserved + nbytes > self.capacity:
+                ADMISSIONS.labels("queued").inc()
+                ticket = object()
+                self._waiting.append(ticket)
+                ADMISSION_WAITING.set(len(self._waiting))
+                deadline = start + (self.timeout if timeout is None else timeout)
+                try:
+                    while not self._admissible(ticket, nbytes):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            ADMISSIONS.labels("rejected_busy").inc()
+                            raise ImageBudgetExhaustedError(
+                                "Too many large images are being processed; retry later."
+                            )
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting.remove(ticket)
+                    ADMISSION_WAITING.set(len(self._waiting))
+                    self._condition.notify_all()
+            self.reserved += nbytes
+            BUDGET_RESERVED.set(self.reserved)
+        ADMISSIONS.labels("admitted").inc()
+        ADMISSION_WAIT.observe(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.reserved -= nbytes
+                BUDGET_RESERVED.set(self.reserved)
+                self._condition.notify_all()
+
+
+budget = ImageMemoryBudget()
+
+
+def max_pixels() -> int:
+    return int(os.environ.get("IMAGE_MAX_PIXELS", "100000000"))
+
+
+def _pillow():
+    from PIL import Image
+
+    # Pillow's bomb check is process-wide; align it with our limit once instead of
+    # changing it around each open, which races between worker threads. Every thread
+    # assigns the same value, so concurrent first calls are harmless.
+    if Image.MAX_IMAGE_PIXELS != max_pixels():
+        Image.MAX_IMAGE_PIXELS = max_pixels()
+    return Image
+
+
+def open_image(data: bytes):
+    """
+    Opens an image reading only its header, so its size and mode are known before any
+    pixel data is decoded.
+
+    Returns:
+        PIL.Image.Image: The lazily loaded image.
+
+    Raises:
+        ImageTooLargeError: If the image has more than IMAGE_MAX_PIXELS pixels.
+        PIL.UnidentifiedImageError: If the data is not a supported image.
+    """
+    Image = _pillow()
+    limit = max_pixels()
+    try:
+        image = Image.open(BytesIO(data))
+    except Image.DecompressionBombError as e:
+        ADMISSIONS.labels("rejected_too_large").inc()
+        raise ImageTooLargeError(str(e)) from e
+    pixels = image.width * image.height
+    if pixels > limit:
+        ADMISSIONS.labels("rejected_too_large").inc()
+        raise ImageTooLargeError(
+            f"The image has {pixels} pixels; at most {limit} are allowed."
+        )
+    return image
+
+
+def reduce_on_decode(image, size: Tuple[int, int]) -> bool:
+    """
+    Asks the decoder to produce a smaller image that is still at least `size`.
+
+    JPEG decoders can scale by 1/2, 1/4 or 1/8 while decoding, which cuts decode time
+    and memory by up to 64 times for thumbnails of large photos. Other formats are
+    decoded in full.
+
+    Returns:
+        bool: True if the image will be decoded at a reduced size.
+    """
+    if image.format != "JPEG" or (size[0] >= image.width and size[1] >= image.height):
+        return False
+    original = image.size
+    image.draft(image.mode, size)
+    return image.size != original
+
+
+@contextmanager
+def admitted(
+    image, output_size: Tuple[int, int], output_mode: Optional[str] = None
+) -> Iterator[None]:
+    """
+    Holds the budget needed to decode `image` and produce an image of `output_size`.
+
+    Call `reduce_on_decode` first so the reservation covers the reduced size, and
+    decode the image inside the block.
+    """
+    nbytes = decoded_bytes(image.mode, image.size) + decoded_bytes(
+        output_mode or image.mode, output_size
+    )
+    with budget.reserve(nbytes):
+        yield
@@ -0,0 +1,472 @@
+import asyncio
+import inspect
+import itertools
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set
+from uuid import uuid4
+
+import project.analytics
+import project.auth
+import project.metrics
+import project.network
+import project.registry
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+JOBS = project.metrics.REGISTRY.counter(
+    "multitool_jobs_total",
+    "Background jobs by tool and outcome (submitted, rejected, succeeded, failed, timed_out, cancelled).",
+    ("tool", "outcome"),
+)
+JOB_QUEUE_DEPTH = project.metrics.REGISTRY.gauge(
+    "multitool_job_queue_depth",
+    "Number of background jobs waiting for a worker.",
+)
+JOB_WAIT = project.metrics.REGISTRY.histogram(
+    "multitool_job_wait_seconds",
+    "Time background jobs spent queued before a worker picked them up, by plan.",
+    ("plan",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+CALLBACKS = project.metrics.REGISTRY.counter(
+    "multitool_job_callbacks_total",
+    "Job completion callbacks by outcome (delivered, failed, blocked).",
+    ("outcome",),
+)
+
+# Queued plus running jobs allowed per user; plans not listed use the FREE limit.
+PLAN_JOB_LIMITS: Dict[str, int] = {"FREE": 2, "BASIC": 10, "PREMIUM": 50}
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class JobQueueFullError(Exception):
+    """
+    Raised when the queue holds `max_queued` jobs; callers should retry later.
+    """
+
+
+class JobLimitExceededError(Exception):
+    """
+    Raised when a user already has as many unfinished jobs as their plan allows.
+    """
+
+
+class Job(BaseModel):
+    """
+    The state of one background tool call. Parameters are kept only until the job
+    runs; the result is the tool's response serialized to JSON.
+    """
+
+    id: str
+    tool: str
+    status: str = "queued"
+    plan: str
+    user_id: Optional[str] = None
+    callback_url: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+
+
+class JobStore:
+    """
+    Storage for job state; subclass to persist jobs outside the process.
+    """
+
+    async def put(self, job: Job) -> None:
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        raise NotImplementedError
+
+
+class LocalJobStore(JobStore):
+    """
+    In-process job store; jobs are visible only to the worker that accepted them.
+
+    Finished jobs are kept for `result_ttl` seconds and at most `max_jobs` jobs are
+    held, evicting the oldest finished ones first.
+    """
+
+    def __init__(self, result_ttl: float = 3600.0, max_jobs: int = 10_000):
+        self.result_ttl = result_ttl
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._expires_at: Dict[str, float] = {}
+
+    async def put(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        if job.status in FINISHED_STATUSES:
+            self._expires_at[job.id] = time.monotonic() + self.result_ttl
+            self._jobs.move_to_end(job.id)
+        self._evict()
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        expires_at = self._expires_at.get(job_id)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._jobs.pop(job_id, None)
+            del self._expires_at[job_id]
+            return None
+        return self._jobs.get(job_id)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [k for k, t in self._expires_at.items() if t <= now]
+        for job_id in expired:
+            self._jobs.pop(job_id, None)
+            del self._expires_at[job_id]
+        while len(self._jobs) > self.max_jobs and self._expires_at:
+            oldest = next(k for k in self._jobs if k in self._expires_at)
+            del self._jobs[oldest]
+            del self._expires_at[oldest]
+
+
+class DirectoryJobStore(JobStore):
+    """
+    Job store keeping one JSON file per job in a directory shared by the worker
+    processes of one host, so a job can be polled through any worker.
+
+    Files are replaced atomically; finished jobs are removed `result_ttl` seconds
+    after their last update.
+    """
+
+    def __init__(self, directory: str, result_ttl: float = 3600.0):
+        self.directory = directory
+        self.result_ttl = result_ttl
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _write(self, job: Job) -> None:
+        path = self._path(job.id)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            f.write(job.model_dump_json())
+        os.replace(temporary, path)
+
+    def _read(self, job_id: str) -> Optional[Job]:
+        if not job_id.isalnum():
+            return None
+        path = self._path(job_id)
+        try:
+            with open(path) as f:
+                job = Job.model_validate_json(f.read())
+        except FileNotFoundError:
+            return None
+        if (
+            job.status in FINISHED_STATUSES
+            and os.path.getmtime(path) + self.result_ttl < time.time()
+        ):
+            return None
+        return job
+
+    def _sweep(self) -> None:
+        cutoff = time.time() - self.result_ttl
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    async def put(self, job: Job) -> None:
+        await asyncio.to_thread(self._write, job)
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            await asyncio.to_thread(self._sweep)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await asyncio.to_thread(self._read, job_id)
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _priority(plan: str) -> int:
+    # Lower sorts first: PREMIUM before BASIC before FREE and unknown plans.
+    order = project.auth.PLAN_ORDER
+    return -order.index(plan) if plan in order else 0
+
+
+class JobQueue:
+    """
+    Priority queue of tool calls executed by a pool of background workers.
+
+    Jobs are ordered by the submitter's `Subscription.plan` (PREMIUM first), then by
+    submission order. Submissions are rejected once `max_queued` jobs are waiting or
+    the user already has their plan's number of unfinished jobs, so a burst of large
+    inputs cannot grow memory without bound. Blocking tools run on the registry's
+    worker threads, so `workers` bounds how many jobs execute at once.
+
+    A job exceeding `job_timeout` is reported as failed right away. Coroutine tools
+    are cancelled, but a blocking tool cannot be interrupted on its thread, so the
+    worker stays occupied until that thread returns and the bound still holds.
+
+    Callback URLs must resolve to public addresses, checked on submission and again
+    before each delivery; redirects are not followed.
+
+    All methods must be called from the event loop thread.
+    """
+
+    def __init__(
+        self,
+        store: Optional[JobStore] = None,
+        workers: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        job_timeout: float = 300.0,
+        callback_timeout: float = 10.0,
+        callback_attempts: int = 3,
+        shutdown_timeout: float = 30.0,
+    ):
+        if store is None:
+            directory = os.environ.get("JOB_STORE_DIR")
+            store = DirectoryJobStore(directory) if directory else LocalJobStore()
+        self.store = store
+        self.workers = workers or int(os.environ.get("JOB_WORKERS", "4"))
+        self.max_queued = max_queued or int(os.environ.get("JOB_QUEUE_SIZE", "1000"))
+        self.job_timeout = job_timeout
+        self.callback_timeout = callback_timeout
+        self.callback_attempts = callback_attempts
+        self.shutdown_timeout = shutdown_timeout
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._sequence = itertools.count()
+        self._unfinished_by_user: Dict[str, int] = {}
+        self._workers: Set[asyncio.Task] = set()
+        self._callbacks: Set[asyncio.Task] = set()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(
+        self,
+        tool: str,
+        params: Dict[str, Any],
+        principal: Optional[project.auth.Principal] = None,
+        callback_url: Optional[str] = None,
+    ) -> Job:
+        """
+        Validates and queues a tool call.
+
+        Args:
+            tool (str): The tool name, e.g. 'resize_image'.
+            params (Dict[str, Any]): Keyword arguments of the tool's service function.
+            principal (Optional[Principal]): The caller; anonymous callers get FREE priority.
+            callback_url (Optional[str]): An http(s) URL to POST the finished job to.
+
+        Returns:
+            Job: The queued job.
+
+        Raises:
+            ToolDisabledError: If the tool is unknown or disabled.
+            TypeError: If `params` do not match the tool's parameters.
+            ValueError: If `callback_url` is not an http(s) URL of a public host.
+            JobQueueFullError: If the queue is full.
+            JobLimitExceededError: If the user has too many unfinished jobs.
+        """
+        if self._queue is None:
+            raise JobQueueFullError("The job queue is not running.")
+        inspect.signature(project.registry.registry.load(tool)).bind(**params)
+        if callback_url is not None:
+            await project.network.check_public_url(callback_url, "callback_url")
+
+        plan = principal.plan if principal is not None else "FREE"
+        user_id = principal.user_id if principal is not None else None
+        if self._queue.qsize() >= self.max_queued:
+            JOBS.labels(tool, "rejected").inc()
+            raise JobQueueFullError("The job queue is full, retry later.")
+        if user_id is not None:
+            limit = PLAN_JOB_LIMITS.get(plan, PLAN_JOB_LIMITS["FREE"])
+            if self._unfinished_by_user.get(user_id, 0) >= limit:
+                JOBS.labels(tool, "rejected").inc()
+                raise JobLimitExceededError(
+                    f"The {plan} plan allows {limit} unfinished jobs at a time."
+                )
+            self._unfinished_by_user[user_id] = (
+                self._unfinished_by_user.get(user_id, 0) + 1
+            )
+
+        job = Job(
+            id=uuid4().hex,
+            tool=tool,
+            plan=plan,
+            user_id=user_id,
+            callback_url=callback_url,
+            created_at=_utc_now(),
+        )
+        await self.store.put(job)
+        self._queue.put_nowait(
+            (_priority(plan), next(self._sequence), time.monotonic(), job, params)
+        )
+        JOB_QUEUE_DEPTH.set(self._queue.qsize())
+        JOBS.labels(tool, "submitted").inc()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self.store.get(job_id)
+
+    async def _finish(
+        self, job: Job, status: str, outcome: str, seconds: float, http_status: int
+    ) -> None:
+        job.status = status
+        job.finished_at = _utc_now()
+        await self.store.put(job)
+        if job.user_id is not None:
+            remaining = self._unfinished_by_user.get(job.user_id, 1) - 1
+            if remaining > 0:
+                self._unfinished_by_user[job.user_id] = remaining
+            else:
+                self._unfinished_by_user.pop(job.user_id, None)
+        JOBS.labels(job.tool, outcome).inc()
+        spec = project.registry.TOOLS.get(job.tool)
+        if spec is not None and outcome != "cancelled":
+            project.analytics.usage_aggregator.record(
+                spec.group, job.tool, http_status, seconds
+            )
+        if job.callback_url is not None:
+            task = asyncio.create_task(self._notify(job))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    async def _run(self, job: Job, params: Dict[str, Any]) -> None:
+        job.status = "running"
+        job.started_at = _utc_now()
+        await self.store.put(job)
+        start = time.perf_counter()
+        call = asyncio.ensure_future(project.registry.registry.invoke(job.tool, params))
+        try:
+            # Shielded so that a timeout does not cancel the call before `_abandon`
+            # decides whether it can be cancelled at all.
+            value = await asyncio.wait_for(
+                asyncio.shield(call), timeout=self.job_timeout
+            )
+        except asyncio.TimeoutError:
+            job.error = f"The job did not finish within {self.job_timeout:g} seconds."
+            await self._finish(
+                job, "failed", "timed_out", time.perf_counter() - start, 504
+            )
+            await self._abandon(job, call)
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except ValidationError as e:
+            job.error = str(e)
+            await self._finish(
+                job, "failed", "failed", time.perf_counter() - start, 422
+            )
+        except Exception as e:
+            logger.exception("Error processing job %s (%s)", job.id, job.tool)
+            job.error = str(e)
+            await self._finish(
+                job, "failed", "failed", time.perf_counter() - start, 500
+            )
+        else:
+            job.result = (
+                value.model_dump(mode="json") if isinstance(value, BaseModel) else value
+            )
+            await self._finish(
+                job, "succeeded", "succeeded", time.perf_counter() - start, 200
+            )
+
+    async def _abandon(self, job: Job, call: asyncio.Future) -> None:
+        # Coroutine tools stop when cancelled; a blocking tool keeps its thread until
+        # it returns, so the worker waits for it and its result is discarded.
+        spec = project.registry.TOOLS.get(job.tool)
+        if spec is None or not spec.blocking:
+            call.cancel()
+        # asyncio.wait neither raises the call's outcome nor cancels the call when the
+        # worker itself is cancelled on shutdown.
+        await asyncio.wait({call})
+        if not call.cancelled() and call.exception() is not None:
+            logger.info("Timed-out job %s (%s) failed late", job.id, job.tool)
+
+    async def _worker(self, queue: asyncio.PriorityQueue) -> None:
+        while True:
+            _, _, queued_at, job, params = await queue.get()
+            JOB_QUEUE_DEPTH.set(queue.qsize())
+            JOB_WAIT.labels(job.plan).observe(time.monotonic() - queued_at)
+            try:
+                await self._run(job, params)
+            except asyncio.CancelledError:
+                # A timed-out job is already finished while its thread is awaited.
+                if job.status not in FINISHED_STATUSES:
+                    job.error = "The server shut down before the job finished."
+                    await self._finish(job, "cancelled", "cancelled", 0.0, 503)
+                raise
+            finally:
+                queue.task_done()
+
+    async def _notify(self, job: Job) -> None:
+        import httpx
+
+        try:
+            # Checked again at delivery: the host may resolve differently by now.
+            await project.network.check_public_url(job.callback_url, "callback_url")
+        except ValueError as e:
+            logger.warning("Not delivering callback for job %s: %s", job.id, e)
+            CALLBACKS.labels("blocked").inc()
+            return
+        body = job.model_dump_json(exclude={"user_id", "callback_url"})
+        async with httpx.AsyncClient(timeout=self.callback_timeout) as client:
+            for attempt in range(self.callback_attempts):
+                try:
+                    response = await client.post(
+                        job.callback_url,
+                        content=body,
+                        headers={"content-type": "application/json"},
+                    )
+                    if response.status_code < 500:
+                        CALLBACKS.labels("delivered").inc()
+                        return
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(2**attempt)
+        logger.warning("Could not deliver callback for job %s", job.id)
+        CALLBACKS.labels("failed").inc()
+
+    async def start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = {
+            asyncio.create_task(self._worker(self._queue), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        }
+
+    async def stop(self) -> None:
+        """
+        Stops accepting jobs, waits up to `shutdown_timeout` for queued and running
+        jobs, then cancels whatever is left.
+        """
+        if self._queue is None:
+            return
+        queue, self._queue = self._queue, None
+        try:
+            await asyncio.wait_for(queue.join(), timeout=self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Cancelling %d unfinished jobs on shutdown", queue.qsize())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = set()
+        while not queue.empty():
+            _, _, _, job, _ = queue.get_nowait()
+            job.error = "The server shut down before the job started."
+            await self._finish(job, "cancelled", "cancelled", 0.0, 503)
+        if self._callbacks:
+            await asyncio.wait(self._callbacks, timeout=self.callback_timeout)
+        JOB_QUEUE_DEPTH.set(0)
+
+
+job_queue = JobQueue()
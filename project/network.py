@@ -0,0 +1,53 @@
+import asyncio
+import ipaddress
+import socket
+from urllib.parse import urlsplit
+
+
+async def check_public_url(url: str, name: str = "url") -> None:
+    """
+    Refuses URLs that would make the server call itself or its private network: the
+    URL must be http(s) and its host must resolve to public addresses only. Loopback,
+    private, link-local, multicast and reserved addresses are refused.
+
+    Args:
+        url (str): The URL the server is about to request.
+        name (str): How the URL is called in error messages, e.g. 'callback_url'.
+
+    Raises:
+        ValueError: If the URL is malformed or targets a non-public address.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"{name} must be an http or https URL.")
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = await asyncio.get_running_loop().getaddrinfo(
+            parts.hostname, port, type=socket.SOCK_STREAM
+        )
+    except (OSError, ValueError) as e:
+        raise ValueError(f"{name} host cannot be resolved: {e}") from e
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%", 1)[0])
+        if not address.is_global:
+            raise ValueError(f"{name} must not target a private or local address.")
+
+
+def public_client(name: str = "url", **kwargs):
+    """
+    Returns an `httpx.AsyncClient` that applies `check_public_url` to every request it
+    sends, including each redirect it follows.
+
+    Args:
+        name (str): How the URL is called in error messages.
+        **kwargs: Passed to `httpx.AsyncClient`, e.g. `timeout` or `follow_redirects`.
+
+    Returns:
+        httpx.AsyncClient: The client; requests to non-public hosts raise ValueError.
+    """
+    import httpx
+
+    async def check(request: httpx.Request) -> None:
+        await check_public_url(str(request.url), name)
+
+    return httpx.AsyncClient(event_hooks={"request": [check]}, **kwargs)
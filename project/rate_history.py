@@ -0,0 +1,404 @@
+import asyncio
+import contextlib
+import logging
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+import numpy as np
+import prisma.fields
+import prisma.models
+import project.metrics
+
+logger = logging.getLogger(__name__)
+
+# Every series stores rates against this currency; cross rates are derived.
+PIVOT_CURRENCY = "USD"
+INTERVALS = ("day", "week", "month")
+
+_EPOCH = date(1970, 1, 1)
+
+UPSTREAM_DAYS = project.metrics.REGISTRY.counter(
+    "multitool_rate_history_backfilled_days_total",
+    "Days of exchange-rate history fetched from the provider, per outcome.",
+    ("outcome",),
+)
+CACHED_SERIES = project.metrics.REGISTRY.gauge(
+    "multitool_rate_history_series_bytes",
+    "Memory held by the in-process exchange-rate history arrays.",
+)
+
+
+def day_number(value: date) -> int:
+    """
+    Days since 1970-01-01, the index used by the history arrays and numpy's datetime64[D].
+    """
+    return (value - _EPOCH).days
+
+
+def day_date(number: int) -> date:
+    return _EPOCH + timedelta(days=int(number))
+
+
+class RateSeries:
+    """
+    Daily rates of one currency against the pivot currency, as two columns covering
+    a contiguous span of days starting at `start`.
+
+    `rates` holds float64 values with NaN where the provider has no rate (weekends,
+    holidays); `fetched` records which days have been asked for, so that days without
+    a rate are not requested again.
+    """
+
+    __slots__ = ("currency", "start", "rates", "fetched")
+
+    def __init__(
+        self,
+        currency: str,
+        start: int = 0,
+        rates: Optional[np.ndarray] = None,
+        fetched: Optional[np.ndarray] = None,
+    ):
+        self.currency = currency
+        self.start = start
+        self.rates = rates if rates is not None else np.empty(0, dtype=np.float64)
+        self.fetched = fetched if fetched is not None else np.zeros(0, dtype=bool)
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.rates)
+
+    @property
+    def nbytes(self) -> int:
+        return self.rates.nbytes + self.fetched.nbytes
+
+    def _extend(self, first: int, end: int) -> None:
+        if not len(self.rates):
+            self.start = first
+            self.rates = np.full(end - first, np.nan)
+            self.fetched = np.zeros(end - first, dtype=bool)
+            return
+        before = max(0, self.start - first)
+        after = max(0, end - self.end)
+        if before or after:
+            self.rates = np.pad(self.rates, (before, after), constant_values=np.nan)
+            self.fetched = np.pad(self.fetched, (before, after), constant_values=False)
+            self.start -= before
+
+    def _overlap(self, first: int, end: int) -> Tuple[int, int, int, int]:
+        # Bounds of the overlap within the requested window and within the arrays.
+        lo, hi = max(first, self.start), min(end, self.end)
+        if lo >= hi:
+            return 0, 0, 0, 0
+        return lo - first, hi - first, lo - self.start, hi - self.start
+
+    def window(self, first: int, end: int) -> np.ndarray:
+        """
+        Returns the rates of days `[first, end)`, NaN where unknown.
+        """
+        out = np.full(end - first, np.nan)
+        a, b, c, d = self._overlap(first, end)
+        out[a:b] = self.rates[c:d]
+        return out
+
+    def missing(self, first: int, end: int) -> np.ndarray:
+        """
+        Returns a mask of the days in `[first, end)` that were never fetched.
+        """
+        out = np.ones(end - first, dtype=bool)
+        a, b, c, d = self._overlap(first, end)
+        out[a:b] = ~self.fetched[c:d]
+        return out
+
+    def store(self, first: int, rates: np.ndarray) -> None:
+        """
+        Writes fetched rates for the days starting at `first`, growing the span if needed.
+        """
+        end = first + len(rates)
+        self._extend(first, end)
+        offset = first - self.start
+        window = slice(offset, offset + len(rates))
+        self.rates[window] = rates
+        self.fetched[window] = True
+
+    def to_record(self) -> Dict[str, object]:
+        return {
+            "startDate": datetime.combine(day_date(self.start), time(), timezone.utc),
+            "rates": prisma.fields.Base64.encode(self.rates.astype("<f8").tobytes()),
+            "fetched": prisma.fields.Base64.encode(np.packbits(self.fetched).tobytes()),
+        }
+
+    @classmethod
+    def from_record(cls, record) -> "RateSeries":
+        rates = np.frombuffer(record.rates.decode(), dtype="<f8").astype(np.float64)
+        bits = np.frombuffer(record.fetched.decode(), dtype=np.uint8)
+        fetched = np.unpackbits(bits)[: len(rates)].astype(bool)
+        return cls(record.currency, day_number(record.startDate.date()), rates, fetched)
+
+
+def _runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    # [start, stop) index pairs of the consecutive True values in mask.
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def period_keys(first: int, end: int, interval: str) -> np.ndarray:
+    """
+    Maps each day in `[first, end)` to the first day of its period: itself, the
+    Monday of its ISO week, or the first of its month.
+    """
+    days = np.arange(first, end, dtype=np.int64)
+    if interval == "day":
+        return days
+    if interval == "week":
+        # 1970-01-01 was a Thursday, three days after a Monday.
+        return days - (days + 3) % 7
+    if interval == "month":
+        months = days.astype("datetime64[D]").astype("datetime64[M]")
+        return months.astype("datetime64[D]").astype(np.int64)
+    raise ValueError(f"Unknown interval '{interval}'; expected one of {INTERVALS}.")
+
+
+def resample(
+    first: int, matrix: np.ndarray, interval: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Averages daily rates per period, for every currency at once.
+
+    Args:
+        first (int): Day number of the first column.
+        matrix (np.ndarray): Daily rates, one row per currency, NaN where unknown.
+        interval (str): 'day', 'week' or 'month'.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The day number each period starts on, and the
+        mean rate of each currency per period (NaN for periods without any rate).
+    """
+    keys = period_keys(first, first + matrix.shape[1], interval)
+    if interval == "day":
+        return keys, matrix
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    known = ~np.isnan(matrix)
+    sums = np.add.reduceat(np.where(known, matrix, 0.0), starts, axis=1)
+    counts = np.add.reduceat(known.astype(np.int64), starts, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    return keys[starts], means
+
+
+class RateHistory:
+    """
+    In-process columnar store of daily exchange rates, persisted to the
+    `ExchangeRateSeries` table and backfilled from the provider on demand.
+
+    Each currency is one `RateSeries` of rates against USD; a query for any pair
+    divides two series elementwise. Ranges that were never fetched are requested from
+    the provider's timeseries endpoint in chunks of up to `max_fetch_days` days, all
+    requested currencies at once, so a cold five-year query for 30 currencies costs
+    a handful of upstream calls and every later query is served from memory.
+
+    The history ends yesterday: today's rate is not final, and `get_exchange_rate`
+    serves the latest rate.
+    """
+
+    def __init__(
+        self,
+        provider_url: Optional[str] = None,
+        max_fetch_days: int = 365,
+        concurrency: int = 4,
+    ):
+        self.provider_url = (
+            provider_url
+            or os.environ.get("EXCHANGE_RATE_PROVIDER_URL")
+            or "https://api.exchangerate.host"
+        ).rstrip("/")
+        self.max_fetch_days = max_fetch_days
+        self.concurrency = concurrency
+        self.series: Dict[str, RateSeries] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def _load(self, currencies: Iterable[str]) -> None:
+        wanted = [c for c in currencies if c not in self.series]
+        if not wanted:
+            return
+        with project.metrics.timed("rate_history", "db_lookup"):
+            records = await prisma.models.ExchangeRateSeries.prisma().find_many(
+                where={"currency": {"in": wanted}}
+            )
+        loaded = {r.currency: r for r in records if r.currency in wanted}
+        for currency in wanted:
+            # A concurrent query may have loaded and already extended the series.
+            if currency in self.series:
+                continue
+            record = loaded.get(currency)
+            self.series[currency] = (
+                RateSeries.from_record(record) if record else RateSeries(currency)
+            )
+
+    async def _fetch(
+        self,
+        client: httpx.AsyncClient,
+        first: int,
+        end: int,
+        symbols: Sequence[str],
+    ) -> Dict[str, np.ndarray]:
+        response = await client.get(
+            f"{self.provider_url}/timeseries",
+            params={
+                "start_date": day_date(first).isoformat(),
+                "end_date": day_date(end - 1).isoformat(),
+                "base": PIVOT_CURRENCY,
+                "symbols": ",".join(symbols),
+            },
+        )
+        response.raise_for_status()
+        by_day = response.json().get("rates") or {}
+        columns = {s: np.full(end - first, np.nan) for s in symbols}
+        for day, rates in by_day.items():
+            index = day_number(date.fromisoformat(day)) - first
+            if not 0 <= index < end - first:
+                continue
+            for symbol, rate in rates.items():
+                column = columns.get(symbol)
+                if column is not None and rate is not None:
+                    column[index] = rate
+        return columns
+
+    def _missing(
+        self, currencies: Sequence[str], first: int, end: int
+    ) -> Tuple[List[Tuple[int, int]], List[str]]:
+        # Chunks of days in [first, end) never fetched for some currency, and those
+        # currencies.
+        missing = np.zeros(end - first, dtype=bool)
+        stale = []
+        for currency in currencies:
+            mask = self.series[currency].missing(first, end)
+            if mask.any():
+                missing |= mask
+                stale.append(currency)
+        chunks = [
+            (first + lo, first + min(stop, lo + self.max_fetch_days))
+            for start, stop in _runs(missing)
+            for lo in range(start, stop, self.max_fetch_days)
+        ]
+        return chunks, stale
+
+    async def backfill(self, currencies: Sequence[str], first: int, end: int) -> int:
+        """
+        Makes sure the rates of `currencies` for days `[first, end)` are in memory,
+        loading stored series and fetching the ranges that were never fetched.
+
+        Queries for days already in memory take no lock. Fetches hold a lock per
+        currency being fetched, so cold queries for other currencies run concurrently,
+        and missing days are checked again once the locks are held so that concurrent
+        queries for the same range fetch it only once.
+
+        Args:
+            currencies (Sequence[str]): Currency codes other than the pivot.
+            first (int): First day number.
+            end (int): Day number after the last day; days from today on are ignored.
+
+        Returns:
+            int: The number of days requested from the provider.
+        """
+        today = day_number(date.today())
+        end = min(end, today)
+        if end <= first or not currencies:
+            return 0
+        await self._load(currencies)
+        chunks, stale = self._missing(currencies, first, end)
+        if not chunks:
+            return 0
+
+        async with contextlib.AsyncExitStack() as stack:
+            # Sorted, so that queries sharing currencies cannot deadlock.
+            for currency in sorted(stale):
+                await stack.enter_async_context(
+                    self._locks.setdefault(currency, asyncio.Lock())
+                )
+            chunks, stale = self._missing(stale, first, end)
+            if not chunks:
+                return 0
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+            async with httpx.AsyncClient(timeout=30) as client:
+
+                async def fetch(chunk: Tuple[int, int]) -> Dict[str, np.ndarray]:
+                    async with semaphore:
+                        return await self._fetch(client, *chunk, stale)
+
+                with project.metrics.timed("rate_history", "upstream_fetch"):
+                    results = await asyncio.gather(
+                        *(fetch(chunk) for chunk in chunks), return_exceptions=True
+                    )
+
+            fetched_days = 0
+            failures = []
+            changed = set()
+            for (lo, hi), columns in zip(chunks, results):
+                if isinstance(columns, BaseException):
+                    failures.append(columns)
+                    UPSTREAM_DAYS.labels("error").inc(hi - lo)
+                    logger.warning(
+                        "Failed to fetch rates for %s to %s: %s",
+                        day_date(lo),
+                        day_date(hi - 1),
+                        columns,
+                    )
+                    continue
+                UPSTREAM_DAYS.labels("ok").inc(hi - lo)
+                fetched_days += hi - lo
+                for currency, rates in columns.items():
+                    self.series[currency].store(lo, rates)
+                    changed.add(currency)
+            CACHED_SERIES.set(sum(s.nbytes for s in self.series.values()))
+            await self._persist(changed)
+            if failures:
+                raise RuntimeError(f"Exchange rate provider failed: {failures[0]}")
+            return fetched_days
+
+    async def _persist(self, currencies: Iterable[str]) -> None:
+        with project.metrics.timed("rate_history", "db_write"):
+            for currency in currencies:
+                record = self.series[currency].to_record()
+                await prisma.models.ExchangeRateSeries.prisma().upsert(
+                    where={"currency": currency},
+                    data={
+                        "create": {"currency": currency, **record},
+                        "update": record,
+                    },
+                )
+
+    async def query(
+        self,
+        base_currency: str,
+        target_currencies: Sequence[str],
+        first: int,
+        end: int,
+        interval: str = "day",
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the rates of `base_currency` in each target currency over days
+        `[first, end)`, averaged per `interval`.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The day number each period starts on, and a
+            matrix of rates with one row per target currency (NaN where unknown).
+        """
+        currencies = {base_currency, *target_currencies} - {PIVOT_CURRENCY}
+        await self.backfill(sorted(currencies), first, end)
+
+        def column(currency: str) -> np.ndarray:
+            if currency == PIVOT_CURRENCY:
+                return np.ones(end - first)
+            return self.series[currency].window(first, end)
+
+        with project.metrics.timed("rate_history", "resample"):
+            matrix = np.vstack([column(c) for c in target_currencies])
+            with np.errstate(invalid="ignore", divide="ignore"):
+                matrix /= column(base_currency)
+            return resample(first, matrix, interval)
+
+
+history = RateHistory()
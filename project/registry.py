@@ -0,0 +1,412 @@
+import asyncio
+import functools
+import importlib
+import inspect
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import prisma.models
+import project.metrics
+from pydantic import validate_call
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_SECONDS = project.metrics.REGISTRY.gauge(
+    "multitool_service_warm_up_seconds",
+    "Time spent importing a service module and its dependencies at warm-up.",
+    ("tool",),
+)
+
+
+class ToolSpec(NamedTuple):
+    """
+    One tool exposed by the API: the service function and the route serving it.
+
+    `group` is the tool group (stored as `Module.name`) used to enable or disable
+    related tools together; `name` doubles as `Feature.name`. `blocking` marks
+    synchronous services that do CPU work or blocking I/O and so must not run on the
+    event loop.
+    """
+
+    name: str
+    group: str
+    module: str
+    route: str
+    blocking: bool = False
+
+
+TOOLS: Dict[str, ToolSpec] = {
+    spec.name: spec
+    for spec in (
+        ToolSpec(
+            "generate_qr_code",
+            "codes",
+            "project.generate_qr_code_service",
+            "/qr/generate",
+            blocking=True,
+        ),
+        ToolSpec(
+            "generate_barcode",
+            "codes",
+            "project.generate_barcode_service",
+            "/barcode/generate",
+            blocking=True,
+        ),
+        ToolSpec(
+            "resize_image",
+            "imaging",
+            "project.resize_image_service",
+            "/image/resize",
+            blocking=True,
+        ),
+        ToolSpec(
+            "add_watermark_to_pdf",
+            "documents",
+            "project.add_watermark_to_pdf_service",
+            "/pdf/watermark",
+            blocking=True,
+        ),
+        ToolSpec(
+            "text_to_speech_convert",
+            "speech",
+            "project.text_to_speech_convert_service",
+            "/text-to-speech/convert",
+            blocking=True,
+        ),
+        ToolSpec(
+            "get_exchange_rate",
+            "currency",
+            "project.get_exchange_rate_service",
+            "/currency/rate",
+        ),
+        ToolSpec(
+            "get_exchange_rate_history",
+            "currency",
+            "project.get_exchange_rate_history_service",
+            "/currency/history",
+        ),
+        ToolSpec(
+            "get_ip_geolocation",
+            "geolocation",
+            "project.get_ip_geolocation_service",
+            "/geolocation/{ip}",
+        ),
+        ToolSpec(
+            "check_password_strength",
+            "security",
+            "project.check_password_strength_service",
+            "/security/password/strength",
+        ),
+        ToolSpec(
+            "validate_email",
+            "security",
+            "project.validate_email_service",
+            "/security/email/validate",
+            blocking=True,
+        ),
+        ToolSpec(
+            "convert_timezone",
+            "time",
+            "project.convert_timezone_service",
+            "/timezone/convert",
+        ),
+        ToolSpec(
+            "generate_url_preview",
+            "web",
+            "project.generate_url_preview_service",
+            "/url/preview",
+        ),
+        ToolSpec(
+            "convert_feed_to_json",
+            "web",
+            "project.convert_feed_to_json_service",
+            "/feed/convert",
+        ),
+    )
+}
+
+GROUPS: Set[str] = {spec.group for spec in TOOLS.values()}
+
+
+class ToolDisabledError(LookupError):
+    """
+    Raised when a tool is unknown or its group is disabled in this deployment.
+    """
+
+
+def _parse_groups(value: Optional[str]) -> Optional[Set[str]]:
+    if value is None or not value.strip():
+        return None
+    groups = {g.strip() for g in value.split(",") if g.strip()}
+    unknown = groups - GROUPS
+    if unknown:
+        raise ValueError(
+            f"Unknown tool groups {sorted(unknown)}; expected some of {sorted(GROUPS)}."
+        )
+    return groups
+
+
+class ServiceRegistry:
+    """
+    Loads service modules on first use or at warm-up and tracks which tools are enabled.
+
+    Tool groups are selected with the ENABLED_TOOL_GROUPS / DISABLED_TOOL_GROUPS
+    environment variables (comma separated, e.g. 'geolocation,currency'), and
+    individual tools can additionally be switched off with `Feature.enabled` in the
+    database. Heavy third-party libraries are only imported by a service's
+    `warm_up()` hook or its first call, so a deployment serving a few groups never
+    loads the libraries of the others.
+    """
+
+    def __init__(
+        self,
+        tools: Dict[str, ToolSpec] = TOOLS,
+        enabled_groups: Optional[Iterable[str]] = None,
+        disabled_groups: Optional[Iterable[str]] = None,
+    ):
+        self.tools = tools
+        if enabled_groups is None:
+            enabled_groups = _parse_groups(os.environ.get("ENABLED_TOOL_GROUPS"))
+        if disabled_groups is None:
+            disabled_groups = _parse_groups(os.environ.get("DISABLED_TOOL_GROUPS"))
+        self.enabled_groups = set(enabled_groups) if enabled_groups else set(GROUPS)
+        self.enabled_groups -= set(disabled_groups or ())
+        self.disabled_tools: Set[str] = set()
+        self.warmed_up: Set[str] = set()
+        self._validated: Dict[str, Tuple[Callable[..., Any], bool]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def is_enabled(self, name: str) -> bool:
+        spec = self.tools.get(name)
+        return (
+            spec is not None
+            and spec.group in self.enabled_groups
+            and name not in self.disabled_tools
+        )
+
+    def enabled_tools(self) -> List[ToolSpec]:
+        return [spec for spec in self.tools.values() if self.is_enabled(spec.name)]
+
+    def spec(self, name: str) -> ToolSpec:
+        """
+        Returns the spec of an enabled tool.
+
+        Raises:
+            ToolDisabledError: If the tool is unknown or disabled.
+        """
+        if not self.is_enabled(name):
+            raise ToolDisabledError(f"Tool '{name}' is not available.")
+        return self.tools[name]
+
+    def load(self, name: str) -> Callable[..., Any]:
+        """
+        Returns the service function of an enabled tool, importing its module if needed.
+
+        Raises:
+            ToolDisabledError: If the tool is unknown or disabled.
+        """
+        spec = self.spec(name)
+        return getattr(importlib.import_module(spec.module), spec.name)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """
+        Worker threads running blocking services, created on first use so that
+        processes forked after import each get their own pool.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=min(32, (os.cpu_count() or 1) + 4),
+                thread_name_prefix="tool-worker",
+            )
+        return self._executor
+
+    async def run_blocking(self, function: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Calls a blocking function on the worker threads.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(function, *args, **kwargs)
+        )
+
+    async def invoke(self, name: str, params: Dict[str, Any]) -> Any:
+        """
+        Calls a tool with keyword parameters validated against its signature.
+
+        Coroutine services run on the event loop; blocking services run on the
+        worker threads; other synchronous services are called inline.
+
+        Args:
+            name (str): The tool name, e.g. 'generate_qr_code'.
+            params (Dict[str, Any]): Keyword arguments; JSON values are coerced to the annotated types.
+
+        Returns:
+            Any: Whatever the service returns, normally a pydantic model.
+
+        Raises:
+            ToolDisabledError: If the tool is unknown or disabled.
+            pydantic.ValidationError: If the parameters do not match the signature.
+        """
+        spec = self.spec(name)
+        cached = self._validated.get(name)
+        if cached is None:
+            function = self.load(name)
+            cached = self._validated[name] = (
+                validate_call(function),
+                inspect.iscoroutinefunction(function),
+            )
+        function, is_coroutine = cached
+        if is_coroutine:
+            return await function(**params)
+        if spec.blocking:
+            return await self.run_blocking(function, **params)
+        return function(**params)
+
+    def warm_up(self) -> Dict[str, float]:
+        """
+        Imports every enabled service module and its heavy dependencies.
+
+        Returns:
+            Dict[str, float]: Seconds spent per tool, for tools not already warmed up.
+        """
+        timings = {}
+        for spec in self.enabled_tools():
+            if spec.name in self.warmed_up:
+                continue
+            start = time.perf_counter()
+            module = importlib.import_module(spec.module)
+            hook = getattr(module, "warm_up", None)
+            if hook is not None:
+                hook()
+            self.warmed_up.add(spec.name)
+            timings[spec.name] = time.perf_counter() - start
+            WARM_UP_SECONDS.labels(spec.name).set(timings[spec.name])
+        if timings:
+            logger.info(
+                "Warmed up %d services in %.3fs", len(timings), sum(timings.values())
+            )
+        return timings
+
+    async def apply_feature_flags(self) -> Set[str]:
+        """
+        Disables tools whose `Feature` row has `enabled` set to false.
+
+        Returns:
+            Set[str]: The names of the tools disabled by the database.
+        """
+        features = await prisma.models.Feature.prisma().find_many(
+            where={"enabled": False}, include={"module": True}
+        )
+        disabled = {
+            f.name
+            for f in features
+            if f.name in self.tools and f.module.name == self.tools[f.name].group
+        }
+        self.disabled_tools |= disabled
+        return disabled
+
+    def prune_routes(self, app) -> List[str]:
+        """
+        Removes the routes of disabled tools from a FastAPI app so they answer 404
+        and disappear from the OpenAPI schema.
+
+        Returns:
+            List[str]: The removed route paths.
+        """
+        disabled_routes = {
+            spec.route for spec in self.tools.values() if not self.is_enabled(spec.name)
+        }
+        removed = [
+            r.path
+            for r in app.router.routes
+            if getattr(r, "path", None) in disabled_routes
+        ]
+        app.router.routes[:] = [
+            r
+            for r in app.router.routes
+            if getattr(r, "path", None) not in disabled_routes
+        ]
+        if removed:
+            app.openapi_schema = None
+        return removed
+
+
+registry = ServiceRegistry()
+
+
+def warm_up_on_startup() -> bool:
+    return os.environ.get("WARM_UP_SERVICES", "true").lower() not in (
+        "0",
+        "false",
+        "no",
+    )
+
+
+_MEASURE_SNIPPET = """
+import importlib, json, sys, time
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+before = rss_kb()
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    module = importlib.import_module(name)
+    hook = getattr(module, "warm_up", None)
+    if hook is not None:
+        hook()
+print(json.dumps({"seconds": time.perf_counter() - start, "rss_kb": rss_kb() - before, "total_rss_kb": rss_kb()}))
+"""
+
+
+def _measure(modules: List[str]) -> Dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, "-c", _MEASURE_SNIPPET, *modules],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def import_report(tools: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Measures cold import time and resident memory of each service in a fresh interpreter.
+
+    Each tool is imported and warmed up in its own subprocess on top of the baseline
+    (pydantic and the metrics module, which every service loads), and the full
+    application is measured with and without warming up every tool.
+
+    Args:
+        tools (Optional[Iterable[str]]): Tool names to measure; all tools when omitted.
+
+    Returns:
+        Dict[str, Any]: Seconds and RSS (KiB) for the baseline, each tool, and the whole app.
+    """
+    baseline = ["pydantic", "project.metrics"]
+    report: Dict[str, Any] = {"baseline": _measure(baseline), "tools": {}}
+    for name in tools or TOOLS:
+        spec = TOOLS[name]
+        measured = _measure(baseline + [spec.module])
+        measured["seconds"] -= report["baseline"]["seconds"]
+        measured["rss_kb"] -= report["baseline"]["rss_kb"]
+        report["tools"][name] = measured
+    report["app_cold"] = _measure(["project.server"])
+    report["app_warm"] = _measure(
+        ["project.server"] + [s.module for s in TOOLS.values()]
+    )
+    return report
+
+
+if __name__ == "__main__":
+    print(json.dumps(import_report(sys.argv[1:] or None), indent=2))
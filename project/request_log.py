@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+import prisma.models
+import project.metrics
+from prisma.fields import Json
+
+logger = logging.getLogger(__name__)
+
+EVENTS = project.metrics.REGISTRY.counter(
+    "multitool_request_log_events_total",
+    "Usage log events by outcome (enqueued, sampled_out, dropped, written, failed).",
+    ("outcome",),
+)
+QUEUE_DEPTH = project.metrics.REGISTRY.gauge(
+    "multitool_request_log_queue_depth",
+    "Number of usage log events waiting to be written.",
+)
+FLUSH_LATENCY = project.metrics.REGISTRY.histogram(
+    "multitool_request_log_flush_duration_seconds",
+    "Latency of one batched create_many write per table.",
+    ("table",),
+)
+
+# Json columns per table; their values must be wrapped in prisma.fields.Json.
+_JSON_FIELDS = {
+    "Log": ("details",),
+    "APIRequest": ("requestBody", "responseBody"),
+    "UserActivity": (),
+}
+
+
+class LogEvent(NamedTuple):
+    """
+    One row to be inserted into a usage tracking table.
+    """
+
+    table: str
+    data: Dict[str, Any]
+
+
+class RequestLogger:
+    """
+    Bounded in-memory queue of usage events drained by a background writer task.
+
+    Handlers enqueue without awaiting the database. The writer flushes a batch with
+    `create_many` per table once `batch_size` events are waiting or every
+    `flush_interval` seconds, whichever comes first. Once the queue is past its
+    high-water mark only one in `overload_sample_every` events is kept, and once it is
+    full new events are dropped, so a slow database never applies backpressure to
+    requests.
+
+    All methods must be called from the event loop thread.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        high_water_mark: float = 0.8,
+        overload_sample_every: int = 10,
+        shutdown_timeout: float = 10.0,
+    ):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.high_water_size = int(max_queue_size * high_water_mark)
+        self.overload_sample_every = overload_sample_every
+        self.shutdown_timeout = shutdown_timeout
+        self._queue: Deque[LogEvent] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._closing = False
+        self._overload_seen = 0
+        self._enqueued = EVENTS.labels("enqueued")
+        self._sampled_out = EVENTS.labels("sampled_out")
+        self._dropped = EVENTS.labels("dropped")
+        self._written = EVENTS.labels("written")
+        self._failed = EVENTS.labels("failed")
+
+    @property
+    def running(self) -> bool:
+        return self._writer is not None and not self._writer.done()
+
+    def enqueue(self, table: str, data: Dict[str, Any]) -> bool:
+        """
+        Queues a row for insertion without blocking.
+
+        Args:
+            table (str): The Prisma model name ('Log', 'APIRequest' or 'UserActivity').
+            data (Dict[str, Any]): The row, using scalar foreign keys (e.g. 'apiKeyId') rather than relation writes.
+
+        Returns:
+            bool: False if the event was sampled out or dropped because of overload.
+        """
+        depth = len(self._queue)
+        if depth >= self.max_queue_size or self._closing:
+            self._dropped.inc()
+            return False
+        if depth >= self.high_water_size:
+            self._overload_seen += 1
+            if self._overload_seen % self.overload_sample_every:
+                self._sampled_out.inc()
+                return False
+        self._queue.append(LogEvent(table, data))
+        self._enqueued.inc()
+        QUEUE_DEPTH.set(depth + 1)
+        if self._wakeup is not None and depth + 1 >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def log(
+        self, activity: str, details: Optional[Dict[str, Any]] = None, user_id=None
+    ) -> bool:
+        """
+        Queues a row for the `Log` table.
+        """
+        data: Dict[str, Any] = {"activity": activity, "details": details}
+        if user_id is not None:
+            data["userId"] = user_id
+        return self.enqueue("Log", data)
+
+    def log_api_request(
+        self,
+        api_key_id: str,
+        endpoint: str,
+        request_body: Optional[Dict[str, Any]] = None,
+        response_body: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """
+        Queues a row for the `APIRequest` table.
+        """
+        return self.enqueue(
+            "APIRequest",
+            {
+                "apiKeyId": api_key_id,
+                "endpoint": endpoint,
+                "requestBody": request_body,
+                "responseBody": response_body,
+            },
+        )
+
+    def log_user_activity(self, user_id: str, action: str, module: str) -> bool:
+        """
+        Queues a row for the `UserActivity` table.
+        """
+        return self.enqueue(
+            "UserActivity", {"userId": user_id, "action": action, "module": module}
+        )
+
+    async def start(self) -> None:
+        """
+        Starts the background writer task; call from the application lifespan.
+        """
+        if self.running:
+            return
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._writer = asyncio.create_task(self._run(), name="request-log-writer")
+
+    async def stop(self) -> None:
+        """
+        Stops accepting events and flushes what is queued, bounded by `shutdown_timeout`.
+        """
+        if self._writer is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._writer, timeout=self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Request log flush timed out; dropping %d events", len(self._queue)
+            )
+            self._dropped.inc(len(self._queue))
+            self._queue.clear()
+            QUEUE_DEPTH.set(0)
+        self._writer = None
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while len(self._queue) >= self.batch_size:
+                await self.flush()
+            if self._queue:
+                await self.flush()
+        while self._queue:
+            await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Writes up to `batch_size` queued events with one `create_many` per table.
+
+        Returns:
+            int: The number of events taken off the queue.
+        """
+        batch: List[LogEvent] = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        QUEUE_DEPTH.set(len(self._queue))
+        if not batch:
+            return 0
+        rows_by_table: Dict[str, List[Dict[str, Any]]] = {}
+        for event in batch:
+            rows_by_table.setdefault(event.table, []).append(
+                _prepare_row(event.table, event.data)
+            )
+        for table, rows in rows_by_table.items():
+            start = time.perf_counter()
+            try:
+                await getattr(prisma.models, table).prisma().create_many(data=rows)
+                self._written.inc(len(rows))
+            except Exception:
+                logger.exception("Failed to write %d %s rows", len(rows), table)
+                self._failed.inc(len(rows))
+            FLUSH_LATENCY.labels(table).observe(time.perf_counter() - start)
+        return len(batch)
+
+
+def _prepare_row(table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    row = dict(data)
+    for field in _JSON_FIELDS.get(table, ()):
+        if row.get(field) is not None:
+            row[field] = Json(row[field])
+        else:
+            row.pop(field, None)
+    return row
+
+
+request_logger = RequestLogger()
+
+
+class RequestLogMiddleware:
+    """
+    Pure ASGI middleware queueing one `Log` row per HTTP request on the request logger,
+    plus an `APIRequest` row when the request was authenticated with an API key.
+
+    Requests to paths in `exclude_paths` (such as the metrics scrape) are not logged.
+    """
+
+    def __init__(
+        self,
+        app,
+        request_logger: RequestLogger = request_logger,
+        exclude_paths=("/metrics",),
+    ):
+        self.app = app
+        self.request_logger = request_logger
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            principal = scope.get("state", {}).get("principal")
+            self.request_logger.log(
+                "api_request",
+                {
+                    "method": scope["method"],
+                    "route": route,
+                    "path": scope["path"],
+                    "status": status_code,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                },
+                user_id=principal.user_id if principal is not None else None,
+            )
+            if principal is not None:
+                self.request_logger.log_api_request(
+                    principal.api_key_id,
+                    route or scope["path"],
+                    request_body={"query": scope["query_string"].decode("latin-1")},
+                    response_body={"status": status_code},
+                )
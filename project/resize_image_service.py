@@ -1,8 +1,9 @@
 import base64
-from io import BytesIO
 from typing import Optional
 
-from PIL import Image
+import project.image_encoding
+import project.imaging
+import project.metrics
 from pydantic import BaseModel
 
 
@@ -13,10 +14,20 @@ class ResizeImageResponse(BaseModel):
 
     resized_image_data: Optional[str] = None
     resized_image_url: Optional[str] = None
+    format: Optional[str] = None
+    quality: Optional[int] = None
+    output_bytes: Optional[int] = None
+    compression_ratio: Optional[float] = None
 
 
 def resize_image(
-    image_data: str, width: int, height: int, format: Optional[str]
+    image_data: str,
+    width: int,
+    height: int,
+    format: Optional[str],
+    quality: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    accept: Optional[str] = None,
 ) -> ResizeImageResponse:
     """
     Resizes an image according to specified dimensions and optimization settings.
@@ -25,21 +36,54 @@ def resize_image(
         image_data (str): The raw image data to be resized, provided as a base64 encoded string.
         width (int): The target width of the image in pixels.
         height (int): The target height of the image in pixels.
-        format (Optional[str]): The desired image format (e.g., 'jpeg', 'png') for the output. Defaults to the input format if not specified.
+        format (Optional[str]): The desired image format (e.g., 'jpeg', 'png') for the output, or 'auto' for the smallest format the client accepts. Defaults to the input format if not specified.
+        quality (Optional[int]): Quality of lossy output formats, 1-100.
+        max_bytes (Optional[int]): Target output size; lossy formats lower their quality to meet it.
+        accept (Optional[str]): The client's Accept header, used by the 'auto' format.
 
     Returns:
         ResizeImageResponse: The response containing the resized image data or a link to the processed image.
 
+    Raises:
+        ImageTooLargeError: If the image or the output exceeds the per-image limits.
+        ImageBudgetExhaustedError: If the image memory budget stayed full for too long.
+
     Example:
         # Assuming 'some_base64_encoded_image' is a base64 encoded string of an image.
         resize_image_response = resize_image(some_base64_encoded_image, 100, 100, 'jpeg')
         print(resize_image_response.resized_image_data)  # This shows the resized image data as a base64 string.
     """
-    image_bytes = base64.b64decode(image_data)
-    image = Image.open(BytesIO(image_bytes))
-    resized_image = image.resize((width, height))
+    if width <= 0 or height <= 0:
+        raise ValueError("Width and height must be positive.")
+    if width * height > project.imaging.max_pixels():
+        raise project.imaging.ImageTooLargeError(
+            f"The output may have at most {project.imaging.max_pixels()} pixels."
+        )
+    image = project.imaging.open_image(base64.b64decode(image_data))
     image_format = format if format else image.format
-    buffer = BytesIO()
-    resized_image.save(buffer, format=image_format)
-    resized_image_data = base64.b64encode(buffer.getvalue()).decode("utf-8")
-    return ResizeImageResponse(resized_image_data=resized_image_data)
+    reduced = project.imaging.reduce_on_decode(image, (width, height))
+    with project.imaging.admitted(image, (width, height)):
+        project.imaging.DECODES.labels("reduced" if reduced else "full").inc()
+        with project.metrics.timed("resize_image", "decode"):
+            image.load()
+        with project.metrics.timed("resize_image", "resize"):
+            resized_image = image.resize((width, height), reducing_gap=3.0)
+        with project.metrics.timed("resize_image", "encode"):
+            encoded = project.image_encoding.encode(
+                resized_image, image_format, accept, quality, max_bytes
+            )
+    resized_image_data = base64.b64encode(encoded.data).decode("utf-8")
+    return ResizeImageResponse(
+        resized_image_data=resized_image_data,
+        format=encoded.format.lower(),
+        quality=encoded.quality,
+        output_bytes=len(encoded.data),
+        compression_ratio=round(encoded.compression_ratio, 2),
+    )
+
+
+def warm_up() -> None:
+    """
+    Imports Pillow ahead of the first request.
+    """
+    from PIL import Image  # noqa: F401
@@ -0,0 +1,225 @@
+import base64
+import binascii
+from typing import Any, List, Mapping, Optional, Sequence, Tuple
+
+import msgpack
+import orjson
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Leading bytes of the artifact formats the services produce.
+_SIGNATURES: Tuple[Tuple[bytes, str], ...] = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"%PDF-", "application/pdf"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+)
+
+
+class ModelResponse(ORJSONResponse):
+    """
+    JSON response that serializes pydantic models directly and anything else with orjson.
+
+    Returning a `Response` from a route bypasses FastAPI's `response_model` handling,
+    which would otherwise validate the model a second time and serialize it through
+    `jsonable_encoder`. Handlers wrap the models their services build so they are
+    serialized exactly once by pydantic-core; `response_model` stays on the route for
+    the OpenAPI schema. This is also the app's default response class.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class MsgPackResponse(Response):
+    """
+    MessagePack response; `bytes` values are packed as binary rather than base64.
+    """
+
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            content = content.model_dump(mode="json")
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def error_response(
+    status_code: int, message: str, headers: Optional[Mapping[str, str]] = None
+) -> ModelResponse:
+    """
+    Builds the `{"error": message}` body returned by every route on failure.
+    """
+    return ModelResponse({"error": message}, status_code=status_code, headers=headers)
+
+
+def _parse_accept(accept: str) -> List[Tuple[str, float]]:
+    ranges = []
+    for part in accept.split(","):
+        media_range, *params = part.strip().split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_range:
+            ranges.append((media_range.strip().lower(), quality))
+    return ranges
+
+
+def _quality(ranges: List[Tuple[str, float]], media_type: str) -> Tuple[int, float]:
+    # The most specific matching range decides: exact, then 'type/*', then '*/*'.
+    main_type = media_type.split("/")[0]
+    best = (-1, 0.0)
+    for media_range, quality in ranges:
+        if media_range == media_type:
+            specificity = 2
+        elif media_range == f"{main_type}/*":
+            specificity = 1
+        elif media_range == "*/*":
+            specificity = 0
+        else:
+            continue
+        if specificity > best[0]:
+            best = (specificity, quality)
+    return best
+
+
+def preferred_media_type(accept: Optional[str], offered: Sequence[str]) -> str:
+    """
+    Picks the offered media type the `Accept` header ranks highest.
+
+    Ties go to the earlier offer, so the first offer (JSON) is used for a missing or
+    '*/*' header, and also when nothing offered is acceptable.
+
+    Args:
+        accept (Optional[str]): The request's Accept header.
+        offered (Sequence[str]): Media types the route can produce, in order of preference.
+
+    Returns:
+        str: One of `offered`.
+    """
+    if not accept:
+        return offered[0]
+    ranges = _parse_accept(accept)
+    best, best_quality = offered[0], 0.0
+    for media_type in offered:
+        quality = _quality(ranges, media_type)[1]
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def accept_quality(
+    accept: Optional[str], media_type: str, exact: bool = False
+) -> Optional[float]:
+    """
+    Returns the quality the `Accept` header gives `media_type`.
+
+    Args:
+        accept (Optional[str]): The request's Accept header.
+        media_type (str): The media type to look up, e.g. 'image/webp'.
+        exact (bool): Only count a range naming the type itself, not 'image/*' or '*/*'.
+
+    Returns:
+        Optional[float]: The quality, or None if no range matches.
+    """
+    if not accept:
+        return None
+    specificity, quality = _quality(_parse_accept(accept), media_type)
+    if specificity < (2 if exact else 0):
+        return None
+    return quality
+
+
+def accepts_default(accept: Optional[str]) -> bool:
+    """
+    Returns True for the Accept headers that always get JSON, without parsing them.
+    """
+    return accept is None or accept in ("*/*", JSON_MEDIA_TYPE)
+
+
+def sniff_media_type(data: bytes) -> str:
+    """
+    Returns the media type of an image or document from its leading bytes.
+    """
+    for signature, media_type in _SIGNATURES:
+        if data.startswith(signature):
+            return media_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    return "application/octet-stream"
+
+
+def negotiate(
+    accept: Optional[str],
+    model: BaseModel,
+    artifact_field: Optional[str] = None,
+    artifact: Optional[bytes] = None,
+    status_code: int = 200,
+) -> Response:
+    """
+    Serializes a service response as JSON, MessagePack or the raw artifact it carries,
+    whichever the client's `Accept` header prefers.
+
+    Raw bytes are offered when the model carries a binary artifact, either base64
+    encoded in `artifact_field` or passed as `artifact`; the media type is detected
+    from the bytes (e.g. 'image/png'), and 'application/octet-stream' also selects it.
+    In MessagePack the base64 field is replaced by the raw bytes. JSON stays the
+    default, so existing clients see no change.
+
+    Args:
+        accept (Optional[str]): The request's Accept header.
+        model (BaseModel): The response built by the service.
+        artifact_field (Optional[str]): Name of the field holding base64 artifact data.
+        artifact (Optional[bytes]): The artifact itself, when the model does not embed it.
+        status_code (int): The HTTP status of the response.
+
+    Returns:
+        Response: A ModelResponse, MsgPackResponse or raw Response.
+    """
+    headers = {"Vary": "Accept"}
+    if accepts_default(accept):
+        return ModelResponse(model, status_code=status_code, headers=headers)
+    if artifact is None and artifact_field is not None:
+        encoded = getattr(model, artifact_field)
+        if encoded:
+            try:
+                artifact = base64.b64decode(encoded)
+            except (binascii.Error, ValueError):
+                artifact = None
+
+    offered = [JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, "application/x-msgpack"]
+    artifact_type = None
+    if artifact is not None:
+        artifact_type = sniff_media_type(artifact)
+        offered += [artifact_type, "application/octet-stream"]
+    chosen = preferred_media_type(accept, offered)
+
+    if chosen in (artifact_type, "application/octet-stream"):
+        return Response(
+            content=artifact,
+            status_code=status_code,
+            headers=headers,
+            media_type=artifact_type,
+        )
+    if chosen in (MSGPACK_MEDIA_TYPE, "application/x-msgpack"):
+        content = model.model_dump(mode="json")
+        if artifact_field is not None and artifact is not None:
+            content[artifact_field] = artifact
+        return MsgPackResponse(content, status_code=status_code, headers=headers)
+    return ModelResponse(model, status_code=status_code, headers=headers)
@@ -0,0 +1,333 @@
+import argparse
+import gc
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("project.serve")
+
+
+class Worker:
+    """
+    Bookkeeping for one forked worker process, as seen by the master.
+    """
+
+    __slots__ = ("pid", "heartbeat_fd", "started_at", "last_heartbeat", "ready")
+
+    def __init__(self, pid: int, heartbeat_fd: int):
+        self.pid = pid
+        self.heartbeat_fd = heartbeat_fd
+        self.started_at = time.monotonic()
+        self.last_heartbeat = self.started_at
+        self.ready = False
+
+
+class Master:
+    """
+    Pre-fork process manager serving `project.server.app` with several uvicorn workers.
+
+    The master imports the application and warms up every enabled service, builds
+    the shared read-only data registered in `project.shared`, freezes the garbage
+    collector so those objects are never written to again, binds the listening
+    socket and then forks the workers. Workers therefore start instantly and share
+    the preloaded modules copy-on-write; each runs the app's lifespan, so it opens its
+    own Prisma connection and starts its own background writers.
+
+    Workers report readiness and liveness through a heartbeat pipe. A worker that
+    exits is replaced, and one that stops heartbeating for `worker_timeout` seconds
+    is killed and replaced.
+
+    Signals:
+        SIGTERM, SIGINT: graceful stop; workers finish in-flight requests first.
+        SIGHUP: rolling restart; each worker is replaced only after its successor is
+            ready, and the listening socket is never closed, so no request is refused.
+        SIGTTIN, SIGTTOU: add or remove one worker.
+    """
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: Optional[int] = None,
+        backlog: int = 2048,
+        graceful_timeout: float = 30.0,
+        worker_timeout: float = 60.0,
+        max_requests: Optional[int] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.workers = workers or default_worker_count()
+        self.backlog = backlog
+        self.graceful_timeout = graceful_timeout
+        self.worker_timeout = worker_timeout
+        self.max_requests = max_requests
+        self.socket: Optional[socket.socket] = None
+        self.app = None
+        self._workers: Dict[int, Worker] = {}
+        self._signals: List[int] = []
+        self._stopping = False
+
+    def preload(self) -> None:
+        # Jobs must be visible to whichever worker a client polls.
+        if not os.environ.get("JOB_STORE_DIR"):
+            os.environ["JOB_STORE_DIR"] = tempfile.mkdtemp(prefix="multitool-jobs-")
+        import project.registry
+        import project.server
+        import project.shared
+
+        self.app = project.server.app
+        if project.registry.warm_up_on_startup():
+            project.registry.registry.warm_up()
+        project.shared.preload()
+        gc.collect()
+        gc.freeze()
+
+    def bind(self) -> None:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        sock.set_inheritable(True)
+        self.socket = sock
+        logger.info("Listening on %s:%d", self.host, self.port)
+
+    def spawn(self) -> Worker:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            exit_code = 1
+            try:
+                self._run_worker(write_fd)
+                exit_code = 0
+            except BaseException:
+                logger.exception("Worker %d crashed", os.getpid())
+            finally:
+                os._exit(exit_code)
+        os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        worker = Worker(pid, read_fd)
+        self._workers[pid] = worker
+        logger.info("Spawned worker %d", pid)
+        return worker
+
+    def _run_worker(self, heartbeat_fd: int) -> None:
+        import uvicorn
+
+        for signum in (signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(signum, signal.SIG_DFL)
+        for worker in self._workers.values():
+            os.close(worker.heartbeat_fd)
+        self._workers = {}
+
+        async def heartbeat() -> None:
+            os.write(heartbeat_fd, b".")
+
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            timeout_graceful_shutdown=self.graceful_timeout,
+            limit_max_requests=self.max_requests,
+            callback_notify=heartbeat,
+            timeout_notify=1,
+        )
+        uvicorn.Server(config).run(sockets=[self.socket])
+
+    def _handle_signal(self, signum, frame) -> None:
+        self._signals.append(signum)
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self._workers.pop(pid, None)
+            if worker is not None:
+                os.close(worker.heartbeat_fd)
+                logger.info(
+                    "Worker %d exited with status %d",
+                    pid,
+                    os.waitstatus_to_exitcode(status),
+                )
+
+    def _read_heartbeats(self, timeout: float) -> None:
+        fds = {w.heartbeat_fd: w for w in self._workers.values()}
+        if not fds:
+            time.sleep(timeout)
+            return
+        try:
+            readable, _, _ = select.select(list(fds), [], [], timeout)
+        except InterruptedError:
+            return
+        now = time.monotonic()
+        for fd in readable:
+            worker = fds[fd]
+            try:
+                data = os.read(fd, 1024)
+            except BlockingIOError:
+                continue
+            if data:
+                worker.last_heartbeat = now
+                worker.ready = True
+
+    def _kill_unresponsive(self) -> None:
+        now = time.monotonic()
+        for worker in list(self._workers.values()):
+            if now - worker.last_heartbeat > self.worker_timeout:
+                logger.error("Worker %d is unresponsive, killing it", worker.pid)
+                self._kill(worker.pid, signal.SIGKILL)
+
+    def _kill(self, pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _wait_until_ready(self, worker: Worker) -> bool:
+        deadline = time.monotonic() + self.worker_timeout
+        while time.monotonic() < deadline and worker.pid in self._workers:
+            self._read_heartbeats(0.1)
+            self._reap()
+            if worker.ready:
+                return True
+        return False
+
+    def rolling_restart(self) -> None:
+        """
+        Replaces workers one at a time, stopping each only once its successor is ready.
+        """
+        for pid in list(self._workers):
+            if self._stopping:
+                return
+            successor = self.spawn()
+            if not self._wait_until_ready(successor):
+                logger.error("Replacement worker did not start; aborting restart")
+                return
+            self._kill(pid, signal.SIGTERM)
+
+    def stop(self) -> None:
+        """
+        Asks every worker to finish in-flight requests and exit, killing stragglers
+        after the graceful timeout.
+        """
+        self._stopping = True
+        for pid in list(self._workers):
+            self._kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self._workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self._workers):
+            self._kill(pid, signal.SIGKILL)
+        self._reap()
+
+    def run(self) -> None:
+        self.preload()
+        self.bind()
+        for signum in (
+            signal.SIGTERM,
+            signal.SIGINT,
+            signal.SIGHUP,
+            signal.SIGTTIN,
+            signal.SIGTTOU,
+        ):
+            signal.signal(signum, self._handle_signal)
+        for _ in range(self.workers):
+            self.spawn()
+
+        while True:
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    logger.info("Stopping %d workers", len(self._workers))
+                    self.stop()
+                    self.socket.close()
+                    return
+                if signum == signal.SIGHUP:
+                    logger.info("Rolling restart of %d workers", len(self._workers))
+                    self.rolling_restart()
+                elif signum == signal.SIGTTIN:
+                    self.workers += 1
+                elif signum == signal.SIGTTOU and self.workers > 1:
+                    self.workers -= 1
+                    self._kill(max(self._workers), signal.SIGTERM)
+            self._reap()
+            self._kill_unresponsive()
+            for _ in range(self.workers - len(self._workers)):
+                self.spawn()
+            self._read_heartbeats(0.5)
+
+
+def default_worker_count() -> int:
+    """
+    WEB_CONCURRENCY if set, otherwise one worker per CPU available to this process.
+    """
+    if os.environ.get("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m project.serve",
+        description="Serve the API with a pre-forked pool of uvicorn workers.",
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: WEB_CONCURRENCY or the CPU count).",
+    )
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument(
+        "--graceful-timeout",
+        type=float,
+        default=30.0,
+        help="Seconds a stopping worker may spend finishing in-flight requests.",
+    )
+    parser.add_argument(
+        "--worker-timeout",
+        type=float,
+        default=60.0,
+        help="Seconds without a heartbeat after which a worker is killed and replaced.",
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=None,
+        help="Recycle each worker after this many requests.",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s [%(process)d] %(levelname)s %(message)s"
+    )
+    Master(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        backlog=args.backlog,
+        graceful_timeout=args.graceful_timeout,
+        worker_timeout=args.worker_timeout,
+        max_requests=args.max_requests,
+    ).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,42 @@
+import asyncio
 import logging
+import math
+import os
 from contextlib import asynccontextmanager
 from typing import Optional
 
 import project.add_watermark_to_pdf_service
+import project.analytics
+import project.auth
 import project.check_password_strength_service
+import project.compression
 import project.convert_feed_to_json_service
 import project.convert_timezone_service
+import project.execute_batch_service
+import project.feeds
 import project.generate_barcode_service
 import project.generate_qr_code_service
 import project.generate_url_preview_service
+import project.get_exchange_rate_history_service
 import project.get_exchange_rate_service
+import project.get_feed_items_service
 import project.get_ip_geolocation_service
+import project.get_job_status_service
+import project.get_usage_analytics_service
+import project.imaging
+import project.jobs
+import project.metrics
+import project.registry
+import project.request_log
 import project.resize_image_service
+import project.responses
+import project.shared
+import project.submit_job_service
+import project.subscribe_feed_service
 import project.text_to_speech_convert_service
 import project.validate_email_service
-from fastapi import FastAPI
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import Response
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, Response
 from prisma import Prisma
 
 logger = logging.getLogger(__name__)
@@ -27,16 +47,50 @@ db_client = Prisma(auto_register=True)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db_client.connect()
+    await project.registry.registry.apply_feature_flags()
+    project.registry.registry.prune_routes(app)
+    if project.registry.warm_up_on_startup():
+        project.registry.registry.warm_up()
+    # Already built in the serving master; otherwise built here, off the event loop.
+    await asyncio.to_thread(project.shared.preload)
+    await project.request_log.request_logger.start()
+    await project.analytics.usage_aggregator.start()
+    await project.jobs.job_queue.start()
+    if project.registry.registry.is_enabled("convert_feed_to_json"):
+        await project.feeds.feed_scheduler.start()
     yield
+    await project.feeds.feed_scheduler.stop()
+    await project.jobs.job_queue.stop()
+    await project.analytics.usage_aggregator.stop()
+    await project.request_log.request_logger.stop()
     await db_client.disconnect()
 
 
 app = FastAPI(
     title="multi tool",
     lifespan=lifespan,
+    default_response_class=project.responses.ModelResponse,
     description="The Multi-Purpose API Toolkit provides a robust and cohesive collection of APIs designed to facilitate a wide array of common yet pivotal tasks for developers. This toolkit consolidates diverse functionalities into a singular endpoint, simplifying the process of integrating multiple third-party services. Key offerings include:\n\n1. **QR Code Generator**: Allows for the creation of custom QR codes to streamline the process of information sharing.\n2. **Currency Exchange Rate**: Enables access to real-time exchange rates across a variety of currencies, aiding in financial transactions and analyses.\n3. **IP Geolocation**: Offers detailed geolocation data based on IP addresses, which can be pivotal for content localization and user analytics.\n4. **Image Resizing**: Provides on-the-fly resizing and optimization of images, crucial for improving web performance and user experience.\n5. **Password Strength Checker**: Assesses the strength of passwords, offering suggestions for improvements to bolster security.\n6. **Text-to-Speech**: Converts text into natural-sounding audio, enhancing accessibility and user engagement.\n7. **Barcode Generator**: Generates high-quality barcodes in various formats, supporting a range of inventory and retail applications.\n8. **Email Validation**: Validates email addresses to improve deliverability and reduce bounce rates, essential for marketing and outreach efforts.\n9. **Time Zone Conversion**: Facilitates the conversion of timestamps between different time zones, critical for global applications and communications.\n10. **URL Preview**: Extracts metadata and generates previews for web links, aiding in content curation and social sharing.\n11. **PDF Watermarking**: Allows the addition of customizable watermarks to PDF documents, useful for copyright protection and branding.\n12. **RSS Feed to JSON**: Converts RSS feeds into structured JSON format, simplifying the integration of live updates and news into applications.\n\nThis toolkit's design emphasizes simplicity and ease of use, offering developers a versatile set of tools to enhance project capabilities without the complexity of managing multiple API integrations. Through a single endpoint, the toolkit streamlines development workflows and fosters efficiency across various domains, from web development to software engineering.",
 )
 
+app.add_middleware(project.compression.CompressionMiddleware)
+app.add_middleware(project.auth.ApiKeyMiddleware)
+app.add_middleware(project.analytics.UsageAnalyticsMiddleware)
+app.add_middleware(project.request_log.RequestLogMiddleware)
+app.add_middleware(project.metrics.MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def api_get_metrics() -> Response:
+    """
+    Exposes request and per-stage latency histograms in the Prometheus text format.
+    """
+    project.metrics.update_process_metrics()
+    return Response(
+        content=project.metrics.REGISTRY.render(),
+        media_type=project.metrics.PROMETHEUS_CONTENT_TYPE,
+    )
+
 
 @app.get(
     "/geolocation/{ip}",
@@ -50,41 +104,52 @@ async def api_get_get_ip_geolocation(
     """
     try:
         res = await project.get_ip_geolocation_service.get_ip_geolocation(ip)
-        return res
+        return project.responses.ModelResponse(res)
     except Exception as e:
         logger.exception("Error processing request")
-        res = dict()
-        res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.responses.error_response(500, str(e))
 
 
 @app.post(
     "/image/resize", response_model=project.resize_image_service.ResizeImageResponse
 )
 async def api_post_resize_image(
-    image_data: str, width: int, height: int, format: Optional[str]
+    image_data: str,
+    width: int,
+    height: int,
+    format: Optional[str],
+    request: Request,
+    quality: Optional[int] = None,
+    max_bytes: Optional[int] = None,
 ) -> project.resize_image_service.ResizeImageResponse | Response:
     """
     Resizes an image according to specified dimensions and optimization settings.
     """
+    accept = request.headers.get("accept")
     try:
-        res = project.resize_image_service.resize_image(
-            image_data, width, height, format
+        # Off the event loop: waiting for image memory budget blocks the thread.
+        res = await project.registry.registry.run_blocking(
+            project.resize_image_service.resize_image,
+            image_data,
+            width,
+            height,
+            format,
+            quality=quality,
+            max_bytes=max_bytes,
+            accept=accept,
+        )
+        return project.responses.negotiate(accept, res, "resized_image_data")
+    except project.imaging.ImageTooLargeError as e:
+        return project.responses.error_response(413, str(e))
+    except project.imaging.ImageBudgetExhaustedError as e:
+        return project.responses.error_response(
+            503, str(e), {"Retry-After": str(math.ceil(project.imaging.budget.timeout))}
         )
-        return res
+    except ValueError as e:
+        return project.responses.error_response(422, str(e))
     except Exception as e:
         logger.exception("Error processing request")
-        res = dict()
-        res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.responses.error_response(500, str(e))
 
 
 @app.post(
@@ -105,16 +170,10 @@ async def api_post_text_to_speech_convert(
         res = project.text_to_speech_convert_service.text_to_speech_convert(
             text, language, pitch, speed, gender
         )
-        return res
+        return project.responses.ModelResponse(res)
     except Exception as e:
         logger.exception("Error processing request")
-        res = dict()
-        res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.responses.error_response(500, str(e))
 
 
 @app.post(
@@ -129,24 +188,43 @@ async def api_post_generate_barcode(
     color: Optional[str],
     background_color: Optional[str],
     text: Optional[str],
+    request: Request,
+    image_format: Optional[str] = None,
+    max_bytes: Optional[int] = None,
 ) -> project.generate_barcode_service.GenerateBarcodeResponse | Response:
     """
     Generates a barcode in a specified format with customization options.
     """
+    accept = request.headers.get("accept")
     try:
-        res = project.generate_barcode_service.generate_barcode(
-            height, format, content, width, color, background_color, text
+        # Off the event loop: 'auto' with max_bytes encodes the image several times.
+        res = await project.registry.registry.run_blocking(
+            project.generate_barcode_service.generate_barcode,
+            format=format,
+            content=content,
+            width=width,
+            height=height,
+            color=color,
+            background_color=background_color,
+            text=text,
+            image_format=image_format,
+            max_bytes=max_bytes,
+            accept=accept,
         )
-        return res
+        artifact = None
+        if not project.responses.accepts_default(accept):
+            with open(res.barcode_image_url, "rb") as f:
+                artifact = f.read()
+        response = project.responses.negotiate(accept, res, artifact=artifact)
+        if artifact is not None and response.body == artifact:
+            # The client got the image itself, so nobody will read the file.
+            os.remove(res.barcode_image_url)
+        return response
+    except ValueError as e:
+        return project.responses.error_response(422, str(e))
     except Exception as e:
         logger.exception("Error processing request")
-        res = dict()
-        res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.responses.error_response(500, str(e))
 
 
 @app.get(
@@ -163,16 +241,37 @@ async def api_get_get_exchange_rate(
         res = await project.get_exchange_rate_service.get_exchange_rate(
             base_currency, target_currency, date
         )
-        return res
+        return project.responses.ModelResponse(res)
     except Exception as e:
         logger.exception("Error processing request")
-        res = dict()
-        res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
+        return project.responses.error_response(500, str(e))
+
+
+@app.get(
+    "/currency/history",
+    response_model=project.get_exchange_rate_history_service.ExchangeRateHistoryResponse,
+)
+async def api_get_get_exchange_rate_history(
+    base_currency: str,
+    target_currencies: str,
+    start_date: str,
+    request: Request,
+    end_date: Optional[str] = None,
+    interval: str = "day",
+) -> project.get_exchange_rate_history_service.ExchangeRateHistoryResponse | Response:
+    """
+    Retrieves daily, weekly or monthly exchange rates of several currencies over a date range.
+    """
+    try:
+        res = await project.get_exchange_rate_history_service.get_exchange_rate_history(
+            base_currency, target_currencies, start_date, end_date, interval
         )
+        return project.responses.negotiate(request.headers.get("accept"), res)
+    except ValueError as e:
+        return project.responses.error_response(422, str(e))
+    except Exception as e:
+        logger.exception("Error processing request")
+        return project.responses.error_response(500, str(e))
 
 
 @app.post(
@@ -181,22 +280,137 @@ async def api_get_get_exchange_rate(
 )
 async def api_post_convert_feed_to_json(
     feed_url: str,
+    request: Request,
 ) -> project.convert_feed_to_json_service.FeedConversionResponse | Response:
     """
     Converts an RSS or Atom feed into a structured JSON format.
     """
+    import httpx
+
+    try:
+        res = await project.convert_feed_to_json_service.convert_feed_to_json(feed_url)
+        return project.responses.negotiate(request.headers.get("accept"), res)
+    except ValueError as e:
+        return project.responses.error_response(422, str(e))
+    except (httpx.HTTPStatusError, httpx.RequestError) as e:
+        return project.responses.error_response(502, f"Could not fetch the feed: {e}")
+    except Exception as e:
+        logger.exception("Error processing request")
+        return project.responses.error_response(500, str(e))
+
+
+@app.post(
+    "/feeds",
+    status_code=201,
+    response_model=project.subscribe_feed_service.FeedSubscriptionResponse,
+)
+async def api_post_subscribe_feed(
+    subscription: project.subscribe_feed_service.FeedSubscriptionRequest,
+    request: Request,
+) -> project.subscribe_feed_service.FeedSubscriptionResponse | Response:
+    """
+    Subscribes to an RSS or Atom feed that is then kept up to date in the background.
+    """
+    try:
+        res = await project.subscribe_feed_service.subscribe_feed(
+            subscription, getattr(request.state, "principal", None)
+        )
+        return project.responses.ModelResponse(res, status_code=201)
+    except ValueError as e:
+        return project.responses.error_response(422, str(e))
+    except Exception as e:
+        logger.exception("Error processing request")
+        return project.responses.error_response(500, str(e))
+
+
+@app.delete("/feeds/{feed_id}", status_code=204)
+async def api_delete_unsubscribe_feed(feed_id: str, request: Request) -> Response:
+    """
+    Unsubscribes from a feed.
+    """
+    try:
+        if not await project.subscribe_feed_service.unsubscribe_feed(
+            feed_id, getattr(request.state, "principal", None)
+        ):
+            return project.responses.error_response(404, "Subscription not found.")
+        return Response(status_code=204)
+    except Exception as e:
+        logger.exception("Error processing request")
+        return project.responses.error_response(500, str(e))
+
+
+@app.get(
+    "/feeds/{feed_id}/items",
+    response_model=project.get_feed_items_service.FeedItemsResponse,
+)
+async def api_get_get_feed_items(
+    feed_id: str, request: Request, cursor: int = 0, limit: int = 100
+) -> project.get_feed_items_service.FeedItemsResponse | Response:
+    """
+    Returns the items of a subscribed feed received after `cursor`, without fetching the feed.
+    """
     try:
-        res = project.convert_feed_to_json_service.convert_feed_to_json(feed_url)
-        return res
+        res = await project.get_feed_items_service.get_feed_items(
+            feed_id, getattr(request.state, "principal", None), cursor, limit
+        )
+        if res is None:
+            return project.responses.error_response(404, "Subscription not found.")
+        return project.responses.negotiate(request.headers.get("accept"), res)
     except Exception as e:
         logger.exception("Error processing request")
-        res = dict()
-        res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
+        return project.responses.error_response(500, str(e))
+
+
+@app.get("/feeds/websub/{feed_id}/{token}", include_in_schema=False)
+async def api_get_verify_websub(feed_id: str, token: str, request: Request) -> Response:
+    """
+    Answers a WebSub hub's verification of intent for a feed subscription.
+    """
+    params = request.query_params
+    challenge = await project.feeds.feed_scheduler.verify_intent(
+        feed_id,
+        token,
+        params.get("hub.mode"),
+        params.get("hub.topic"),
+        params.get("hub.challenge"),
+        params.get("hub.lease_seconds"),
+    )
+    if challenge is None:
+        return PlainTextResponse("Unknown subscription.", status_code=404)
+    return PlainTextResponse(challenge)
+
+
+@app.post("/feeds/websub/{feed_id}/{token}", include_in_schema=False)
+async def api_post_receive_websub(
+    feed_id: str, token: str, request: Request
+) -> Response:
+    """
+    Receives feed content pushed by a WebSub hub.
+    """
+    scheduler = project.feeds.feed_scheduler
+    try:
+        # Checked before reading the body: this route needs no API key.
+        feed = await scheduler.push_target(feed_id, token)
+        if feed is None:
+            # 410 tells the hub to stop delivering for feeds nobody follows any more.
+            return Response(status_code=410)
+        length = request.headers.get("content-length", "")
+        if length.isdigit() and int(length) > scheduler.max_push_bytes:
+            return Response(status_code=413)
+        body = bytearray()
+        async for chunk in request.stream():
+            body += chunk
+            if len(body) > scheduler.max_push_bytes:
+                return Response(status_code=413)
+        await scheduler.receive(
+            feed, bytes(body), request.headers.get("x-hub-signature")
         )
+    except project.feeds.WebSubPushRejectedError:
+        return Response(status_code=403)
+    except Exception:
+        logger.exception("Error processing WebSub content")
+        return Response(status_code=500)
+    return Response(status_code=202)
 
 
 @app.post(
@@ -209,6 +423,7 @@ async def api_post_add_watermark_to_pdf(
     text_style: project.add_watermark_to_pdf_service.TextStyle,
     opacity: float,
     position: str,
+    request: Request,
 ) -> project.add_watermark_to_pdf_service.AddWatermarkResponse | Response:
     """
     Adds a customizable watermark to a PDF document.
@@ -217,16 +432,12 @@ async def api_post_add_watermark_to_pdf(
         res = project.add_watermark_to_pdf_service.add_watermark_to_pdf(
             pdf_document, watermark_text, text_style, opacity, position
         )
-        return res
+        return project.responses.negotiate(
+            request.headers.get("accept"), res, "modified_pdf"
+        )
     except Exception as e:
         logger.exception("Error processing request")
-        res = dict()
-        res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.responses.error_response(500, str(e))
 
 
 @app.post(
@@ -234,25 +445,38 @@ async def api_post_add_watermark_to_pdf(
     response_model=project.generate_qr_code_service.GenerateQRCodeResponse,
 )
 async def api_post_generate_qr_code(
-    content: str, size: int, color: str, background_color: str, border: int
+    content: str,
+    size: int,
+    color: str,
+    background_color: str,
+    border: int,
+    request: Request,
+    image_format: Optional[str] = None,
+    max_bytes: Optional[int] = None,
 ) -> project.generate_qr_code_service.GenerateQRCodeResponse | Response:
     """
     Generates a custom QR Code based on user specifications
     """
+    accept = request.headers.get("accept")
     try:
-        res = project.generate_qr_code_service.generate_qr_code(
-            content, size, color, background_color, border
+        # Off the event loop: 'auto' with max_bytes encodes the image several times.
+        res = await project.registry.registry.run_blocking(
+            project.generate_qr_code_service.generate_qr_code,
+            content,
+            size,
+            color,
+            background_color,
+            border,
+            image_format=image_format,
+            max_bytes=max_bytes,
+            accept=accept,
         )
-        return res
+        return project.responses.negotiate(accept, res, "qr_code_data")
+    except ValueError as e:
+        return project.responses.error_response(422, str(e))
     except Exception as e:
         logger.exception("Error processing request")
-        res = dict()
-        res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.responses.error_response(500, str(e))
 
 
 @app.post(
@@ -267,16 +491,10 @@ async def api_post_generate_url_preview(
     """
     try:
         res = await project.generate_url_preview_service.generate_url_preview(url)
-        return res
+        return project.responses.ModelResponse(res)
     except Exception as e:
         logger.exception("Error processing request")
-        res = dict()
-        res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.responses.error_response(500, str(e))
 
 
 @app.post(
@@ -291,16 +509,10 @@ async def api_post_check_password_strength(
     """
     try:
         res = project.check_password_strength_service.check_password_strength(password)
-        return res
+        return project.responses.ModelResponse(res)
     except Exception as e:
         logger.exception("Error processing request")
-        res = dict()
-        res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.responses.error_response(500, str(e))
 
 
 @app.post(
@@ -317,16 +529,10 @@ async def api_post_convert_timezone(
         res = project.convert_timezone_service.convert_timezone(
             timestamp, source_timezone, target_timezone
         )
-        return res
+        return project.responses.ModelResponse(res)
     except Exception as e:
         logger.exception("Error processing request")
-        res = dict()
-        res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
-        )
+        return project.responses.error_response(500, str(e))
 
 
 @app.post(
@@ -341,13 +547,118 @@ async def api_post_validate_email(
     """
     try:
         res = project.validate_email_service.validate_email(email)
-        return res
+        return project.responses.ModelResponse(res)
+    except Exception as e:
+        logger.exception("Error processing request")
+        return project.responses.error_response(500, str(e))
+
+
+@app.get(
+    "/analytics/usage",
+    response_model=project.get_usage_analytics_service.UsageAnalyticsResponse,
+)
+async def api_get_get_usage_analytics(
+    request: Request, days: int = 7, module: Optional[str] = None
+) -> project.get_usage_analytics_service.UsageAnalyticsResponse | Response:
+    """
+    Returns daily per-feature usage (calls, errors, bytes, latency percentiles) from the analytics rollups.
+    """
+    # Rollups cover every tenant, so only administrators may read them.
+    if not project.auth.is_admin(request.state):
+        return project.responses.error_response(
+            403, "Usage analytics are restricted to administrators."
+        )
+    try:
+        res = await project.get_usage_analytics_service.get_usage_analytics(
+            days, module
+        )
+        return project.responses.ModelResponse(res)
+    except ValueError as e:
+        return project.responses.error_response(422, str(e))
+    except Exception as e:
+        logger.exception("Error processing request")
+        return project.responses.error_response(500, str(e))
+
+
+@app.post("/batch", response_model=project.execute_batch_service.BatchResponse)
+async def api_post_execute_batch(
+    batch: project.execute_batch_service.BatchRequest, request: Request
+) -> project.execute_batch_service.BatchResponse | Response:
+    """
+    Executes several tool calls in one request and returns their results in order.
+    """
+    try:
+        # Malformed batches are refused before they cost any rate-limit tokens.
+        project.execute_batch_service.validate_batch(batch)
+    except ValueError as e:
+        return project.responses.error_response(422, str(e))
+    principal = getattr(request.state, "principal", None)
+    retry_after = await project.auth.charge(principal, len(batch.operations) - 1)
+    if retry_after:
+        return project.responses.error_response(
+            429,
+            "Rate limit exceeded for this batch size.",
+            {"Retry-After": str(math.ceil(retry_after))},
+        )
+    try:
+        res = await project.execute_batch_service.execute_batch(batch)
+        return project.responses.negotiate(request.headers.get("accept"), res)
+    except ValueError as e:
+        return project.responses.error_response(422, str(e))
+    except Exception as e:
+        logger.exception("Error processing request")
+        return project.responses.error_response(500, str(e))
+
+
+@app.post(
+    "/jobs",
+    status_code=202,
+    response_model=project.get_job_status_service.JobStatusResponse,
+)
+async def api_post_submit_job(
+    job: project.submit_job_service.JobRequest, request: Request
+) -> project.get_job_status_service.JobStatusResponse | Response:
+    """
+    Queues a tool call for background processing and returns the job id to poll.
+    """
+    try:
+        res = await project.submit_job_service.submit_job(
+            job, getattr(request.state, "principal", None)
+        )
+        return project.responses.ModelResponse(res, status_code=202)
+    except project.registry.ToolDisabledError as e:
+        return project.responses.error_response(404, str(e))
+    except (TypeError, ValueError) as e:
+        return project.responses.error_response(422, str(e))
+    except project.jobs.JobLimitExceededError as e:
+        return project.responses.error_response(429, str(e), {"Retry-After": "5"})
+    except project.jobs.JobQueueFullError as e:
+        return project.responses.error_response(503, str(e), {"Retry-After": "5"})
     except Exception as e:
         logger.exception("Error processing request")
-        res = dict()
-        res["error"] = str(e)
-        return Response(
-            content=jsonable_encoder(res),
-            status_code=500,
-            media_type="application/json",
+        return project.responses.error_response(500, str(e))
+
+
+@app.get(
+    "/jobs/{job_id}",
+    response_model=project.get_job_status_service.JobStatusResponse,
+)
+async def api_get_get_job_status(
+    job_id: str, request: Request
+) -> project.get_job_status_service.JobStatusResponse | Response:
+    """
+    Returns the status of a background job and, once finished, its result or error.
+    """
+    try:
+        res = await project.get_job_status_service.get_job_status(
+            job_id, getattr(request.state, "principal", None)
         )
+        if res is None:
+            return project.responses.error_response(404, f"Job '{job_id}' not found.")
+        return project.responses.ModelResponse(res)
+    except Exception as e:
+        logger.exception("Error processing request")
+        return project.responses.error_response(500, str(e))
+
+
+project.registry.registry.prune_routes(app)
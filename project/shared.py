@@ -0,0 +1,89 @@
+import logging
+import mmap
+from array import array
+from typing import Any, Callable, Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class SharedArray:
+    """
+    Read-only typed array stored in an anonymous shared memory mapping.
+
+    Created in the serving master before workers are forked, the mapping is shared
+    by every worker: the values are stored once in physical memory no matter how many
+    workers read them, and unlike ordinary Python objects reading them never touches
+    reference counts, so the pages are never copied on write.
+
+    Indexing and slicing go through a `memoryview`, so slices are zero-copy.
+    """
+
+    __slots__ = ("typecode", "_mmap", "view")
+
+    def __init__(self, typecode: str, values: Iterable[Any]):
+        data = values if isinstance(values, array) else array(typecode, values)
+        if data.typecode != typecode:
+            data = array(typecode, data)
+        self.typecode = typecode
+        nbytes = len(data) * data.itemsize
+        # mmap cannot map zero bytes; an empty array keeps one unused byte.
+        self._mmap = mmap.mmap(-1, max(nbytes, 1))
+        self._mmap.write(data.tobytes())
+        self.view = memoryview(self._mmap)[:nbytes].cast(typecode)
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+    def __getitem__(self, index):
+        return self.view[index]
+
+    @property
+    def nbytes(self) -> int:
+        return self.view.nbytes
+
+    def to_array(self) -> array:
+        return array(self.typecode, self.view)
+
+
+_builders: Dict[str, Callable[[], Any]] = {}
+_data: Dict[str, Any] = {}
+
+
+def register(name: str, builder: Callable[[], Any]) -> None:
+    """
+    Declares read-only data to build once in the master process before forking.
+
+    Args:
+        name (str): Key later passed to `get`.
+        builder (Callable[[], Any]): Builds the data, typically returning `SharedArray`s.
+    """
+    _builders[name] = builder
+
+
+def get(name: str, build: bool = True) -> Any:
+    """
+    Returns preloaded data, building it in this process if it was not preloaded.
+
+    Args:
+        name (str): Key the data was registered under.
+        build (bool): Build missing data; pass False on the event loop, where building
+            would block every request, to get None instead.
+    """
+    if name not in _data:
+        if not build:
+            return None
+        _data[name] = _builders[name]()
+    return _data[name]
+
+
+def preload() -> Dict[str, Any]:
+    """
+    Builds every registered dataset; called by the serving master before forking,
+    and on a worker thread at application startup for data not built yet (e.g. when
+    running a single uvicorn process).
+    """
+    for name, builder in _builders.items():
+        if name not in _data:
+            _data[name] = builder()
+            logger.info("Preloaded shared data %s", name)
+    return _data
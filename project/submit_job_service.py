@@ -0,0 +1,39 @@
+from typing import Any, Dict, Optional
+
+import project.auth
+import project.jobs
+from project.get_job_status_service import JobStatusResponse
+from pydantic import BaseModel, Field
+
+
+class JobRequest(BaseModel):
+    """
+    A tool call to run in the background, with the same `tool` and `params` as a
+    /batch operation.
+    """
+
+    tool: str
+    params: Dict[str, Any] = Field(default_factory=dict)
+    callback_url: Optional[str] = None
+
+
+async def submit_job(
+    request: JobRequest, principal: Optional[project.auth.Principal]
+) -> JobStatusResponse:
+    """
+    Queues a tool call for the background workers and returns immediately.
+
+    Jobs of higher plans are picked up first. Poll GET /jobs/{job_id} for the result,
+    or pass `callback_url` to receive the finished job as a JSON POST.
+
+    Args:
+        request (JobRequest): The tool, its parameters and an optional callback URL.
+        principal (Optional[Principal]): The caller, whose plan sets priority and limits.
+
+    Returns:
+        JobStatusResponse: The queued job, including the id to poll.
+    """
+    job = await project.jobs.job_queue.submit(
+        request.tool, request.params, principal, request.callback_url
+    )
+    return JobStatusResponse.from_job(job)
@@ -0,0 +1,84 @@
+from datetime import datetime
+from typing import Any, Optional
+
+import project.auth
+import project.feeds
+from pydantic import BaseModel
+
+
+class FeedSubscriptionRequest(BaseModel):
+    """
+    The RSS or Atom feed to follow.
+    """
+
+    feed_url: str
+
+
+class FeedSubscriptionResponse(BaseModel):
+    """
+    A subscribed feed; read its items with GET /feeds/{feed_id}/items.
+
+    `websub` is true once the feed's hub has confirmed the subscription and pushes new
+    items, otherwise the feed is polled every `poll_interval` seconds.
+    """
+
+    feed_id: str
+    feed_url: str
+    title: Optional[str] = None
+    poll_interval: int
+    next_poll_at: datetime
+    websub: bool
+
+    @classmethod
+    def from_feed(cls, feed: Any) -> "FeedSubscriptionResponse":
+        return cls(
+            feed_id=feed.id,
+            feed_url=feed.url,
+            title=feed.title,
+            poll_interval=feed.pollInterval,
+            next_poll_at=feed.nextPollAt,
+            websub=feed.websubState == "VERIFIED",
+        )
+
+
+async def subscribe_feed(
+    request: FeedSubscriptionRequest, principal: Optional[project.auth.Principal]
+) -> FeedSubscriptionResponse:
+    """
+    Subscribes the caller to a feed, which is then kept up to date in the background.
+
+    A feed is fetched once when its first subscriber arrives; subscribing to a feed that
+    is already followed costs no upstream request.
+
+    Args:
+        request (FeedSubscriptionRequest): The URL of the feed.
+        principal (Optional[Principal]): The caller.
+
+    Returns:
+        FeedSubscriptionResponse: The feed's id and polling state.
+
+    Raises:
+        ValueError: If the URL is invalid or the feed cannot be fetched or parsed.
+    """
+    feed = await project.feeds.feed_scheduler.subscribe(
+        request.feed_url, principal.user_id if principal else None
+    )
+    return FeedSubscriptionResponse.from_feed(feed)
+
+
+async def unsubscribe_feed(
+    feed_id: str, principal: Optional[project.auth.Principal]
+) -> bool:
+    """
+    Unsubscribes the caller from a feed.
+
+    Args:
+        feed_id (str): The id returned when subscribing.
+        principal (Optional[Principal]): The caller.
+
+    Returns:
+        bool: False if the caller was not subscribed to the feed.
+    """
+    return await project.feeds.feed_scheduler.unsubscribe(
+        feed_id, principal.user_id if principal else None
+    )
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from google.cloud import texttospeech_v1 as texttospeech
+import project.metrics
 from pydantic import BaseModel
 
 
@@ -34,6 +34,8 @@ def text_to_speech_convert(
     Returns:
         TextToSpeechResponse: Provides a response containing the audio data or a link to the generated speech audio.
     """
+    from google.cloud import texttospeech_v1 as texttospeech
+
     client = texttospeech.TextToSpeechClient()
     synthesis_input = texttospeech.SynthesisInput(text=text)
     if gender == "male":
@@ -50,11 +52,19 @@ def text_to_speech_convert(
         pitch=pitch if pitch is not None else 0,
         speaking_rate=speed if speed is not None else 1.0,
     )
-    response = client.synthesize_speech(
-        input=synthesis_input, voice=voice, audio_config=audio_config
-    )
+    with project.metrics.timed("text_to_speech_convert", "synthesize"):
+        response = client.synthesize_speech(
+            input=synthesis_input, voice=voice, audio_config=audio_config
+        )
     fake_audio_link = "https://cloudstorage/audio/generated_audio.mp3"
     status = "Success"
     return TextToSpeechResponse(
         audio_link=fake_audio_link, audio_format="mp3", status=status
     )
+
+
+def warm_up() -> None:
+    """
+    Imports the Google Cloud Text-to-Speech client (grpc, protobuf) ahead of the first request.
+    """
+    from google.cloud import texttospeech_v1  # noqa: F401
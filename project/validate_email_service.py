@@ -1,7 +1,6 @@
 from typing import Optional
 
-from email_validator import EmailNotValidError
-from email_validator import validate_email as external_validate_email
+import project.metrics
 from pydantic import BaseModel
 
 
@@ -36,8 +35,12 @@ def validate_email(email: str) -> ValidateEmailResponse:
         > print(result.is_valid, result.suggestions, result.errors)
         > False, None, 'The email address is not valid according to the user's email domain's DNS records.'
     """
+    from email_validator import EmailNotValidError
+    from email_validator import validate_email as external_validate_email
+
     try:
-        result = external_validate_email(email)
+        with project.metrics.timed("validate_email", "validate"):
+            result = external_validate_email(email)
         return ValidateEmailResponse(is_valid=True)
     except EmailNotValidError as e:
         error_message = str(e)
@@ -47,3 +50,10 @@ def validate_email(email: str) -> ValidateEmailResponse:
         return ValidateEmailResponse(
             is_valid=False, suggestions=suggestions, errors=error_message
         )
+
+
+def warm_up() -> None:
+    """
+    Imports email_validator and dnspython ahead of the first request.
+    """
+    import email_validator  # noqa: F401
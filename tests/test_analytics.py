@@ -0,0 +1,55 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+import project.auth
+import project.server
+
+
+class UsageAnalyticsAccessTest(unittest.TestCase):
+    def test_only_admins_see_usage_when_keys_are_required(self):
+        user = project.auth.Principal("key-1", "user-1", "PREMIUM")
+        admin = user._replace(role="ADMIN")
+
+        def state(principal=None):
+            return SimpleNamespace(auth_enabled=True, principal=principal)
+
+        self.assertFalse(project.auth.is_admin(state()))
+        self.assertFalse(project.auth.is_admin(state(principal=user)))
+        self.assertTrue(project.auth.is_admin(state(principal=admin)))
+        self.assertFalse(project.auth.is_admin(SimpleNamespace()))
+
+    def test_admin_check_follows_the_middleware_not_the_environment(self):
+        async def inner(scope, receive, send):
+            states.append(SimpleNamespace(**scope["state"]))
+
+        async def call(middleware):
+            scope = {"type": "http", "path": "/docs", "headers": []}
+            await middleware(scope, None, None)
+
+        states = []
+        for enabled in (True, False):
+            middleware = project.auth.ApiKeyMiddleware(inner, enabled=enabled)
+            with mock.patch.dict(
+                "os.environ", {"REQUIRE_API_KEY": str(not enabled).lower()}
+            ):
+                asyncio.run(call(middleware))
+        self.assertEqual([project.auth.is_admin(s) for s in states], [False, True])
+
+    def test_out_of_range_days_is_a_client_error(self):
+        async def get():
+            transport = httpx.ASGITransport(app=project.server.app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                return await client.get("/analytics/usage", params={"days": 0})
+
+        with mock.patch.dict("os.environ", {"REQUIRE_API_KEY": "false"}):
+            response = asyncio.run(get())
+        self.assertEqual(response.status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
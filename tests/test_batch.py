@@ -0,0 +1,38 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import httpx
+import project.auth
+import project.server
+
+
+class BatchValidationTest(unittest.TestCase):
+    def _post(self, body: dict) -> httpx.Response:
+        async def post():
+            transport = httpx.ASGITransport(app=project.server.app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                return await client.post("/batch", json=body)
+
+        with mock.patch.dict("os.environ", {"REQUIRE_API_KEY": "false"}):
+            return asyncio.run(post())
+
+    def test_malformed_batches_are_rejected_without_charging(self):
+        operation = {"tool": "check_password_strength", "params": {"password": "x"}}
+        bodies = [
+            {"operations": []},
+            {"operations": [operation] * 51},
+            {"operations": [operation], "deadline_ms": 0},
+        ]
+        with mock.patch.object(project.auth, "charge", mock.AsyncMock()) as charge:
+            for body in bodies:
+                response = self._post(body)
+                self.assertEqual(response.status_code, 422, response.text)
+                self.assertIn("error", response.json())
+        charge.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+
+from project.benchmarks.report import BenchmarkReport, find_failed_scenarios
+
+
+def _report(**errors: int) -> BenchmarkReport:
+    return BenchmarkReport(
+        created_at="2024-01-01T00:00:00+00:00",
+        python="3.11",
+        machine="test",
+        load={
+            name: {"requests": 40, "errors": count, "p95_s": 0.01}
+            for name, count in errors.items()
+        },
+    )
+
+
+class FailedScenariosTest(unittest.TestCase):
+    def test_scenarios_with_errors_are_reported(self):
+        report = _report(barcode=40, qr=0)
+        self.assertEqual(find_failed_scenarios(report), {"barcode": 40})
+
+    def test_clean_run_has_no_failures(self):
+        self.assertEqual(find_failed_scenarios(_report(barcode=0, qr=0)), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+import httpx
+import msgpack
+import project.compression
+import project.server
+from fastapi.responses import Response
+
+
+def _app(body: bytes, media_type: str):
+    async def app(scope, receive, send):
+        await Response(body, media_type=media_type)(scope, receive, send)
+
+    return project.compression.CompressionMiddleware(app, minimum_size=16)
+
+
+def _get(app, headers=None) -> httpx.Response:
+    async def get():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.get("/", headers=headers)
+
+    return asyncio.run(get())
+
+
+class CompressionMiddlewareTest(unittest.TestCase):
+    def test_compressible_responses_vary_on_accept_encoding(self):
+        for body, headers in (
+            (b"{}", {"accept-encoding": "gzip"}),
+            (b'{"a": "' + b"x" * 100 + b'"}', {"accept-encoding": "identity"}),
+            (b'{"a": "' + b"x" * 100 + b'"}', {"accept-encoding": "gzip"}),
+        ):
+            response = _get(_app(body, "application/json"), headers)
+            self.assertEqual(response.headers["vary"], "Accept-Encoding")
+            self.assertEqual(response.content, body)
+
+    def test_msgpack_carrying_an_image_is_not_compressed_again(self):
+        png = b"\x89PNG\r\n\x1a\n" + os.urandom(200)
+        body = msgpack.packb({"image": png, "format": "png"}, use_bin_type=True)
+        response = _get(_app(body, "application/msgpack"), {"accept-encoding": "gzip"})
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+
+        plain = msgpack.packb({"text": "x" * 200})
+        response = _get(_app(plain, "application/msgpack"), {"accept-encoding": "gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+
+
+class BarcodeArtifactTest(unittest.TestCase):
+    def test_raw_barcode_leaves_no_temporary_file(self):
+        async def post():
+            transport = httpx.ASGITransport(app=project.server.app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                return await client.post(
+                    "/barcode/generate",
+                    params={
+                        "format": "code128",
+                        "content": "12345",
+                        "width": 20,
+                        "height": 15,
+                        "color": "#000000",
+                        "background_color": "#FFFFFF",
+                        "text": "12345",
+                    },
+                    headers={"accept": "image/png"},
+                )
+
+        with mock.patch.dict("os.environ", {"REQUIRE_API_KEY": "false"}), mock.patch(
+            "os.remove", wraps=os.remove
+        ) as remove:
+            response = asyncio.run(post())
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.headers["content-type"], "image/png")
+        remove.assert_called_once()
+        self.assertFalse(os.path.exists(remove.call_args.args[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import hmac
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+import prisma
+import prisma.models
+import project.feeds
+import project.network
+import project.server
+
+FEED_XML = b"""<rss version="2.0"><channel><title>t</title>
+<item><guid>1</guid><title>one</title></item></channel></rss>"""
+TOKEN = "t0ken"
+TOPIC = "https://feeds.example/feed.xml"
+
+
+class _FeedTable:
+    def __init__(self, *rows: SimpleNamespace):
+        self.rows = {row.id: row for row in rows}
+        self.updates = []
+
+    async def find_unique(self, where, **kwargs):
+        return self.rows.get(where["id"])
+
+    async def update_many(self, where, data):
+        self.updates.append((where["id"], data))
+        return 1
+
+
+def _feed(feed_id: str, state: str, secret=None) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=feed_id,
+        websubState=state,
+        websubSecret=secret,
+        websubToken=TOKEN,
+        topicUrl=TOPIC,
+    )
+
+
+def _call(method: str, path: str, **kwargs) -> httpx.Response:
+    async def call():
+        transport = httpx.ASGITransport(app=project.server.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            return await client.request(method, path, **kwargs)
+
+    with mock.patch.dict("os.environ", {"REQUIRE_API_KEY": "false"}):
+        return asyncio.run(call())
+
+
+class _WebSubTestCase(unittest.TestCase):
+    def setUp(self):
+        self.table = _FeedTable(
+            _feed("polled", "NONE"),
+            _feed("pending", "PENDING", "s3cret"),
+            _feed("verified", "VERIFIED", "s3cret"),
+        )
+        patches = [
+            mock.patch.object(prisma.models.Feed, "prisma", lambda: self.table),
+            mock.patch.object(
+                project.feeds.feed_scheduler,
+                "ingest",
+                mock.AsyncMock(return_value=1),
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+
+class WebSubPushTest(_WebSubTestCase):
+    def _push(self, feed_id: str, headers=None, token=TOKEN) -> httpx.Response:
+        return _call(
+            "POST",
+            f"/feeds/websub/{feed_id}/{token}",
+            content=FEED_XML,
+            headers=headers,
+        )
+
+    def _signature(self, secret: str) -> dict:
+        digest = hmac.new(secret.encode(), FEED_XML, hashlib.sha256).hexdigest()
+        return {"X-Hub-Signature": f"sha256={digest}"}
+
+    def test_unsigned_push_to_polled_feed_is_rejected(self):
+        self.assertEqual(self._push("polled").status_code, 403)
+        project.feeds.feed_scheduler.ingest.assert_not_awaited()
+
+    def test_push_before_verification_is_rejected(self):
+        response = self._push("pending", self._signature("s3cret"))
+        self.assertEqual(response.status_code, 403)
+
+    def test_forged_signature_is_rejected(self):
+        response = self._push("verified", self._signature("guess"))
+        self.assertEqual(response.status_code, 403)
+        project.feeds.feed_scheduler.ingest.assert_not_awaited()
+
+    def test_push_without_the_callback_token_is_rejected(self):
+        response = self._push("verified", self._signature("s3cret"), token="guess")
+        self.assertEqual(response.status_code, 403)
+        project.feeds.feed_scheduler.ingest.assert_not_awaited()
+
+    def test_oversized_push_is_refused(self):
+        with mock.patch.object(project.feeds.feed_scheduler, "max_push_bytes", 16):
+            response = self._push("verified", self._signature("s3cret"))
+        self.assertEqual(response.status_code, 413)
+        project.feeds.feed_scheduler.ingest.assert_not_awaited()
+
+    def test_signed_push_to_verified_feed_is_stored(self):
+        response = self._push("verified", self._signature("s3cret"))
+        self.assertEqual(response.status_code, 202)
+        project.feeds.feed_scheduler.ingest.assert_awaited_once()
+
+    def test_push_to_unknown_feed_is_gone(self):
+        self.assertEqual(self._push("missing").status_code, 410)
+
+
+class WebSubVerificationTest(_WebSubTestCase):
+    def _verify(self, feed_id: str, token: str, **params) -> httpx.Response:
+        query = {f"hub.{k}": v for k, v in params.items()}
+        return _call("GET", f"/feeds/websub/{feed_id}/{token}", params=query)
+
+    def test_denial_without_the_callback_token_is_ignored(self):
+        response = self._verify("verified", "guess", mode="denied")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.table.updates, [])
+
+    def test_confirmation_without_the_callback_token_is_refused(self):
+        response = self._verify(
+            "pending", "guess", mode="subscribe", topic=TOPIC, challenge="c"
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.table.updates, [])
+
+    def test_confirmation_with_the_callback_token_verifies(self):
+        response = self._verify(
+            "pending", TOKEN, mode="subscribe", topic=TOPIC, challenge="c"
+        )
+        self.assertEqual(response.text, "c")
+        self.assertEqual(self.table.updates[0][1]["websubState"], "VERIFIED")
+
+
+class _Database:
+    """
+    Postgres stand-in: seq is taken at insert time, rows become visible at commit
+    and `SELECT ... FOR UPDATE` holds the row lock until commit.
+    """
+
+    def __init__(self):
+        self.next_seq = 1
+        self.row_locks = {}
+        self.committed = []
+
+    def tx(self, **kwargs):
+        return _Transaction(self)
+
+
+class _Transaction:
+    def __init__(self, database: _Database):
+        self.database = database
+        self.pending = []
+        self.lock = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.database.committed.extend(self.pending)
+        if self.lock is not None:
+            self.lock.release()
+
+    async def query_raw(self, query: str, feed_id: str):
+        if "FOR UPDATE" in query:
+            self.lock = self.database.row_locks.setdefault(feed_id, asyncio.Lock())
+            await self.lock.acquire()
+        return [{"id": feed_id}]
+
+
+class _ItemTable:
+    def __init__(self, tx: _Transaction):
+        self.tx = tx
+
+    async def create_many(self, data, skip_duplicates=False):
+        database = self.tx.database
+        first = database.next_seq == 1
+        for _ in data:
+            self.tx.pending.append(database.next_seq)
+            database.next_seq += 1
+        # The first insert commits late, as a slow worker would.
+        await asyncio.sleep(0.05 if first else 0)
+        return len(data)
+
+    async def find_first(self, **kwargs):
+        return None
+
+
+class IngestOrderTest(unittest.TestCase):
+    def test_concurrent_ingests_commit_in_seq_order(self):
+        database = _Database()
+        scheduler = project.feeds.FeedScheduler()
+
+        def items(prefix: str):
+            return [{"id": f"{prefix}{i}"} for i in range(2)]
+
+        async def scenario():
+            await asyncio.gather(
+                scheduler.ingest("feed", items("poll-"), "poll"),
+                scheduler.ingest("feed", items("push-"), "websub"),
+            )
+
+        with mock.patch.object(
+            prisma, "get_client", lambda: database
+        ), mock.patch.object(
+            prisma.models.FeedItem, "prisma", lambda client=None: _ItemTable(client)
+        ):
+            asyncio.run(scenario())
+        self.assertEqual(database.committed, [1, 2, 3, 4])
+
+
+class ConvertFeedTest(unittest.TestCase):
+    def _convert(self, feed_url: str, handler=None) -> httpx.Response:
+        def client(name, **kwargs):
+            return httpx.AsyncClient(transport=httpx.MockTransport(handler), **kwargs)
+
+        with mock.patch.object(project.network, "public_client", client):
+            return _call("POST", "/feed/convert", params={"feed_url": feed_url})
+
+    def test_non_feed_document_is_unprocessable(self):
+        response = self._convert(
+            "https://feeds.example/page",
+            lambda request: httpx.Response(200, text="<html></html>"),
+        )
+        self.assertEqual(response.status_code, 422, response.text)
+
+    def test_upstream_error_is_a_bad_gateway(self):
+        response = self._convert(
+            "https://feeds.example/missing", lambda request: httpx.Response(404)
+        )
+        self.assertEqual(response.status_code, 502, response.text)
+
+    def test_internal_feed_url_is_refused(self):
+        response = _call(
+            "POST", "/feed/convert", params={"feed_url": "http://127.0.0.1/feed.xml"}
+        )
+        self.assertEqual(response.status_code, 422, response.text)
+
+
+if __name__ == "__main__":
+    unittest.main()
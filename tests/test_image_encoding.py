@@ -0,0 +1,38 @@
+import unittest
+
+import project.image_encoding
+from PIL import Image
+
+ACCEPT = "image/webp,image/jpeg"
+
+
+def _photo() -> "Image.Image":
+    bands = [
+        Image.linear_gradient("L"),
+        Image.radial_gradient("L"),
+        Image.effect_mandelbrot((256, 256), (-2, -1.5, 1, 1.5), 100),
+    ]
+    return Image.merge("RGB", bands)
+
+
+class EncodeTest(unittest.TestCase):
+    def test_auto_with_a_target_keeps_the_smallest_fitting_encoding(self):
+        image = _photo()
+        max_bytes = 5_000
+        encoded = project.image_encoding.encode(image, "auto", ACCEPT, None, max_bytes)
+        candidates = [
+            project.image_encoding._lossy(image, format, None, max_bytes)
+            for format in project.image_encoding.acceptable_formats(ACCEPT)
+            if format in project.image_encoding.LOSSY_FORMATS
+        ]
+        fitting = [c for c in candidates if len(c.data) <= max_bytes]
+        self.assertTrue(fitting)
+        self.assertEqual(len(encoded.data), min(len(c.data) for c in fitting))
+
+    def test_unknown_format_is_a_value_error(self):
+        with self.assertRaises(ValueError):
+            project.image_encoding.encode(_photo(), "foo")
+
+
+if __name__ == "__main__":
+    unittest.main()
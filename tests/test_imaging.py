@@ -0,0 +1,41 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from unittest import mock
+
+import project.imaging
+from PIL import Image
+
+
+def _png(width: int, height: int) -> bytes:
+    buffer = BytesIO()
+    Image.new("1", (width, height)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class OpenImageTest(unittest.TestCase):
+    def test_concurrent_opens_keep_the_pixel_limit(self):
+        small, large = _png(64, 64), _png(1000, 1000)
+        with mock.patch.dict("os.environ", {"IMAGE_MAX_PIXELS": "500000"}):
+
+            def open_one(data: bytes) -> str:
+                try:
+                    project.imaging.open_image(data)
+                except project.imaging.ImageTooLargeError:
+                    return "rejected"
+                return "opened"
+
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                outcomes = list(pool.map(open_one, [small, large] * 100))
+
+            self.assertEqual(outcomes, ["opened", "rejected"] * 100)
+            self.assertEqual(Image.MAX_IMAGE_PIXELS, 500000)
+
+    def test_rejects_decompression_bombs(self):
+        with mock.patch.dict("os.environ", {"IMAGE_MAX_PIXELS": "1000"}):
+            with self.assertRaises(project.imaging.ImageTooLargeError):
+                project.imaging.open_image(_png(100, 100))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+import project.jobs
+import project.registry
+
+_release = threading.Event()
+
+
+def _slow_tool(seconds: float) -> str:
+    _release.wait(seconds)
+    return "done"
+
+
+class JobTimeoutTest(unittest.TestCase):
+    def test_timed_out_blocking_job_keeps_its_worker(self):
+        spec = project.registry.ToolSpec("slow", "imaging", "tests", "/slow", True)
+
+        async def scenario():
+            queue = project.jobs.JobQueue(
+                store=project.jobs.LocalJobStore(), workers=1, job_timeout=0.05
+            )
+            await queue.start()
+            first = await queue.submit("slow", {"seconds": 5})
+            second = await queue.submit("slow", {"seconds": 5})
+            await asyncio.sleep(0.3)
+            statuses = [(await queue.get(job.id)).status for job in (first, second)]
+            _release.set()
+            await queue.stop()
+            return statuses
+
+        with mock.patch.dict(project.registry.TOOLS, {"slow": spec}), mock.patch.dict(
+            project.registry.registry.tools, {"slow": spec}
+        ), mock.patch.object(
+            project.registry.registry, "load", return_value=_slow_tool
+        ), mock.patch.object(
+            project.registry.registry, "is_enabled", return_value=True
+        ), mock.patch.dict(
+            project.registry.registry._validated
+        ):
+            statuses = asyncio.run(scenario())
+        # The only worker is still busy with the first job's thread.
+        self.assertEqual(statuses, ["failed", "queued"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import asyncio
+import unittest
+
+import project.metrics
+
+
+async def _app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 204, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+class MetricsMiddlewareTest(unittest.TestCase):
+    def test_records_to_the_given_registry(self):
+        registry = project.metrics.MetricsRegistry()
+        middleware = project.metrics.MetricsMiddleware(_app, registry)
+        scope = {"type": "http", "method": "GET", "path": "/ping"}
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            pass
+
+        before = project.metrics.REGISTRY.render()
+        asyncio.run(middleware(scope, receive, send))
+        output = registry.render()
+        self.assertIn("multitool_http_request_duration_seconds_count{", output)
+        self.assertIn('status="204"', output)
+        self.assertEqual(project.metrics.REGISTRY.render(), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
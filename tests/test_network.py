@@ -0,0 +1,49 @@
+import asyncio
+import unittest
+
+import httpx
+import project.network
+
+
+class CheckPublicUrlTest(unittest.TestCase):
+    def test_internal_targets_are_refused(self):
+        for url in (
+            "http://127.0.0.1/hook",
+            "http://localhost:8000/hook",
+            "http://10.0.0.5/hook",
+            "http://169.254.169.254/latest/meta-data",
+            "http://[::1]/hook",
+            "ftp://example.com/hook",
+        ):
+            with self.assertRaises(ValueError, msg=url):
+                asyncio.run(project.network.check_public_url(url))
+
+    def test_public_targets_are_allowed(self):
+        asyncio.run(project.network.check_public_url("https://93.184.216.34/hook"))
+
+
+class PublicClientTest(unittest.TestCase):
+    def test_redirects_to_internal_targets_are_refused(self):
+        requested = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requested.append(str(request.url))
+            return httpx.Response(
+                302, headers={"location": "http://127.0.0.1:8000/admin"}
+            )
+
+        async def fetch():
+            async with project.network.public_client(
+                "feed_url",
+                follow_redirects=True,
+                transport=httpx.MockTransport(handler),
+            ) as client:
+                await client.get("https://93.184.216.34/feed.xml")
+
+        with self.assertRaisesRegex(ValueError, "feed_url"):
+            asyncio.run(fetch())
+        self.assertEqual(requested, ["https://93.184.216.34/feed.xml"])
+
+
+if __name__ == "__main__":
+    unittest.main()
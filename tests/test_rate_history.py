@@ -0,0 +1,60 @@
+import asyncio
+import unittest
+from datetime import date
+from unittest import mock
+
+import numpy as np
+import prisma.models
+import project.rate_history
+
+
+class BackfillConcurrencyTest(unittest.TestCase):
+    def setUp(self):
+        self.history = project.rate_history.RateHistory()
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        async def fetch(client, first, end, symbols):
+            self.calls.append(tuple(symbols))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.05)
+            self.in_flight -= 1
+            return {s: np.ones(end - first) for s in symbols}
+
+        table = mock.Mock()
+        table.find_many = mock.AsyncMock(return_value=[])
+        for patch in (
+            mock.patch.object(self.history, "_fetch", side_effect=fetch),
+            mock.patch.object(self.history, "_persist", mock.AsyncMock()),
+            mock.patch.object(
+                prisma.models.ExchangeRateSeries, "prisma", return_value=table
+            ),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        today = project.rate_history.day_number(date.today())
+        self.first, self.end = today - 30, today
+
+    def backfill_all(self, *currencies):
+        async def scenario():
+            return await asyncio.gather(
+                *(self.history.backfill([c], self.first, self.end) for c in currencies)
+            )
+
+        return asyncio.run(scenario())
+
+    def test_other_currencies_fetch_concurrently(self):
+        self.assertEqual(self.backfill_all("EUR", "GBP"), [30, 30])
+        self.assertEqual(self.max_in_flight, 2)
+
+    def test_same_range_is_fetched_once(self):
+        self.assertEqual(sorted(self.backfill_all("EUR", "EUR")), [0, 30])
+        self.assertEqual(self.calls, [("EUR",)])
+        self.assertEqual(self.backfill_all("EUR"), [0])
+        self.assertEqual(len(self.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+
+import project.request_log
+
+
+def _depth() -> float:
+    return project.request_log.QUEUE_DEPTH.labels().value
+
+
+class QueueDepthTest(unittest.TestCase):
+    def test_depth_follows_enqueue_without_a_flush(self):
+        logger = project.request_log.RequestLogger(
+            max_queue_size=3, high_water_mark=1.0
+        )
+        for expected in (1, 2, 3):
+            self.assertTrue(logger.log("test"))
+            self.assertEqual(_depth(), expected)
+        self.assertFalse(logger.log("test"))
+        self.assertEqual(_depth(), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import project.geoip
+import project.shared
+
+CSV = """\
+1.0.0.0,1.0.0.255,OC,AU,Queensland,South Brisbane,-27.4767,153.017
+8.8.8.0,8.8.8.255,NA,US,California,Mountain View,37.4223,-122.085
+2001:4860::,2001:4860:ffff:ffff:ffff:ffff:ffff:ffff,NA,US,California,Mountain View,37.4223,-122.085
+"""
+
+
+class GeoIPTableTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w") as f:
+            f.write(CSV)
+        self.addCleanup(os.remove, self.path)
+
+    def test_lookup(self):
+        table = project.geoip.load_csv(self.path)
+        self.assertEqual(len(table), 2)
+        location = table.lookup("8.8.8.8")
+        self.assertEqual(
+            (location.country, location.region, location.city),
+            ("US", "California", "Mountain View"),
+        )
+        self.assertAlmostEqual(location.latitude, 37.4223)
+        self.assertIsNone(table.lookup("8.8.9.1"))
+        self.assertIsNone(table.lookup("0.0.0.1"))
+        self.assertIsNone(table.lookup("2001:4860::1"))
+        self.assertIsNone(table.lookup("not an ip"))
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs os.fork")
+    def test_forked_worker_reads_preloaded_table(self):
+        calls = []
+
+        def builder():
+            calls.append(os.getpid())
+            return project.geoip.load_configured()
+
+        with mock.patch.dict(
+            project.shared._builders, {"geoip": builder}, clear=True
+        ), mock.patch.dict(project.shared._data, clear=True), mock.patch.dict(
+            "os.environ", {"GEOIP_DATABASE": self.path}
+        ):
+            project.shared.preload()
+            read, write = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    os.close(read)
+                    location = project.shared.get("geoip", build=False).lookup(
+                        "1.0.0.7"
+                    )
+                    result = {"city": location.city, "builds": len(calls)}
+                    os.write(write, json.dumps(result).encode())
+                finally:
+                    os._exit(0)
+            os.close(write)
+            with os.fdopen(read) as f:
+                result = json.loads(f.read())
+            os.waitpid(pid, 0)
+
+        self.assertEqual(result, {"city": "South Brisbane", "builds": 1})
+        self.assertEqual(calls, [os.getpid()])
+
+    def test_get_without_build_leaves_unbuilt_data_alone(self):
+        builder = mock.Mock()
+        with mock.patch.dict(
+            project.shared._builders, {"geoip": builder}, clear=True
+        ), mock.patch.dict(project.shared._data, clear=True):
+            self.assertIsNone(project.shared.get("geoip", build=False))
+        builder.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()